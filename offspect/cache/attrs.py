@@ -4,16 +4,89 @@ from pathlib import Path
 import datetime
 from offspect.cache.readout import get_valid_readouts
 from offspect.types import Annotations, MetaData
-from offspect.cache.readout import valid_origin_keys, valid_trace_keys
+from offspect.cache.readout import (
+    valid_origin_keys,
+    valid_trace_keys,
+    valid_trace_types,
+)
 from offspect import release
 import importlib
 from functools import lru_cache
+from copy import deepcopy
 from math import nan, inf
+import re
 
 # %%
-def decode(value: str) -> Any:
-    "decode any value from string"
-    dec = yaml.load(value, Loader=yaml.Loader)
+_MISSING = object()  #: returned by the fast path for values it can not decode
+
+_YAML_CONSTANTS: Dict[str, Any] = {
+    "": None,
+    "~": None,
+    ".nan": nan,
+    ".NaN": nan,
+    ".NAN": nan,
+    ".inf": inf,
+    ".Inf": inf,
+    ".INF": inf,
+    "-.inf": -inf,
+    "-.Inf": -inf,
+    "-.INF": -inf,
+}  #: plain scalars with a special meaning in YAML 1.1
+for _key in ("null", "Null", "NULL"):
+    _YAML_CONSTANTS[_key] = None
+for _key in ("yes", "true", "on"):
+    for _variant in (_key, _key.capitalize(), _key.upper()):
+        _YAML_CONSTANTS[_variant] = True
+for _key in ("no", "false", "off"):
+    for _variant in (_key, _key.capitalize(), _key.upper()):
+        _YAML_CONSTANTS[_variant] = False
+
+_INT = re.compile(r"-?(?:0|[1-9][0-9]*)")
+_FLOAT = re.compile(r"-?(?:0|[1-9][0-9]*)\.[0-9]+(?:e[-+][0-9]+)?")
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_ITEM = re.compile(r"\s*(?:'([^'\n]*)'|([^\s,'\"\[\]{}#:]+))\s*")
+
+
+def _decode_scalar(value: str) -> Any:
+    "decode a plain scalar the same way as YAML, or return _MISSING if it is unusual"
+    if value in _YAML_CONSTANTS:
+        return _YAML_CONSTANTS[value]
+    if _INT.fullmatch(value):
+        return int(value)
+    if _FLOAT.fullmatch(value):
+        return float(value)
+    if _WORD.fullmatch(value):
+        return value
+    return _MISSING
+
+
+def _decode_list(value: str) -> Any:
+    "decode a flow sequence of plain or single-quoted scalars, or return _MISSING if it is unusual"
+    inner = value[1:-1]
+    if inner.strip() == "":
+        return []
+    items = []
+    pos = 0
+    while True:
+        m = _ITEM.match(inner, pos)
+        if m is None:
+            return _MISSING
+        if m.group(1) is not None:
+            items.append(m.group(1))
+        else:
+            item = _decode_scalar(m.group(2))
+            if item is _MISSING:
+                return _MISSING
+            items.append(item)
+        pos = m.end()
+        if pos == len(inner):
+            return items
+        if inner[pos] != ",":
+            return _MISSING
+        pos += 1
+
+
+def _postprocess(dec: Any) -> Any:
     if type(dec) == list:
         _d = []
         for i in dec:
@@ -29,6 +102,55 @@ def decode(value: str) -> Any:
     return dec
 
 
+def _decode_yaml(value: str) -> Any:
+    "decode any value from string with YAML, the reference for :func:`decode`"
+    return _postprocess(yaml.load(value, Loader=yaml.Loader))
+
+
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+@lru_cache(maxsize=4096)
+def _decode_str(value: str) -> Any:
+    if value.startswith("[") and value.endswith("]"):
+        dec = _decode_list(value)
+    else:
+        dec = _decode_scalar(value)
+    if dec is _MISSING:
+        return _decode_yaml(value)
+    return _postprocess(dec)
+
+
+def decode(value: str) -> Any:
+    """decode any value from string
+    
+    Numbers, booleans, nan, inf, None, simple words and lists of them are parsed directly, anything else falls back to YAML. Decoded values are memoized, as the same strings are decoded over and over again.
+    """
+    if type(value) != str:
+        return _decode_yaml(value)
+    dec = _decode_str(value)
+    # never hand out the memoized object itself, as callers may change it
+    if type(dec) in _IMMUTABLE:
+        return dec
+    if type(dec) == list and all(type(i) in _IMMUTABLE for i in dec):
+        return list(dec)
+    return deepcopy(dec)
+
+
+def _encode_float(value: float) -> str:
+    "encode a float exactly as YAML does"
+    if value != value:
+        return ".nan"
+    if value == inf:
+        return ".inf"
+    if value == -inf:
+        return "-.inf"
+    enc = repr(value).lower()
+    if "." not in enc and "e" in enc:
+        enc = enc.replace("e", ".0e", 1)
+    return enc
+
+
 def encode(value: Any) -> str:
     "encode any value to string for storing as TraceAttribute value"
     if type(value) == type(Path()):
@@ -39,7 +161,19 @@ def encode(value: Any) -> str:
         return value
     if type(value) == list:
         return str(value)
+    if type(value) == bool:
+        return "true" if value else "false"
+    if type(value) == int:
+        return str(value)
+    if type(value) == float:
+        return _encode_float(value)
+    if value is None:
+        return "null"
+    return _encode_yaml(value)
+
 
+def _encode_yaml(value: Any) -> str:
+    "encode any value to string with YAML, the reference for :func:`encode`"
     enc = yaml.dump(value, Dumper=yaml.Dumper).splitlines()[0]
     if "!!" in enc:
         raise ValueError(
@@ -64,6 +198,27 @@ def get_valid_trace_keys(readin: str, readout: str = None) -> List[str]:
         )
 
 
+def get_valid_trace_types(readin: str, readout: str = None) -> Dict[str, str]:
+    "return the schema of native types of the trace keys of a readout, see :func:`~.offspect.cache.file.as_typed`"
+    # never hand out the memoized schema itself, as callers may change it
+    return dict(_get_valid_trace_types(readin, readout))
+
+
+@lru_cache(maxsize=1)
+def _get_valid_trace_types(readin: str, readout: str = None) -> Dict[str, str]:
+    if readout is None:
+        ri, ro = readin.split("_")
+    else:
+        ri, ro = readin, readout
+    try:
+        m = importlib.import_module(f"offspect.input.{ri}.{ro}")
+    except Exception:
+        raise ImportError(f"offspect.input.{ri}.{ro} is invalid")
+    types = dict(valid_trace_types)
+    types.update(getattr(m, "valid_types", dict()))
+    return types
+
+
 class AnnotationDictionary(dict):
     """A subclass of dict storing all values internally as string
     
@@ -34,6 +34,15 @@ Another use case would be printing a TraceAttribute across all traces in the fil
    for data, attrs in cf:
         print("rejected?:", attrs["reject"])
 
+If you only need the attributes, it is much faster to read them all at once with :meth:`~.CacheFile.get_all_trace_attrs`, which opens the file only once and returns the decoded values organized as columns.
+
+.. code-block:: python
+
+   from offspect.api import CacheFile
+   cf = CacheFile("example.hdf5")
+   attrs = cf.get_all_trace_attrs()
+   print("rejected?:", attrs["reject"])
+
 Manipulate
 **********
 
@@ -51,21 +60,39 @@ We can change the value for a key of the annotations for a specific trace by ind
 Batch-Manipulate
 ****************
 
-Another typical use case would be changing one TraceAttribute across all traces in the file. Here, we iterate across all traces, and shift the onset of the TMS 5 samples to the right. 
+Another typical use case would be changing one TraceAttribute across all traces in the file. Here, we open a session on the file, iterate across all traces, and shift the onset of the TMS 5 samples to the right. 
 
 .. code-block:: python
 
    from offspect.api import CacheFile, decode, encode
    cf = CacheFile("merged.hdf5")
-   for ix, (data, attrs) in enumerate(cf):
-       key = "onset_shift"
-       old = decode(attrs[key])
-       print(f"Trace {ix} {key}:", old, end=" ")
-       new = old + 5
-       attrs["onset_shift"] = encode(new)
-       cf.set_trace_attrs(ix, attrs)
-       test = decode(cf.get_trace_attrs(ix)["onset_shift"])
-       print("to", test)
+   with cf.open("r+") as session:
+       updates = dict()
+       for ix in range(len(session)):
+           attrs = session.get_trace_attrs(ix)
+           key = "onset_shift"
+           old = decode(attrs[key])
+           print(f"Trace {ix} {key}:", old)
+           attrs[key] = encode(old + 5)
+           updates[ix] = attrs
+       session.update_many(updates)
+
+Because the session of :meth:`~.CacheFile.open` keeps the file opened, and :meth:`~.CacheFile.update_many` writes all updates at once, this is much faster than calling :meth:`~.CacheFile.get_trace_attrs` and :meth:`~.CacheFile.set_trace_attrs` for each trace, which open the file anew with every call. 
+
+Layout
+******
+
+By default, each trace is stored as its own dataset. For large files, this is slow to read and write. Convert a cachefile with :func:`~.convert_layout` into the contiguous layout, which stores all traces of an origin in a single dataset (see :func:`~.is_contiguous`). Both layouts can be read and written with the same interface, and a slice of traces is then read at once.
+
+.. code-block:: python
+
+   from offspect.cache.file import CacheFile, convert_layout
+   cf = CacheFile(convert_layout("example.hdf5", "example_v2.hdf5"))
+   data = cf.get_trace_data(slice(0, 100))
+
+With ``typed=True``, numeric trace attributes are additionally stored natively according to the schema of the readout (see :func:`~.offspect.cache.attrs.get_valid_trace_types`), instead of as strings. They are still returned as strings by :meth:`~.CacheFile.get_trace_attrs`, but no longer need to be parsed by :meth:`~.CacheFile.get_all_trace_attrs`.
+
+Attributes of the origin, e.g. the channel_labels or the global_comment, are stored only once per origin, and merged into the attributes of each trace when read. Change them with :meth:`~.CacheFile.set_origin_attrs`. Files written by earlier versions stored a copy in every trace. These can be migrated in place with :func:`~.dedupe_origin_attrs`, or by converting them.
 
 Plotting
 ********
@@ -103,16 +130,17 @@ Additionally, you can use all the keywords from :py:func:`~.plot_glass` to beaut
 
 
 """
-from typing import Union, List, Dict, Tuple, Iterator
+from typing import Union, List, Dict, Tuple, Iterator, Any
 from pathlib import Path
 import h5py
 import yaml
 import numpy as np
 from numpy import ndarray
 from functools import partial
+from itertools import groupby
+import json
 import ast
 from numpy import ndarray as TraceData
-from functools import lru_cache
 from offspect.cache.check import (
     check_consistency,
     check_valid_suffix,
@@ -124,7 +152,7 @@ from offspect.cache.check import (
     isindex,
 )
 from math import inf, nan
-from offspect.cache.attrs import encode
+from offspect.cache.attrs import encode, decode, get_valid_trace_types
 from offspect.cache.steps import PreProcessor
 
 read_file = partial(
@@ -154,13 +182,13 @@ class CacheFile:
             raise FileNotFoundError(f"{self.fname} does not exist")
         check_valid_suffix(fname)
 
-    def get_trace_data(self, idx: int) -> TraceData:
+    def get_trace_data(self, idx: Union[int, slice]) -> TraceData:
         """return TraceData for a specific traces in the file
                 
         args
         ----
-        idx: int
-            which trace to pick.
+        idx: Union[int, slice]
+            which trace to pick. If a slice is given, the data of all selected traces is returned stacked along the first axis, and read with a single hyperslab selection per origin stored in the contiguous layout.
         returns
         -------
         attrs: TraceData 
@@ -170,6 +198,10 @@ class CacheFile:
            This is a read-only attribute, and raw data can never be overwritten with the CacheFile interface. If you need to perform
            any preprocessing steps, manage the TraceData with a low-level interface, e.g. :func:`~.populate`.
         """
+        if isinstance(idx, slice):
+            index = get_trace_index(self.fname)
+            with read_file(self.fname) as f:
+                return read_tracedata_stack(f, index[idx])
         return read_trace(self, idx=idx, what="data")
 
     def get_trace_attrs(self, idx: int) -> TraceAttributes:
@@ -199,6 +231,26 @@ class CacheFile:
         """
         return read_trace(self, idx=idx, what="attrs")
 
+    def get_all_trace_attrs(self) -> Dict[str, Union[ndarray, List[Any]]]:
+        """read the TraceAttributes of all traces in the file at once
+        
+        returns
+        -------
+        columns: Dict[str, Union[ndarray, List[Any]]]
+            the attributes of all traces, organized as columns indexed by the key of the attribute. The position in each column corresponds to the index of the trace in the file. 
+
+        Example::
+
+            cf = CacheFile("example.hdf5")
+            attrs = cf.get_all_trace_attrs()
+            vpp = attrs["pos_peak_magnitude_uv"] - attrs["neg_peak_magnitude_uv"]
+
+        .. note::
+
+           In contrast to :meth:`~.get_trace_attrs`, the values are already decoded, and the file is only opened once. Columns with numeric values are returned as ndarray, where missing values are nan, and the 'xyz_coords' as an array with one row per trace. All other columns are returned as lists. 
+        """
+        return read_all_trace_attrs(self)
+
     def set_trace_attrs(self, idx: int, attrs: TraceAttributes):
         """update the attributes of a specific trace
         
@@ -232,6 +284,75 @@ class CacheFile:
            trace metadata will be saved, i.e. those fields which are in correspondence with the "readout" parameter (see :func:`~.filter_trace_attrs`).
 
         """
+        self._check_origin_of_attrs(idx, attrs)
+        update_trace_attributes(attrs)
+
+    def update_many(self, updates: Dict[int, TraceAttributes]):
+        """update the attributes of many traces at once
+        
+        args
+        ----
+        updates: Dict[int, TraceAttributes]
+            the attributes to be written, indexed by the index of the trace they should overwrite
+        
+        Example::
+
+            cf = CacheFile("example.hdf5")
+            updates = dict()
+            for idx in range(len(cf)):
+                attrs = cf.get_trace_attrs(idx)
+                attrs["reject"] = encode(False)
+                updates[idx] = attrs
+            cf.update_many(updates)
+
+        .. note::
+
+           The same safety checks as for :meth:`~.set_trace_attrs` are performed for every trace before anything is written. All attributes are then written while the file is opened only once.
+        """
+        for idx, attrs in updates.items():
+            self._check_origin_of_attrs(idx, attrs)
+        update_many_trace_attributes(list(updates.values()))
+
+    def append(
+        self,
+        annotation: Annotations,
+        traces: List[TraceData],
+        contiguous: bool = None,
+        typed: bool = False,
+    ):
+        """append the traces of a new origin to this cachefile in place
+
+        args
+        ----
+        annotation: Annotations
+            the annotations of the new origin, with the fields origin, attrs and traces, see :func:`populate`
+        traces: List[TraceData]
+            the traces of the new origin
+        contiguous: bool
+            whether to store the traces in the contiguous layout. Defaults to the layout of the existing origins.
+        typed: bool
+            whether to store the trace attributes natively, see :func:`populate`
+
+        The new origin is checked with :func:`~.check_consistency` against the existing origins before anything is written. In contrast to :func:`merge`, the existing origins are not rewritten.
+        """
+        append_origin(self.fname, annotation, traces, contiguous, typed)
+
+    def set_origin_attrs(self, origin: str, attrs: Dict[str, str]):
+        """update attributes shared by all traces of an origin
+
+        args
+        ----
+        origin: str
+            the origin whose attributes will be updated, see :attr:`~.origins`
+        attrs: Dict[str, str]
+            the encoded values of the origin attributes to be overwritten, e.g. the global_comment
+
+        Origin attributes are stored only once per origin, and merged into the attributes of each trace, when read with :meth:`~.get_trace_attrs`.
+        """
+        update_origin_attrs(self.fname, origin, attrs)
+
+    def _check_origin_of_attrs(self, idx: int, attrs: TraceAttributes):
+        "raise a ValueError if the attributes did not originate from this trace in this CacheFile"
         if not "cache_file" in attrs.keys() or not "cache_file_index" in attrs.keys():
             raise ValueError(
                 "This attributes do not originate from a CacheFile. Information about its origin is missing"
@@ -243,7 +364,6 @@ class CacheFile:
             raise ValueError(
                 "These attributes did originate from a different trace in this CacheFile"
             )
-        update_trace_attributes(attrs)
 
     @property
     def origins(self) -> List[str]:
@@ -274,18 +394,8 @@ class CacheFile:
         s += f"In total, there are {len(self)} traces from {ox} origins"
         return s
 
-    @lru_cache(maxsize=1)
     def __len__(self) -> int:
-        cnt = 0        
-        with read_file(self.fname) as f:
-            for origin in f.keys():
-                idx = None
-                for idx, _ in enumerate(f[origin]["traces"], start=cnt + 1):
-                    pass
-                if idx is None:
-                    print(f'WARNING: Origin {f[origin].name} had zero traces')
-                cnt = idx or cnt
-        return int(cnt)
+        return len(get_trace_index(self.fname))
 
     def __iter__(self):
         """iterate over all traces in the cachefile
@@ -302,6 +412,136 @@ class CacheFile:
             yield self.get_trace_data(i), self.get_trace_attrs(i)
 
 
+    def open(self, mode: str = "r", chunk_cache: int = 64 * 1024 ** 2) -> "CacheSession":
+        """open a long-lived session to read or write many traces
+
+        args
+        ----
+        mode: str
+            'r' for reading, or 'r+' for reading and writing
+        chunk_cache: int
+            the size of the hdf5 chunk cache in bytes
+
+        returns
+        -------
+        session: CacheSession
+            a session serving traces from a single file handle, to be used as context manager
+
+        Example::
+
+            cf = CacheFile("example.hdf5")
+            with cf.open("r+") as session:
+                for idx in range(len(session)):
+                    attrs = session.get_trace_attrs(idx)
+                    attrs["reject"] = encode(False)
+                    session.set_trace_attrs(idx, attrs)
+        """
+        return CacheSession(self, mode=mode, chunk_cache=chunk_cache)
+
+
+class CacheSession:
+    """a session on a :class:`CacheFile`, keeping the hdf5 file opened
+    
+    Opening a hdf5 file takes milliseconds, which dominates the time to access a single trace. A session therefore opens the file once, and serves all access through this single handle until it is closed. Create it with :meth:`CacheFile.open`.
+
+    args
+    ----
+    cf: CacheFile
+        the cachefile to open
+    mode: str
+        'r' for reading, or 'r+' for reading and writing
+    chunk_cache: int
+        the size of the hdf5 chunk cache in bytes
+
+    .. note::
+
+       While a session is open for writing, the file should not be accessed by other means, e.g. the methods of the :class:`CacheFile` itself.
+    """
+
+    def __init__(
+        self, cf: CacheFile, mode: str = "r", chunk_cache: int = 64 * 1024 ** 2
+    ):
+        if mode not in ["r", "r+"]:
+            raise ValueError(f"{mode} is invalid, only 'r' or 'r+' are allowed")
+        self.cf = cf
+        self.mode = mode
+        self.index = get_trace_index(cf.fname)
+        self.file = h5py.File(
+            cf.fname,
+            mode=mode,
+            libver="latest",
+            swmr=mode == "r",
+            rdcc_nbytes=chunk_cache,
+        )
+
+    def close(self):
+        "close the session"
+        if self.file:
+            self.file.close()
+            if self.mode == "r+":
+                _restamp_trace_index(self.cf.fname, self.index)
+
+    def __enter__(self) -> "CacheSession":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _locate(self, idx: int) -> "TraceLocation":
+        if type(idx) != int:
+            raise ValueError("Index must be an integer")
+        if idx < 0 or idx >= len(self.index):
+            raise IndexError(f"{idx} not in cachefile")
+        return self.index[idx]
+
+    def _require_writable(self):
+        if self.mode != "r+":
+            raise PermissionError("This session was opened read-only")
+
+    def get_trace_data(self, idx: Union[int, slice]) -> TraceData:
+        "return TraceData for a specific trace or a slice of traces, see :meth:`CacheFile.get_trace_data`"
+        if isinstance(idx, slice):
+            return read_tracedata_stack(self.file, self.index[idx])
+        return read_trace_from(self.file, self.cf.fname, idx, self._locate(idx), "data")
+
+    def get_trace_attrs(self, idx: int) -> TraceAttributes:
+        "read the TraceAttributes for a specific trace, see :meth:`CacheFile.get_trace_attrs`"
+        return read_trace_from(
+            self.file, self.cf.fname, idx, self._locate(idx), "attrs"
+        )
+
+    def set_trace_attrs(self, idx: int, attrs: TraceAttributes):
+        "update the attributes of a specific trace, see :meth:`CacheFile.set_trace_attrs`"
+        self.update_many({idx: attrs})
+
+    def update_many(self, updates: Dict[int, TraceAttributes]):
+        "update the attributes of many traces, see :meth:`CacheFile.update_many`"
+        self._require_writable()
+        for idx, attrs in updates.items():
+            self.cf._check_origin_of_attrs(idx, attrs)
+        for idx, attrs in updates.items():
+            _, _, attrs = split_transient_attrs(attrs)
+            write_trace_attrs(self.file, self._locate(idx), attrs)
+
+    def set_trace_data(self, idx: int, data: TraceData):
+        """overwrite the data of a specific trace, see :func:`write_tracedata`
+
+        raises a ValueError if the shape of the data does not conform to the stored trace
+        """
+        self._require_writable()
+        if not write_tracedata_into(self.file, self._locate(idx), data):
+            raise ValueError(f"Shape of trace #{idx} does not conform to {data.shape}")
+        _data_versions[(str(self.cf.fname), idx)] = data_version(self.cf.fname, idx) + 1
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self):
+        "iterate over data and attributes of all traces in the cachefile"
+        for i in range(len(self)):
+            yield self.get_trace_data(i), self.get_trace_attrs(i)
+
+
 # -----------------------------------------------------------------------------
 
 
@@ -313,6 +553,115 @@ def sort_keys(okeys: List[str]) -> List[str]:
     return sorted_keys
 
 
+TraceLocation = Tuple[
+    str, Union[str, int]
+]  #: the origin of a trace, and either the key of its dataset for the per-trace layout or its row for the contiguous layout
+
+TraceIndex = List[
+    TraceLocation
+]  #: the location of each trace, in the order of the running index across all origins
+
+_trace_indices: Dict[str, Tuple[Tuple[int, int], TraceIndex]] = dict()
+_loaded_stamps: Dict[str, Tuple[int, int]] = dict()
+
+
+def _stamp(fname: FileName) -> Tuple[int, int]:
+    "the modification time and size of a file, used to detect changes"
+    stat = Path(fname).stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def build_trace_index(f: h5py.File) -> TraceIndex:
+    """walk once through all origins of an open cachefile and index all traces
+    
+    args
+    ----
+    f: h5py.File
+        the opened cachefile
+    returns
+    -------
+    index: TraceIndex
+        a list with the origin and dataset key for each trace, where the position in the list corresponds to the running index across all origin files
+    """
+    index: TraceIndex = []
+    for origin in f.keys():
+        keys = trace_keys(f[origin])
+        if len(keys) == 0:
+            print(f"WARNING: Origin {f[origin].name} had zero traces")
+        index.extend((origin, key) for key in keys)
+    return index
+
+
+def is_contiguous(group: h5py.Group) -> bool:
+    """whether the traces of an origin group are stored in the contiguous layout
+
+    In the per-trace layout, every trace is stored as its own dataset within the group 'traces', with its id as name and its attributes as hdf5 attributes. In the contiguous layout, the traces of an origin are stored in a single dataset 'traces' with the shape (n_traces, n_samples[, n_channels]), sorted by their ids, which are stored in the side dataset 'trace_ids'. The attributes of each trace are stored in the same row of the dataset 'trace_attrs'. See :func:`populate`.
+    """
+    return isinstance(group["traces"], h5py.Dataset)
+
+
+def trace_keys(group: h5py.Group) -> List[Union[str, int]]:
+    "return the keys of the traces of an origin group, sorted by the id of the traces"
+    if is_contiguous(group):
+        return list(range(group["traces"].shape[0]))
+    # because keys are stored as strings, the are sorted alphanumerically, but we need them sorted numerically
+    return sort_keys(group["traces"].keys())
+
+
+def get_trace_index(fname: FileName) -> TraceIndex:
+    """return the index of all traces in a cachefile
+
+    The index is built once per file and reused, until the file is changed on the HDD, e.g. by another process, in which case it is rebuilt.
+    """
+    fname = str(fname)
+    stamp = _stamp(fname)
+    if fname in _trace_indices:
+        cached, index = _trace_indices[fname]
+        if cached == stamp:
+            return index
+    with read_file(fname) as f:
+        index = build_trace_index(f)
+    _trace_indices[fname] = (stamp, index)
+    _loaded_stamps[fname] = stamp
+    return index
+
+
+def file_version(fname: FileName) -> Tuple[int, int]:
+    """return the modification time and size of a cachefile when it was last read from the HDD
+
+    Changes made by this process, e.g. writing attributes or data, keep the version, while changes made by another process, or replacing the file, result in a new version.
+    """
+    get_trace_index(fname)
+    return _loaded_stamps[str(fname)]
+
+
+def _restamp_trace_index(fname: FileName, index: TraceIndex):
+    """keep the index valid after we modified the file without changing its structure, e.g. when writing attributes or overwriting data"""
+    _trace_indices[str(fname)] = (_stamp(fname), index)
+
+
+def locate_trace(fname: FileName, idx: int) -> TraceLocation:
+    """return origin and dataset key for a trace in a cachefile
+
+    args
+    ----
+    fname: FileName
+        the path to the cachefile
+    idx: int
+        the running index of the trace across all origins
+    returns
+    -------
+    origin: str
+        the origin group in which the trace is stored
+    key: Union[str, int]
+        the key of the dataset storing the trace within the origin group, or its row for the contiguous layout
+    """
+    index = get_trace_index(fname)
+    if idx < 0 or idx >= len(index):
+        raise IndexError(f"{idx} not in cachefile")
+    return index[idx]
+
+
 def update_trace_attributes(attrs: TraceAttributes):
     """overwrite the traceattributes for a trace
     
@@ -322,6 +671,25 @@ def update_trace_attributes(attrs: TraceAttributes):
     ----
     attrs: TraceAttributes
     """
+    update_many_trace_attributes([attrs])
+
+
+def split_transient_attrs(attrs: TraceAttributes) -> Tuple[str, int, TraceAttributes]:
+    """split the transient fields from the traceattributes
+
+    args
+    ----
+    attrs: TraceAttributes
+        attributes as returned by :meth:`~.CacheFile.get_trace_attrs`
+    returns
+    -------
+    fname: str
+        the cachefile the attributes originate from
+    index: int
+        the index of the trace the attributes originate from
+    attrs: TraceAttributes
+        a copy of the attributes without the transient fields
+    """
     index: int
     if isindex(attrs["cache_file_index"]):  # this is a transient attribute
         index = int(attrs["cache_file_index"])
@@ -339,23 +707,125 @@ def update_trace_attributes(attrs: TraceAttributes):
         if key == "cache_file":
             continue
         attrs[key] = value
+    return fname, index, attrs
+
 
-    if index >= 0:
-        cnt = -1
-        with write_file(fname) as f:
-            for origin in f.keys():
-                # because keys are stored as strings, the are sorted alphanumerically, but we need them sorted numerically
-                keys = sort_keys(f[origin]["traces"].keys())
-                # we use a running index across origin files, so we start at the last index (defaulting to -1, so -1+1=> 0)
-                for idx, key in enumerate(keys, start=cnt + 1):
-                    if idx == index:
-                        dset = f[origin]["traces"][key]
-                        for key in attrs.keys():
-                            dset.attrs[encode(key)] = encode(attrs[key])
-                        return
-                    cnt = idx
+def update_many_trace_attributes(attrs_list: List[TraceAttributes]):
+    """overwrite the traceattributes for many traces at once
 
-    raise IndexError(f"{index} not in cachefile")
+    the original file and index of each trace are specified as field within the TraceAttributes, and all traces must originate from the same file. Every index is checked before the file is opened for writing, and all attributes are written while the file is opened only once.
+
+    args
+    ----
+    attrs_list: List[TraceAttributes]
+    """
+    if len(attrs_list) == 0:
+        return
+    updates = []
+    for attrs in attrs_list:
+        fname, index, attrs = split_transient_attrs(attrs)
+        updates.append((fname, locate_trace(fname, index), attrs))
+    fnames = set(fname for fname, _, _ in updates)
+    if len(fnames) != 1:
+        raise ValueError(f"Attributes originate from different cachefiles: {fnames}")
+
+    fname = fnames.pop()
+    trace_index = get_trace_index(fname)
+    with write_file(fname) as f:
+        for _, location, attrs in updates:
+            write_trace_attrs(f, location, attrs)
+    _restamp_trace_index(fname, trace_index)
+
+
+def update_origin_attrs(fname: FileName, origin: str, attrs: Dict[str, str]):
+    """update attributes of an origin in a cachefile, see :meth:`CacheFile.set_origin_attrs`
+
+    Values of these attributes stored in single traces, i.e. copies from earlier versions or values that differed from the origin, are overwritten as well, so that all traces share the new value.
+    """
+    index = get_trace_index(fname)
+    with write_file(fname) as f:
+        if origin not in f.keys():
+            raise ValueError(f"{origin} is not an origin of {fname}")
+        group = f[origin]
+        for key in attrs.keys():
+            if key not in group.attrs:
+                raise ValueError(f"{key} is not an attribute of {origin}")
+        for key in attrs.keys():
+            group.attrs[encode(key)] = encode(attrs[key])
+        # any trace can store its own value, either as a copy from an earlier
+        # version or as a divergent value kept by collapse_origin_attrs, so
+        # every trace is checked, but only those with a value are rewritten
+        stored = read_origin_attrs(group, merged=False)
+        for tkey, tattrs in zip(trace_keys(group), stored):
+            if any(key in tattrs for key in attrs.keys()):
+                write_trace_attrs(f, (origin, tkey), attrs)
+    _restamp_trace_index(fname, index)
+
+
+def dedupe_origin_attrs(fname: FileName):
+    """migrate a cachefile in place, so that origin attributes are stored only once per origin
+
+    Earlier versions stored a copy of all origin attributes in every trace. These copies are removed, see :func:`collapse_origin_attrs`. The size of the file on disk does not shrink until it is repacked, e.g. with :func:`convert_layout`, which also removes the copies.
+    """
+    index = get_trace_index(fname)
+    with write_file(fname) as f:
+        for origin in f.keys():
+            group = f[origin]
+            stored = read_origin_attrs(group, merged=False)
+            attrs, traces = collapse_origin_attrs(asdict(group.attrs), stored)
+            for key, val in attrs.items():
+                group.attrs[key] = val
+            if is_contiguous(group):
+                group["trace_attrs"][:] = [json.dumps(t) for t in traces]
+                continue
+            for tkey, old, new in zip(trace_keys(group), stored, traces):
+                dset = group["traces"][tkey]
+                for key in old.keys():
+                    if key not in new:
+                        del dset.attrs[key]
+    _restamp_trace_index(fname, index)
+
+
+def write_trace_attrs(f: h5py.File, location: TraceLocation, attrs: TraceAttributes):
+    """write the attributes of a single trace into an opened cachefile
+    
+    args
+    ----
+    f: h5py.File
+        the cachefile, opened for writing
+    location: TraceLocation
+        origin and key of the trace, see :func:`locate_trace`
+    attrs: TraceAttributes
+        the attributes, already stripped of the transient fields. Attributes which are identical to those of the origin are not written, see :func:`collapse_origin_attrs`.
+    """
+    origin, tkey = location
+    group = f[origin]
+    if is_contiguous(group):
+        row = group["trace_attrs"].asstr()[tkey]
+        old = json.loads(row)
+        changed = False
+        for key in attrs.keys():
+            if not _is_origin_copy(group, old, key, attrs[key]):
+                old[encode(key)] = store_like(old.get(key, None), attrs[key])
+                changed = True
+        if changed:
+            group["trace_attrs"][tkey] = json.dumps(old)
+    else:
+        dset = group["traces"][tkey]
+        for key in attrs.keys():
+            if not _is_origin_copy(group, dset.attrs, key, attrs[key]):
+                dset.attrs[encode(key)] = store_like(
+                    dset.attrs.get(key, None), attrs[key]
+                )
+
+
+def _is_origin_copy(group: h5py.Group, stored: Any, key: str, value: Any) -> bool:
+    "whether writing this attribute into a trace would only duplicate the attribute of its origin"
+    if key == "origin":
+        return True
+    if key in stored:  # copies stored by earlier versions are kept up to date
+        return False
+    return key in group.attrs and _as_str(group.attrs[key]) == encode(value)
 
 
 def read_trace(
@@ -375,83 +845,245 @@ def read_trace(
     """
     if type(idx) != int:
         raise ValueError("Index must be an integer")
-    if idx >= 0:
-        cnt = -1  # we use cnt to allow indexing across origin files
-        with read_file(cf.fname) as f:
-            for origin in f.keys():
-                # because keys are stored as strings, the are sorted alphanumerically, but we need them sorted numerically
-                keys = sort_keys(f[origin]["traces"].keys())
-                # we use a running index across origin files, so we start at the last index (defaulting to -1, so -1+1=> 0)
-                for ix, key in enumerate(keys, start=cnt + 1):
-                    # if the trace is the one indexed, we load the dset
-                    # fresh from hdd
-                    if idx == ix:
-                        dset = f[origin]["traces"][key]
-                        dset.id.refresh()  # load fresh from file
-                        if what == "attrs":
-                            # attrs = parse_traceattrs(dset.attrs)
-                            attrs = asdict(dset.attrs)
-                            # attrs["origin"] = encode(str(origin))
-                            attrs["origin"] = encode(origin)
-                            attrs["cache_file"] = encode(cf.fname)
-                            attrs["cache_file_index"] = encode(idx)
-                            # check_metadata(str(attrs["readout"]), attrs)
-                            return attrs
-                        elif what == "data":
-                            data = parse_tracedata(dset)
-                            return data
-                        else:
-                            raise NotImplementedError(f"{what} can not be loaded")
-                    # we set cnt to ix to allow cross-origin indexing
-                    cnt = ix
-
-    raise IndexError(f"{idx} not in cachefile")
+    location = locate_trace(cf.fname, idx)
+    with read_file(cf.fname) as f:
+        return read_trace_from(f, cf.fname, idx, location, what, refresh=True)
+
+
+def read_trace_from(
+    f: h5py.File,
+    fname: FileName,
+    idx: int,
+    location: Tuple[str, str],
+    what: str = "attrs",
+    refresh: bool = False,
+) -> Union[TraceData, TraceAttributes]:
+    """read either metadata or attributes for a specific trace from an opened cachefile
+
+    args
+    ----
+    f: h5py.File
+        the opened cachefile
+    fname: FileName
+        the path of the cachefile
+    idx: int
+        the index of the trace
+    location: Tuple[str, str]
+        origin and dataset key of the trace, see :func:`locate_trace`
+    what: str 
+        whether to load 'data' or 'attrs'. defaults to attrs
+    refresh: bool
+        whether to refresh the metadata of the dataset before reading. Necessary if the file might have been changed by another writer since it was opened
+    """
+    origin, key = location
+    group = f[origin]
+    contiguous = is_contiguous(group)
+    if contiguous:
+        dset = group["trace_attrs"] if what == "attrs" else group["traces"]
+    else:
+        dset = group["traces"][key]
+    if refresh:
+        dset.id.refresh()  # load fresh from file
+    if what == "attrs":
+        # attrs = parse_traceattrs(dset.attrs)
+        # origin attributes are stored once per origin, and can be overwritten by the trace
+        attrs = asdict(group.attrs)
+        if contiguous:
+            row = json.loads(dset.asstr()[key])
+            attrs.update({k: _as_str(v) for k, v in row.items()})
+        else:
+            attrs.update(asdict(dset.attrs))
+        # attrs["origin"] = encode(str(origin))
+        attrs["origin"] = encode(origin)
+        attrs["cache_file"] = encode(fname)
+        attrs["cache_file_index"] = encode(idx)
+        # check_metadata(str(attrs["readout"]), attrs)
+        return attrs
+    elif what == "data":
+        if contiguous:
+            return np.asanyarray(dset[key], dtype=float)
+        data = parse_tracedata(dset)
+        return data
+    else:
+        raise NotImplementedError(f"{what} can not be loaded")
+
+
+def read_tracedata_stack(f: h5py.File, locations: List[TraceLocation]) -> TraceData:
+    """read the data of many traces from an opened cachefile and stack them
+
+    args
+    ----
+    f: h5py.File
+        the opened cachefile
+    locations: List[TraceLocation]
+        origin and key of each trace, see :func:`locate_trace`
+    returns
+    -------
+    data: TraceData
+        the data of all traces, stacked along the first axis
+
+    For the contiguous layout, the traces of an origin are read with a single hyperslab selection.
+    """
+    if len(locations) == 0:
+        raise IndexError("No traces selected")
+    parts = []
+    for origin, run in groupby(locations, key=lambda location: location[0]):
+        keys = [key for _, key in run]
+        group = f[origin]
+        if is_contiguous(group):
+            dset = group["traces"]
+            if keys == list(range(keys[0], keys[-1] + 1)):
+                part = dset[keys[0] : keys[-1] + 1]
+            elif keys == sorted(set(keys)):
+                part = dset[keys]
+            else:
+                part = np.stack([dset[key] for key in keys])
+            parts.append(np.asanyarray(part, dtype=float))
+        else:
+            parts.append(np.stack([parse_tracedata(group["traces"][k]) for k in keys]))
+    return np.concatenate(parts)
+
+
+_data_versions: Dict[Tuple[str, int], int] = dict()
+
+
+def data_version(fname: FileName, idx: int) -> int:
+    "return how often the data of a trace was overwritten with :func:`write_tracedata` during this session"
+    return _data_versions.get((str(Path(fname).expanduser().absolute()), idx), 0)
 
 
 def write_tracedata(cf, data: ndarray, idx: int):
     if type(idx) != int:
         raise ValueError("Index must be an integer")
-    if idx >= 0:
-        cnt = -1  # we use cnt to allow indexing across origin files
-        with write_file(cf.fname) as f:
-            for origin in f.keys():
-                # because keys are stored as strings, the are sorted alphanumerically, but we need them sorted numerically
-                keys = sort_keys(f[origin]["traces"].keys())
-                print(f"CF: Searching through {len(keys)} traces from {origin}")
-                # we use a running index across origin files, so we start at the last index (defaulting to -1, so -1+1=> 0)
-                for ix, key in enumerate(keys, start=cnt + 1):
-                    # if the trace is the one indexed, we load the dset
-                    # fresh from hdd
-                    if idx == ix:
-                        dset = f[origin]["traces"][key]
-                        if dset.shape == data.shape:
-                            dset = f[origin]["traces"][key][:] = data
-                            print(
-                                "CF: Overwriting data for trace #",
-                                idx,
-                                "id:",
-                                key,
-                                "from",
-                                origin,
-                            )
-                            return
-                        else:
-                            print(
-                                "CF: Trace shape #",
-                                idx,
-                                "id:",
-                                key,
-                                "from",
-                                origin,
-                                "does not conform. Can not overwrite",
-                            )
-                            return
-                cnt = ix
+    index = get_trace_index(cf.fname)
+    origin, key = locate_trace(cf.fname, idx)
+    with write_file(cf.fname) as f:
+        written = write_tracedata_into(f, (origin, key), data)
+    if not written:
+        print(
+            "CF: Trace shape #",
+            idx,
+            "id:",
+            key,
+            "from",
+            origin,
+            "does not conform. Can not overwrite",
+        )
+        return
+    print("CF: Overwriting data for trace #", idx, "id:", key, "from", origin)
+    _data_versions[(str(cf.fname), idx)] = data_version(cf.fname, idx) + 1
+    _restamp_trace_index(cf.fname, index)
+
+
+def write_tracedata_into(f: h5py.File, location: TraceLocation, data: ndarray) -> bool:
+    """overwrite the data of a single trace in an opened cachefile
+
+    args
+    ----
+    f: h5py.File
+        the cachefile, opened for writing
+    location: TraceLocation
+        origin and key of the trace, see :func:`locate_trace`
+    data: ndarray
+        the new data, which must have the same shape as the stored data
+    returns
+    -------
+    written: bool
+        whether the data was written, i.e. whether its shape conformed
+    """
+    origin, key = location
+    group = f[origin]
+    if is_contiguous(group):
+        # the row of the stacked dataset is a view of the trace
+        dset, row = group["traces"], key
+        shape = dset.shape[1:]
+    else:
+        dset, row = group["traces"][key], slice(None)
+        shape = dset.shape
+    if shape != data.shape:
+        return False
+    dset[row] = data
+    return True
+
+
+def _native(value: Any) -> Any:
+    "convert a natively stored attribute value into a python builtin"
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _as_str(value: Any) -> str:
+    "return the string representation of an attribute value, whether stored as string or natively"
+    if isinstance(value, str):
+        return value
+    return encode(_native(value))
+
+
+def _parse(value: str) -> Any:
+    "parse an attribute value stored as string, whether written by encode or str"
+    dec = decode(value)
+    if type(dec) == str:
+        try:
+            dec = ast.literal_eval(dec)
+        except (SyntaxError, ValueError):
+            pass
+    return dec
+
+
+def as_typed(value: Any, kind: str) -> Any:
+    """convert an attribute value into its native type for typed storage
+
+    args
+    ----
+    value: Any
+        the value, either as string or already parsed
+    kind: str
+        the type from the schema of the readout, i.e. 'int', 'float' or 'float[3]', see :func:`~.offspect.cache.attrs.get_valid_trace_types`
+    returns
+    -------
+    typed: Any
+        the value as int, float or list of three floats, or None if it does not conform to the kind. Such values are stored as string instead.
+    """
+    if isinstance(value, str):
+        value = _parse(value)
+    value = _native(value)
+    if kind == "int" and type(value) == int:
+        return value
+    if kind == "float" and type(value) in (int, float):
+        return float(value)
+    if (
+        kind == "float[3]"
+        and type(value) in (list, tuple)
+        and len(value) == 3
+        and all(type(v) in (int, float) for v in value)
+    ):
+        return [float(v) for v in value]
+    return None
+
+
+def store_like(existing: Any, value: Any) -> Any:
+    """prepare a value to overwrite an existing attribute value
+
+    If the existing value was stored natively, the new value is stored with the same type, if it conforms. Otherwise, it is encoded as string.
+    """
+    if existing is None or isinstance(existing, str):
+        return encode(value)
+    existing = _native(existing)
+    if type(existing) == int:
+        typed = as_typed(value, "int")
+    elif type(existing) == float:
+        typed = as_typed(value, "float")
+    else:
+        typed = as_typed(value, "float[3]")
+    return encode(value) if typed is None else typed
 
 
 def asdict(attrs: h5py.AttributeManager) -> Dict[str, str]:
     "parse the metadata from a cachefile and return it as dictionary"
-    return dict(attrs)
+    return {key: _as_str(val) for key, val in attrs.items()}
 
 
 def parse_traceattrs(attrs: h5py.AttributeManager) -> MetaData:
@@ -459,6 +1091,9 @@ def parse_traceattrs(attrs: h5py.AttributeManager) -> MetaData:
     """
     d = dict(attrs)
     for key, val in d.items():
+        if not isinstance(val, str):  # stored natively, no need to parse
+            d[key] = _native(val)
+            continue
         try:
             d[key] = ast.literal_eval(val)
         except (SyntaxError, ValueError):  # for subject and filedate
@@ -478,6 +1113,63 @@ def parse_tracedata(dset: h5py.Dataset) -> TraceData:
     return np.asanyarray(dset, dtype=float)
 
 
+def read_origin_attrs(group: h5py.Group, merged: bool = True) -> List[Dict[str, Any]]:
+    """read the unparsed attributes of all traces of an origin group, sorted by their id
+
+    Natively stored attributes are returned as python builtins. Unless merged is False, the attributes of the origin are included, and can be overwritten by the attributes of each trace.
+    """
+    if is_contiguous(group):
+        dset = group["trace_attrs"]
+        dset.id.refresh()  # load fresh from file
+        attrs = [json.loads(row) for row in dset.asstr()[()]]
+    else:
+        attrs = []
+        for key in trace_keys(group):
+            dset = group["traces"][key]
+            dset.id.refresh()  # load fresh from file
+            attrs.append({k: _native(v) for k, v in dset.attrs.items()})
+    if merged:
+        oattrs = asdict(group.attrs)
+        attrs = [{**oattrs, **tattr} for tattr in attrs]
+    return attrs
+
+
+def read_origin_data(group: h5py.Group) -> List[TraceData]:
+    "read the data of all traces of an origin group, sorted by their id"
+    if is_contiguous(group):
+        dset = group["traces"]
+        dset.id.refresh()  # load fresh from file
+        return list(np.asanyarray(dset, dtype=float))
+    traces = []
+    for key in trace_keys(group):
+        dset = group["traces"][key]
+        dset.id.refresh()  # load fresh from file
+        traces.append(parse_tracedata(dset))
+    return traces
+
+
+def recover_origins(cf: CacheFile) -> List[Annotations]:
+    """recover the origin-level annotations from a cachefile, without the annotations of the traces
+
+    args
+    ----
+    cf: CacheFile
+        the cachefile from which to recover
+    returns
+    -------
+    annotations: List[Annotations]
+        a list of annotations with the fields 'origin' and 'attrs' for each origin in the cachefile
+    """
+    with read_file(cf.fname) as f:
+        events = []
+        for origin in f.keys():
+            yml = dict()
+            yml["origin"] = origin
+            yml["attrs"] = parse_traceattrs(f[origin].attrs)
+            events.append(yml)
+    return events
+
+
 def recover_annotations(cf: CacheFile) -> List[Annotations]:
     """"recover the file and annotations from a cachefile
     args
@@ -497,18 +1189,72 @@ def recover_annotations(cf: CacheFile) -> List[Annotations]:
             yml["origin"] = origin
             yml["attrs"] = parse_traceattrs(f[origin].attrs)
             readout = yml["attrs"]["readout"]
-            trace_attrs = []
-            for idx in f[origin]["traces"]:
-                dset = f[origin]["traces"][idx]
-                dset.id.refresh()  # load fresh from file
-                tattr = parse_traceattrs(dset.attrs)
-                # check_metadata(readout, tattr)
-                trace_attrs.append(tattr)
+            trace_attrs = [parse_traceattrs(a) for a in read_origin_attrs(f[origin])]
+            # check_metadata(readout, tattr)
             yml["traces"] = trace_attrs
             events.append(yml)
     return events
 
 
+def _ismissing(value: Any) -> bool:
+    return value is None or value == ""
+
+
+def _isnumber(value: Any) -> bool:
+    return type(value) in (int, float)
+
+
+def as_column(values: List[Any]) -> Union[ndarray, List[Any]]:
+    """convert the parsed values of an attribute across traces into a column
+    
+    Booleans, integers and floats become an ndarray of the respective dtype, where missing values in numeric columns are filled with nan. Coordinates become an array with one row per trace. Anything else is returned unchanged as list.
+    """
+    present = [v for v in values if not _ismissing(v)]
+    if len(present) == 0:
+        return values
+    if len(present) == len(values) and all(type(v) == bool for v in values):
+        return np.asarray(values, dtype=bool)
+    if all(_isnumber(v) for v in present):
+        if len(present) == len(values) and all(type(v) == int for v in values):
+            return np.asarray(values, dtype=int)
+        return np.asarray([nan if _ismissing(v) else v for v in values], dtype=float)
+    if len(present) == len(values) and all(
+        type(v) == list and len(v) == 3 and all(_isnumber(p) for p in v)
+        for v in values
+    ):
+        return np.asarray(values, dtype=float)
+    return values
+
+
+def read_all_trace_attrs(cf: CacheFile) -> Dict[str, Union[ndarray, List[Any]]]:
+    """read the attributes of all traces of a cachefile as columns
+    
+    args
+    ----
+    cf: CacheFile
+        the cachefile from which to read
+    returns
+    -------
+    columns: Dict[str, Union[ndarray, List[Any]]]
+        the parsed attributes of all traces, in the order of the running index across all origins, converted with :func:`as_column`. Additionally, the columns 'origin' and 'cache_file_index' are included.
+    """
+    rows: List[Dict[str, Any]] = []
+    for annotation in recover_annotations(cf):
+        for tattr in annotation["traces"]:
+            row = dict(tattr)
+            row["origin"] = annotation["origin"]
+            row["cache_file_index"] = len(rows)
+            rows.append(row)
+
+    keys: List[str] = []
+    for row in rows:
+        keys.extend(k for k in row.keys() if k not in keys)
+    columns: Dict[str, Union[ndarray, List[Any]]] = dict()
+    for key in keys:
+        columns[key] = as_column([row.get(key, None) for row in rows])
+    return columns
+
+
 def recover_parts(cf: CacheFile) -> Tuple[List[Annotations], List[List[TraceData]]]:
     """recover the two parts of a cachefile, i.e. annotations and traces
     
@@ -531,21 +1277,117 @@ def recover_parts(cf: CacheFile) -> Tuple[List[Annotations], List[List[TraceData
             yml["origin"] = origin
             yml["attrs"] = parse_traceattrs(f[origin].attrs)
 
-            trace_attrs = []
-            trace_data = []
-            for idx in f[origin]["traces"]:
-                dset = f[origin]["traces"][idx]
-                dset.id.refresh()  # load fresh from file
-                trace_attrs.append(parse_traceattrs(dset.attrs))
-                trace_data.append(parse_tracedata(dset))
+            trace_attrs = [parse_traceattrs(a) for a in read_origin_attrs(f[origin])]
+            trace_data = read_origin_data(f[origin])
             yml["traces"] = trace_attrs
             events.append(yml)
             traces.append(trace_data)
     return events, traces
 
 
+def collapse_origin_attrs(
+    attrs: Dict[str, Any], traces: List[Dict[str, Any]]
+) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+    """separate the attributes of an origin from the attributes of its traces
+
+    args
+    ----
+    attrs: Dict[str, Any]
+        the attributes of the origin
+    traces: List[Dict[str, Any]]
+        the attributes of each trace, which might contain copies of the attributes of the origin
+    returns
+    -------
+    attrs: Dict[str, str]
+        the attributes of the origin as strings
+    traces: List[Dict[str, Any]]
+        the attributes of each trace, without copies of the attributes of the origin
+
+    Earlier versions stored a copy of all origin attributes in every trace, and changed e.g. the global_comment only in these copies. Therefore, if all traces agree on a value, it is adopted by the origin. Otherwise, the values of the traces that differ from the origin are kept as their own.
+    """
+    attrs = {str(k): str(v) for k, v in attrs.items()}
+    traces = [{str(k): v for k, v in t.items() if k != "origin"} for t in traces]
+    for key in attrs.keys():
+        values = set(str(t[key]) for t in traces if key in t)
+        if len(values) == 1 and all(key in t for t in traces):
+            attrs[key] = values.pop()
+        for t in traces:
+            if key in t and str(t[key]) == attrs[key]:
+                t.pop(key)
+    return attrs, traces
+
+
+def write_origin(
+    f: h5py.File,
+    settings: Annotations,
+    traces: Union[List[TraceData], np.ndarray],
+    contiguous: bool,
+    typed: bool = False,
+):
+    """write the annotations and traces of a single origin into an opened cachefile
+
+    args
+    ----
+    f: h5py.File
+        the cachefile, opened for writing
+    settings: Annotations
+        the annotations of the origin, with the fields origin, attrs and traces
+    traces: Union[List[TraceData], np.ndarray]
+        the traces of the origin, in the same order as settings["traces"]. Can also be a single array with one trace per row, as e.g. :func:`~.cut_epochs` returns it
+    contiguous: bool
+        whether to store the traces in a single stacked dataset instead of one dataset per trace, see :func:`is_contiguous`
+    typed: bool
+        whether to store the trace attributes natively according to the schema of the readout, see :func:`as_typed`
+    """
+    ofile = f.create_group(settings["origin"])
+    # fill with ofile-attributes, which are stored only once per origin
+    attrs, collapsed = collapse_origin_attrs(settings["attrs"], settings["traces"])
+    for key, val in attrs.items():
+        ofile.attrs.modify(key, val)
+
+    schema = get_valid_trace_types(attrs["readin"], attrs["readout"]) if typed else {}
+    tattrs = []
+    for tattr in collapsed:
+        stored = dict()
+        for k, v in tattr.items():
+            value = as_typed(v, schema[k]) if k in schema else None
+            stored[k] = str(v) if value is None else value
+        tattrs.append(stored)
+
+    if not contiguous:
+        # fill with trace-data and trace-attributes
+        tracegrp = ofile.create_group("traces")
+        for tattr, trace in zip(tattrs, traces):
+            cftrace = tracegrp.create_dataset(str(tattr["id"]), data=trace)
+            for k, v in tattr.items():
+                cftrace.attrs.modify(k, v)
+        return
+
+    ids = [int(tattr["id"]) for tattr in tattrs]
+    order = np.argsort(ids, kind="stable")
+    if isinstance(traces, np.ndarray):
+        stack = np.asarray(traces, dtype=float)[order]
+    else:
+        stack = np.asanyarray([traces[i] for i in order], dtype=float)
+    if len(order) == 0:
+        stack = np.empty((0, 0), dtype=float)
+    ofile.create_dataset(
+        "traces", data=stack, chunks=(1,) + stack.shape[1:] if len(order) else None
+    )
+    ofile.create_dataset("trace_ids", data=np.asarray(ids, dtype=int)[order])
+    ofile.create_dataset(
+        "trace_attrs",
+        data=[json.dumps(tattrs[i]) for i in order],
+        dtype=h5py.string_dtype(),
+    )
+
+
 def populate(
-    tf: FileName, annotations: List[Annotations], traceslist: List[List[TraceData]]
+    tf: FileName,
+    annotations: List[Annotations],
+    traceslist: List[Union[List[TraceData], np.ndarray]],
+    contiguous: bool = False,
+    typed: bool = False,
 ) -> FileName:
     """create a new cachefile from a annotations and traces
     
@@ -555,8 +1397,12 @@ def populate(
         the name of the file to be created. will overwrite an existing file
     annotations: List[Attributes]
         a list of annotation dictionaries
-    traceslist: List[List[TraceData]]
-        a list of list of traces
+    traceslist: List[Union[List[TraceData], np.ndarray]]
+        a list of list of traces, or of arrays with one trace per row, e.g. from :func:`~.cut_epochs`
+    contiguous: bool
+        whether to store the traces of each origin in a single stacked dataset, which is much faster to read and write for large files. Defaults to one dataset per trace. All traces of an origin must have the same shape.
+    typed: bool
+        whether to store numeric trace attributes natively as int, float or float[3] according to the schema of the readout, instead of as strings. This removes parsing when reading and shrinks the file. Both are read transparently, see :func:`as_typed`.
     
     returns
     -------
@@ -570,26 +1416,75 @@ def populate(
         print(f"Merging into {tf.name} from:")
         for settings, traces in zip(annotations, traceslist):
             print("   -", settings["origin"])
+            write_origin(f, settings, traces, contiguous=contiguous, typed=typed)
+    return tf
 
-            ofile = f.create_group(settings["origin"])
-            # fill with ofile-attributes
-            attrs = settings["attrs"]
-            for key, val in attrs.items():
-                ofile.attrs.modify(str(key), str(val))
-
-            # fill with trace-data and trace-attributes
-            tracegrp = ofile.create_group("traces")
 
-            for tattr, trace in zip(settings["traces"], traces):
-                tattr.update(**attrs)
-                idx = str(tattr["id"])
-                cftrace = tracegrp.create_dataset(idx, data=trace)
-                for k, v in tattr.items():
-                    cftrace.attrs.modify(str(k), str(v))
-    return tf
+def convert_layout(
+    source: FileName, to: FileName, contiguous: bool = True, typed: bool = False
+) -> FileName:
+    """convert a cachefile between the per-trace and the contiguous layout
 
+    args
+    ----
+    source: FileName
+        the cachefile to be converted
+    to: FileName
+        the name of the converted file. Will be overwritten, if already existing
+    contiguous: bool
+        whether to convert into the contiguous layout or back into the per-trace layout
+    typed: bool
+        whether to store the trace attributes natively, see :func:`populate`
+    returns
+    -------
+    fname: FileName
+        the name of the converted file
 
-def merge(to: FileName, sources: List[FileName]) -> FileName:
+    The origins are converted one after another, so only the traces of a single origin have to fit into memory.
+    """
+    source = Path(source).expanduser().absolute()
+    to = Path(to).expanduser().absolute()
+    check_valid_suffix(to)
+    if to == source:
+        raise ValueError("Can not convert a cachefile into itself")
+    if to.exists():
+        print(f"CONVERT:WARNING: {to.name} already exists and will be overwritten")
+        to.unlink()
+    with read_file(source) as f, h5py.File(to, "w") as t:
+        for origin in f.keys():
+            settings: Annotations = dict()
+            settings["origin"] = origin
+            settings["attrs"] = asdict(f[origin].attrs)
+            settings["traces"] = read_origin_attrs(f[origin])
+            write_origin(t, settings, read_origin_data(f[origin]), contiguous, typed)
+    return to
+
+
+def append_origin(
+    fname: FileName,
+    annotation: Annotations,
+    traces: List[TraceData],
+    contiguous: bool = None,
+    typed: bool = False,
+):
+    """append a new origin to an existing cachefile in place, see :meth:`CacheFile.append`"""
+    fname = Path(fname).expanduser().absolute()
+    a = recover_origins(CacheFile(fname))
+    new: Annotations = dict()
+    new["origin"] = annotation["origin"]
+    new["attrs"] = parse_traceattrs(
+        {str(k): str(v) for k, v in annotation["attrs"].items()}
+    )
+    check_consistency(a + [new])
+    with write_file(fname) as f:
+        if contiguous is None:  # follow the layout of the existing origins
+            contiguous = len(a) > 0 and all(is_contiguous(f[o]) for o in f.keys())
+        print(f"Appending to {fname.name}:")
+        print("   -", annotation["origin"])
+        write_origin(f, annotation, traces, contiguous=contiguous, typed=typed)
+
+
+def merge(to: FileName, sources: List[FileName], append: bool = False) -> FileName:
     """merge one or more cachefiles into one file
     args
     ----
@@ -597,27 +1492,36 @@ def merge(to: FileName, sources: List[FileName]) -> FileName:
         the name of the file to be written into. Will be overwritten, if already existing
     sources: List[FileName]
         a list of source files from which we will read traces and annotations
+    append: bool
+        whether to append the sources to the target file in place, if it already exists, instead of overwriting it
     returns
     -------
     fname: FileName
         the name of the target file
-    
+
+    The origin groups are copied from the sources into the target as they are, e.g. keeping their layout. Therefore, memory use does not grow with the size of the sources.
     """
     sources = [Path(source).expanduser().absolute() for source in sources]
     to = Path(to).expanduser().absolute()
     check_valid_suffix(to)
-    if to.exists():
+    if to.exists() and not append:
         print(f"MERGE:WARNING: {to.name} already exists and will be overwritten")
         to.unlink()
 
+    # only the origin-level information is needed to check consistency
     a: List[Dict] = []
-    t: List[ndarray] = []
+    if to.exists():
+        a.extend(recover_origins(CacheFile(to)))
     for source in sources:
-        attrs, traces = recover_parts(CacheFile(source))
-        a.extend(attrs)
-        t.extend(traces)
-
-    print(a)
+        a.extend(recover_origins(CacheFile(source)))
     check_consistency(a)
-    fname = populate(tf=to, annotations=a, traceslist=t)
-    return fname
+
+    # copy the origin groups natively, so that the traces never pass through memory
+    with h5py.File(to, "a") as t:
+        print(f"Merging into {to.name} from:")
+        for source in sources:
+            with read_file(source) as f:
+                for origin in f.keys():
+                    print("   -", origin)
+                    f.copy(f[origin], t, name=origin)
+    return to
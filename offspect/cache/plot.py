@@ -7,7 +7,7 @@ from numpy.core.numeric import NaN
 from numpy.linalg import pinv
 import matplotlib.pyplot as plt
 from offspect.cache.attrs import decode
-from math import nan
+from math import nan, isnan
 import matplotlib
 from tempfile import TemporaryDirectory
 from pathlib import Path
@@ -288,6 +288,11 @@ def get_glass_bg(tmpdir: Path):
     return im
 
 
+def isvalue(x) -> bool:
+    "whether x is a number, and not nan"
+    return isinstance(x, (int, float, np.integer, np.floating)) and not isnan(x)
+
+
 def plot_map(
     cachefiles: List[CacheFile], foo=lambda x: x, ignore_rejected=True, **kwargs
 ):
@@ -318,18 +323,21 @@ def plot_map(
     total = 0.0
     for cf in cachefiles:
         total += len(cf)
-        for trace, tattr in cf:
-            if not ignore_rejected or not decode(tattr["reject"]):
-                npk = decode(tattr["neg_peak_magnitude_uv"])
-                ppk = decode(tattr["pos_peak_magnitude_uv"])
-                if ppk is not None and npk is not None:
+        tattrs = cf.get_all_trace_attrs()
+        for reject, npk, ppk, xyz in zip(
+            tattrs["reject"],
+            tattrs["neg_peak_magnitude_uv"],
+            tattrs["pos_peak_magnitude_uv"],
+            tattrs["xyz_coords"],
+        ):
+            if not ignore_rejected or not reject:
+                if isvalue(ppk) and isvalue(npk):
                     val = ppk - npk
                 else:
                     val = 0
                     uninspected += 1.0
 
-                xyz = decode(tattr["xyz_coords"])
-                coords.append(xyz)
+                coords.append(xyz.tolist() if isinstance(xyz, np.ndarray) else xyz)
                 values.append(val)
 
     rejected = total - len(values)
@@ -67,3 +67,11 @@ valid_trace_keys = [
     "comment",
     "examiner",
 ]  #: information contained in every trace, regardless of readout
+
+valid_trace_types = {
+    "id": "int",
+    "event_sample": "int",
+    "event_time": "float",
+    "onset_shift": "int",
+    "time_since_last_pulse_in_s": "float",
+}  #: native types of trace keys for typed storage, valid are 'int', 'float' and 'float[3]'
@@ -1,6 +1,10 @@
 import numpy as np
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from math import gcd
+from typing import Tuple, List, Dict
 from offspect.cache.attrs import decode, encode
-from offspect.cache.file import TraceAttributes, TraceData
+from offspect.types import TraceAttributes, TraceData
 
 # %%
 def baseline(data, attrs):
@@ -24,8 +28,9 @@ def linenoise(data, attrs):
     timestep = 1 / fs
     original_len = len(signal)
     filter_order = 100
-    while len(signal) < fs:
-        signal = np.pad(signal, (1, 0), "constant", constant_values=(0))
+    # pad once with as many samples as padding one sample at a time until fs is reached
+    pad = max(0, int(np.ceil(fs)) - len(signal))
+    signal = np.pad(signal, (pad, 0), "constant", constant_values=(0))
     fourier = np.fft.fft(signal)
     freq = np.fft.fftfreq(len(signal), d=timestep)
     fidx = int(np.where(freq == 50)[0][0])
@@ -40,13 +45,183 @@ def flipsign(data, attrs):
     return -data
 
 
+@lru_cache(maxsize=64)
+def linenoise_kernel(
+    fs: float, nfft: int, freq: float = 50.0, harmonics: bool = True, width: float = 0.0
+) -> Tuple[Tuple[np.ndarray, np.ndarray], ...]:
+    """return the rfft bins affected by line noise, and their neighbours
+    
+    args
+    ----
+    fs: float
+        the samplingrate
+    nfft: int
+        the length of the fft
+    freq: float
+        the frequency of the line noise, e.g. 50 or 60 Hz
+    harmonics: bool
+        whether to include all harmonics below the nyquist frequency
+    width: float
+        the half-width in Hz of the band around each line frequency, at least half a bin
+
+    returns
+    -------
+    kernel: Tuple[Tuple[ndarray, ndarray], ...]
+        for each line frequency, the bins within the band, and the bins in the bands of the same width directly adjacent to it on both sides
+
+    The kernel is cached, as it only depends on the arguments, which are identical for all traces in a cachefile.
+    """
+    bins = np.fft.rfftfreq(nfft, d=1 / fs)
+    df = fs / nfft
+    width = max(width, df / 2)
+    lines = [freq]
+    while harmonics and lines[-1] + freq < fs / 2:
+        lines.append(lines[-1] + freq)
+    kernel = []
+    for line in lines:
+        distance = np.abs(bins - line)
+        band = np.flatnonzero(distance <= width)
+        if len(band) == 0:  # the line falls between two bins
+            band = np.array([distance.argmin()])
+        near = np.flatnonzero((distance > width) & (distance <= 2 * width + df))
+        kernel.append((band, near))
+    return tuple(kernel)
+
+
+def remove_linenoise(
+    data,
+    fs: float,
+    freq: float = 50.0,
+    harmonics: bool = True,
+    method: str = "interpolate",
+    width: float = 0.0,
+    axis: int = 0,
+):
+    """remove line noise and its harmonics from data
+    
+    args
+    ----
+    data: ndarray
+        the data, e.g. a single trace or a stack of traces
+    fs: float
+        the samplingrate
+    freq: float
+        the frequency of the line noise, e.g. 50 or 60 Hz
+    harmonics: bool
+        whether to remove all harmonics below the nyquist frequency, too
+    method: str
+        'notch' sets the affected bins to zero. 'interpolate' sets their amplitude to the mean amplitude of the neighbouring bins and keeps their phase, which causes less ringing
+    width: float
+        the half-width in Hz of the band around each line frequency. Defaults to only the bin of the line frequency
+    axis: int
+        the axis of the samples
+
+    returns
+    -------
+    data: ndarray
+        the data without line noise
+
+    The data is zero-padded once at the start to the next length for which the line frequency falls exactly on a bin of the rfft, which for most samplingrates requires no or only few samples. See :func:`linenoise_kernel`.
+    """
+    data = np.moveaxis(np.asanyarray(data, dtype=float), axis, -1)
+    original_len = data.shape[-1]
+    if float(fs).is_integer() and float(freq).is_integer():
+        period = int(fs) // gcd(int(fs), int(freq))
+    else:
+        period = int(np.ceil(fs))
+    nfft = max(1, int(np.ceil(original_len / period))) * period
+    width_ = [(0, 0)] * (data.ndim - 1) + [(nfft - original_len, 0)]
+    signal = np.pad(data, width_, "constant", constant_values=0)
+    fourier = np.fft.rfft(signal, axis=-1)
+    for band, near in linenoise_kernel(float(fs), nfft, float(freq), harmonics, width):
+        if method == "notch" or len(near) == 0:
+            fourier[..., band] = 0
+        elif method == "interpolate":
+            amplitude = np.abs(fourier[..., near]).mean(-1, keepdims=True)
+            magnitude = np.abs(fourier[..., band])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                phase = np.where(magnitude > 0, fourier[..., band] / magnitude, 1)
+            fourier[..., band] = amplitude * phase
+        else:
+            raise NotImplementedError(f"{method} is not a valid method")
+    signal = np.fft.irfft(fourier, n=nfft, axis=-1)[..., -original_len:]
+    return np.moveaxis(signal, -1, axis)
+
+
+def linenoise_50hz(data, attrs):
+    return remove_linenoise(data, decode(attrs["samplingrate"]), 50.0)
+
+
+def linenoise_60hz(data, attrs):
+    return remove_linenoise(data, decode(attrs["samplingrate"]), 60.0)
+
+
 PreProcessor = {
     "baseline": baseline,
     "detrend": detrend,
     "linenoise": linenoise,
+    "linenoise_50hz": linenoise_50hz,
+    "linenoise_60hz": linenoise_60hz,
     "flipsign": flipsign,
 }
 
+# %%
+# the batch variants operate on a stack of traces with the shape (n_traces, n_samples[, n_channels]), with the parameters of each trace given as vectors in params
+
+
+def baseline_many(data, params):
+    stop = params["samples_pre_event"] + params["onset_shift"]
+    n = data.shape[1]
+    stop = np.clip(np.where(stop < 0, stop + n, stop), 0, n)  # as in slicing
+    mask = np.arange(n)[None, :] < stop[:, None]
+    mask = mask.reshape(mask.shape + (1,) * (data.ndim - 2))
+    count = stop.reshape((-1,) + (1,) * (data.ndim - 2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bl = np.where(mask, data, 0).sum(1) / count
+    return data - bl[:, None]
+
+
+def detrend_many(data, params):
+    slope = np.mean(np.diff(data, axis=1), 1)
+    ramp = np.arange(0, data.shape[1]).reshape((1, -1) + (1,) * (data.ndim - 2))
+    return data - ramp * slope[:, None]
+
+
+def linenoise_many(data, params):
+    fs = params["samplingrate"]
+    original_len = data.shape[1]
+    pad = max(0, int(np.ceil(fs)) - original_len)
+    width = [(0, 0), (pad, 0)] + [(0, 0)] * (data.ndim - 2)
+    signal = np.pad(data, width, "constant", constant_values=0)
+    fourier = np.fft.fft(signal, axis=1)
+    freq = np.fft.fftfreq(signal.shape[1], d=1 / fs)
+    fidx = int(np.where(freq == 50)[0][0])
+    fourier[:, fidx] = 0
+    signal = np.real(np.fft.ifft(fourier, axis=1))
+    return signal[:, -original_len:]
+
+
+def flipsign_many(data, params):
+    return -data
+
+
+def linenoise_50hz_many(data, params):
+    return remove_linenoise(data, params["samplingrate"], 50.0, axis=1)
+
+
+def linenoise_60hz_many(data, params):
+    return remove_linenoise(data, params["samplingrate"], 60.0, axis=1)
+
+
+BatchPreProcessor = {
+    "baseline": baseline_many,
+    "detrend": detrend_many,
+    "linenoise": linenoise_many,
+    "linenoise_50hz": linenoise_50hz_many,
+    "linenoise_60hz": linenoise_60hz_many,
+    "flipsign": flipsign_many,
+}  #: the batch variants of the steps in PreProcessor, see :func:`process_many`
+
 
 def process_data(
     data, attrs, key: str = "_log", delim: str = " on ", verbose: bool = True
@@ -80,3 +255,187 @@ def process_data(
             print("No processing steps cached")
     return data
 
+
+
+def process_many(
+    data,
+    attrs: List[TraceAttributes],
+    key: str = "_log",
+    delim: str = " on ",
+    verbose: bool = True,
+) -> TraceData:
+    """return a stack of TraceData processed by the steps in the field indexed by key
+                
+        args
+        ----
+        data: TraceData
+            the tracedata of many traces, stacked with the shape (n_traces, n_samples[, n_channels])
+        attrs: List[TraceAttributes]
+            the traceattributes of each trace
+        key: str
+            which field is used for logging the processing steps
+
+        returns
+        -------
+        data: TraceData 
+            the stack of tracedata, but each trace processed with its steps, see :func:`process_data`
+
+        Traces with identical steps are processed together, with each step applied only once to the whole group by its batch variant from :data:`BatchPreProcessor`.
+        """
+    data = np.asanyarray(data, dtype=float)
+    out = data.copy()
+    groups: Dict[Tuple, List[int]] = defaultdict(list)
+    for ix, a in enumerate(attrs):
+        groups[(a.get(key, None), a.get("samplingrate", None))].append(ix)
+    for (log, fs), members in groups.items():
+        log = [] if log is None else decode(log)
+        if len(log) == 0:
+            if verbose:
+                print("No processing steps cached for", len(members), "traces")
+            continue
+        params = dict()
+        params["samplingrate"] = None if fs is None else decode(fs)
+        params["samples_pre_event"] = np.asarray(
+            [decode(attrs[ix]["samples_pre_event"]) for ix in members], dtype=int
+        )
+        params["onset_shift"] = np.asarray(
+            [decode(attrs[ix].get("onset_shift", "0")) or 0 for ix in members],
+            dtype=int,
+        )
+        group = data[members]
+        for event in log:
+            step, when = event.split(delim)
+            if verbose:
+                print("STEPS: Replaying", step, "from", when, "on", len(members), "traces")
+            group = BatchPreProcessor[step](group, params)
+        out[members] = group
+    return out
+
+
+PROCESSED_CACHE_BYTES = 256 * 1024 ** 2  #: how much memory the cache of processed traces may use
+_processed: "OrderedDict[Tuple, TraceData]" = OrderedDict()
+_processed_bytes = 0  #: how much memory the cache of processed traces uses
+_processed_versions: Dict[Tuple[str, int], Tuple] = dict()
+
+
+def process_cached(
+    cf,
+    idx: int,
+    attrs: TraceAttributes = None,
+    key: str = "_log",
+    verbose: bool = True,
+) -> TraceData:
+    """return the TraceData of a trace processed by the steps in the field indexed by key
+                
+        args
+        ----
+        cf: CacheFile
+            the cachefile
+        idx: int
+            the index of the trace
+        attrs:TraceAttributes
+            the traceattributes, read from the cachefile if not given
+        key: str
+            which field is used for logging the processing steps
+
+        returns
+        -------
+        data: TraceData 
+            the date stored for this trace, but processed with the steps performed, see :func:`process_data`
+
+        The processed data is cached, until the processing steps, the attributes they depend on, or the data itself changes, i.e. is overwritten with :func:`~.write_tracedata` or the file is changed by another process. Least recently used traces are evicted once the cache exceeds :data:`PROCESSED_CACHE_BYTES`.
+        """
+    from offspect.cache.file import data_version, file_version
+
+    global _processed_bytes
+    if attrs is None:
+        attrs = cf.get_trace_attrs(idx)
+    fname = str(cf.fname)
+    version = (data_version(fname, idx), file_version(fname))
+    depends = (key, "onset_shift", "samples_pre_event", "samplingrate")
+    ckey = (fname, idx, version, tuple(attrs.get(k, None) for k in depends))
+    if ckey in _processed:
+        _processed.move_to_end(ckey)
+        return _processed[ckey].copy()
+
+    # drop entries whose data has since been overwritten, by us or by another
+    # process. we only look for them if the version of this trace changed
+    if _processed_versions.get((fname, idx), version) != version:
+        for old in [k for k in _processed.keys() if k[:2] == (fname, idx)]:
+            _processed_bytes -= _processed.pop(old).nbytes
+    _processed_versions[(fname, idx)] = version
+    data = process_data(cf.get_trace_data(idx), attrs, key=key, verbose=verbose)
+    _processed[ckey] = data.copy()
+    _processed_bytes += data.nbytes
+    while _processed_bytes > PROCESSED_CACHE_BYTES:
+        _processed_bytes -= _processed.popitem(last=False)[1].nbytes
+    return data
+
+
+def clear_processed():
+    "clear the cache of processed traces, see :func:`process_cached`"
+    global _processed_bytes
+    _processed.clear()
+    _processed_versions.clear()
+    _processed_bytes = 0
+
+
+def _replay(item: Tuple[TraceData, TraceAttributes, str]) -> TraceData:
+    data, attrs, key = item
+    return process_data(data, attrs, key=key, verbose=False)
+
+
+def apply_steps(cf, to=None, key: str = "_log", processes: int = 1, verbose=True):
+    """apply the processing steps of all traces permanently to their data
+
+    args
+    ----
+    cf: CacheFile
+        the cachefile whose traces will be processed
+    to: FileName
+        if given, the cachefile is copied to this file first, and only the copy is changed. Will be overwritten, if already existing. Must be a :code:`.hdf5`-file other than the cachefile
+    key: str
+        which field is used for logging the processing steps
+    processes: int
+        how many processes replay the steps, which pays off for large multi-channel traces
+    returns
+    -------
+    cf: CacheFile
+        the cachefile with processed data and cleared processing steps
+
+    All traces are processed with :func:`process_data`, written back in a single session, and their steps are cleared afterwards. This is the same as saving the data in the GUI, but for all traces at once.
+    """
+    from offspect.cache.file import CacheFile, check_valid_suffix
+    from concurrent.futures import ProcessPoolExecutor
+    from pathlib import Path
+    import shutil
+
+    if to is not None:
+        to = Path(to).expanduser().absolute()
+        check_valid_suffix(to)
+        if to.resolve() == Path(cf.fname).resolve():
+            raise ValueError("Can not apply the steps into the cachefile itself")
+        shutil.copyfile(cf.fname, to)
+        cf = CacheFile(to)
+
+    with cf.open("r+") as session:
+        attrs = [session.get_trace_attrs(ix) for ix in range(len(session))]
+        todo = [ix for ix, a in enumerate(attrs) if decode(a.get(key, "[]")) != []]
+        items = ((session.get_trace_data(ix), attrs[ix], key) for ix in todo)
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                processed = list(pool.map(_replay, items, chunksize=16))
+        else:
+            processed = [_replay(item) for item in items]
+        updates = dict()
+        for ix, data in zip(todo, processed):
+            session.set_trace_data(ix, data)
+            updates[ix] = {
+                key: encode([]),
+                "cache_file": attrs[ix]["cache_file"],
+                "cache_file_index": attrs[ix]["cache_file_index"],
+            }
+        session.update_many(updates)
+    if verbose:
+        print(f"APPLY: Applied the processing steps of {len(todo)} traces in {cf.fname}")
+    return cf
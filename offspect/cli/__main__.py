@@ -4,7 +4,15 @@ import argparse
 from ast import literal_eval
 from offspect.cli.tms import cli_tms
 from offspect.cli.tms import VALID_READOUTS as valid_tms_readouts
-from offspect.cli.various import cli_gui, cli_merge, cli_peek, cli_plot
+from offspect.cli.various import (
+    cli_gui,
+    cli_merge,
+    cli_peek,
+    cli_plot,
+    cli_convert,
+    cli_estimate,
+    cli_apply,
+)
 
 
 def get_parser() -> argparse.ArgumentParser:
@@ -33,7 +41,7 @@ def get_parser() -> argparse.ArgumentParser:
     merge.add_argument(
         "-t",
         "--to",
-        help="filename to merge into. May not already exist",
+        help="filename to merge into. Will be overwritten, unless --append is given",
         type=str,
         required=True,
         dest="to",
@@ -47,6 +55,95 @@ def get_parser() -> argparse.ArgumentParser:
         dest="sources",
     )
     merge.add_argument("--verbose", "-v", help="be more verbose", action="store_true")
+    merge.add_argument(
+        "--append",
+        help="append to the target file in place, if it already exists, instead of overwriting it",
+        action="store_true",
+        dest="append",
+    )
+
+    # CONVERT -----------------------------------------------------------------
+    convert = subparsers.add_parser(
+        name="convert",
+        help="convert a cachefile into the contiguous layout, which stores all traces of an origin in a single dataset",
+    )
+    convert.add_argument("fname", help="filename of the cachefile to convert", type=str)
+    convert.add_argument(
+        "-t",
+        "--to",
+        help="filename to convert into. Will be overwritten, if already existing",
+        type=str,
+        required=True,
+        dest="to",
+    )
+    convert.add_argument(
+        "--per-trace",
+        help="convert back into the layout with one dataset per trace",
+        action="store_true",
+        dest="per_trace",
+    )
+    convert.add_argument(
+        "--typed",
+        help="store numeric trace attributes natively instead of as strings",
+        action="store_true",
+        dest="typed",
+    )
+
+    # ESTIMATE ----------------------------------------------------------------
+    estimate = subparsers.add_parser(
+        name="estimate",
+        help="estimate latency and magnitude of the negative and positive peak for all traces of a cachefile",
+    )
+    estimate.add_argument(
+        "-f",
+        "--filename",
+        help="the cachefile to be annotated",
+        type=str,
+        required=True,
+        dest="fname",
+    )
+    estimate.add_argument(
+        "-w",
+        "--window",
+        nargs=2,
+        help="start and end of the search window in ms after the onset. Defaults to 15 120",
+        type=float,
+        required=False,
+        default=[15, 120],
+        dest="window",
+    )
+
+    # APPLY -------------------------------------------------------------------
+    apply = subparsers.add_parser(
+        name="apply",
+        help="apply the logged processing steps permanently to the data of all traces of a cachefile",
+    )
+    apply.add_argument(
+        "-f",
+        "--filename",
+        help="the cachefile to be processed",
+        type=str,
+        required=True,
+        dest="fname",
+    )
+    apply.add_argument(
+        "-t",
+        "--to",
+        help="filename to write the processed cachefile to. Leave empty to process the file in place",
+        type=str,
+        required=False,
+        default=None,
+        dest="to",
+    )
+    apply.add_argument(
+        "-j",
+        "--processes",
+        help="how many processes to use",
+        type=int,
+        required=False,
+        default=1,
+        dest="processes",
+    )
 
     # TMS ---------------------------------------------------------------------
 
@@ -97,11 +194,19 @@ def get_parser() -> argparse.ArgumentParser:
         "-e",
         "--events",
         nargs="+",
-        help="<Required> select events, e.g. stream and name or names depending on protocol",
+        help="<Required> select events, e.g. stream and name or names depending on protocol, or artifact and a channel to detect the pulses in",
         required=False,
         type=str,
         dest="select_events",
     )
+    tms.add_argument(
+        "--xdf-cache",
+        type=str,
+        help="a directory to cache parsed xdf-files in, defaults to the environment variable OFFSPECT_XDF_CACHE",
+        required=False,
+        default=None,
+        dest="xdf_cache",
+    )
 
     # GUI ---------------------------------------------------------------------
     gui = subparsers.add_parser(name="gui", help="start the visual inspection GUI")
@@ -162,6 +267,12 @@ def main():
         cli_peek(args)
     elif args.sub == "merge":
         cli_merge(args)
+    elif args.sub == "convert":
+        cli_convert(args)
+    elif args.sub == "estimate":
+        cli_estimate(args)
+    elif args.sub == "apply":
+        cli_apply(args)
     elif args.sub == "tms":
         cli_tms(args)
     elif args.sub == "gui":
@@ -3,9 +3,12 @@ from offspect.cache.file import CacheFile, populate
 import argparse
 import yaml
 from typing import List
-from liesl.files.xdf.inspect_xdf import peek
 from offspect.cache.readout import get_valid_readouts
-from offspect.input import get_protocol_handler
+from offspect.input import (
+    get_protocol_handler,
+    get_protocol_streams,
+    get_protocol_streaming,
+)
 
 READIN = Path(__file__).stem
 VALID_READOUTS: List[str] = get_valid_readouts(READIN)
@@ -39,6 +42,10 @@ def cli_tms(args: argparse.Namespace):
             
             offspect tms -f mapping_contra_R004.xdf -t map.hdf5 -pp 100 100 -r cmep -c EDC_L
 
+        If the marker streams are missing, detect the pulses from the TMS artifact in a channel instead::
+
+            offspect tms -f mapping_contra_R004.xdf -t map.hdf5 -pp 100 100 -r cmep -c EDC_L -e artifact EDC_L
+
         
 
     """
@@ -53,10 +60,9 @@ def cli_tms(args: argparse.Namespace):
         protocol = "cnt"
     elif ".xdf" in suffixes.keys():
         protocol = "xdf"
-        from offspect.protocols.xdf import has_localite, has_spongebob
+        from offspect.protocols.xdf import has_localite, has_spongebob, scan_headers
 
-        sinfos = peek(suffixes[".xdf"], at_most=99, max_duration=1)
-        stream_names = [sinfo["name"] for sinfo in sinfos]
+        stream_names = [h["key"] for h in scan_headers(suffixes[".xdf"])]
         # check whether spongebob is present
         if has_spongebob(stream_names):
             protocol = "xdfspongebob"
@@ -72,6 +78,21 @@ def cli_tms(args: argparse.Namespace):
     prepare_annotations, cut_traces = get_protocol_handler(
         READIN, args.readout, protocol
     )
+    if protocol.startswith("xdf"):
+        from offspect.protocols.xdf import load_streams
+
+        # parse the file only once, and only the streams the handler needs,
+        # and share them between both phases. if the handler streams the
+        # samples from the file, only the time_stamps of the data are loaded
+        select = get_protocol_streams(READIN, args.readout, protocol)
+        select += [args.channel] + list(args.select_events or [])[:1]
+        if "artifact" in select:
+            # the pulses are detected by streaming the channel from the file
+            select.remove("artifact")
+        samples = not get_protocol_streaming(READIN, args.readout, protocol)
+        streams = load_streams(
+            suffixes[".xdf"], cachedir=args.xdf_cache, select=select, samples=samples
+        )
 
     # MATLAB PROTOCOL ---------------------------------------------------------
     if protocol == "mat":
@@ -151,8 +172,9 @@ def cli_tms(args: argparse.Namespace):
             post_in_ms=float(args.prepost[1]),
             event_stream=event_stream,
             event_name=event_name,
+            streams=streams,
         )
-        traces = cut_traces(suffixes[".xdf"], annotation)
+        traces = cut_traces(suffixes[".xdf"], annotation, streams=streams)
     # XDF WITHOUT COORDINATES in STREAM ---------------------------------------
     elif protocol == "xdfxml":
         # if an xml file is present, use that one to fall back to it in case there are no coordinates saved in the streams
@@ -164,8 +186,9 @@ def cli_tms(args: argparse.Namespace):
             event_name=args.select_events[1],
             event_stream=args.select_events[0],
             xmlfile=suffixes[".xml"],
+            streams=streams,
         )
-        traces = cut_traces(suffixes[".xdf"], annotation)
+        traces = cut_traces(suffixes[".xdf"], annotation, streams=streams)
     elif protocol == "xdfnolocalite":
         annotation = prepare_annotations(  # type: ignore
             xdffile=suffixes[".xdf"],
@@ -173,6 +196,7 @@ def cli_tms(args: argparse.Namespace):
             channel=args.channel,
             pre_in_ms=float(args.prepost[0]),
             post_in_ms=float(args.prepost[1]),
+            streams=streams,
         )
     elif protocol == "xdfspongebob":
         annotation = prepare_annotations(
@@ -184,8 +208,9 @@ def cli_tms(args: argparse.Namespace):
             event_mark=1,
             event_name="Spongebob-Trigger",
             comment_name="Stimulus comment",
+            streams=streams,
         )
-        traces = cut_traces(suffixes[".xdf"], annotation)
+        traces = cut_traces(suffixes[".xdf"], annotation, streams=streams)
     else:
         print(f"Handling {protocol} for {READIN}-{args.readout} is ot implemented")
     # ---------------
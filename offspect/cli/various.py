@@ -12,7 +12,7 @@ def cli_gui(args: argparse.Namespace):
 
 def cli_peek(args: argparse.Namespace):
     from offspect.api import CacheFile, decode
-    from offspect.cache.steps import process_data
+    from offspect.cache.steps import process_many
     from collections import defaultdict
     import numpy as np
 
@@ -20,9 +20,14 @@ def cli_peek(args: argparse.Namespace):
     print(cf)
 
     D: defaultdict = defaultdict(list)
-    for ix, (data, attrs) in enumerate(cf):
-        data = process_data(data, attrs, verbose=False)
-        traceID = attrs["id"]
+    with cf.open("r") as session:
+        attrs = [session.get_trace_attrs(ix) for ix in range(len(session))]
+        stack = []
+        if len(attrs) > 0:
+            stack = session.get_trace_data(slice(0, len(attrs)))
+            stack = process_many(stack, attrs, verbose=False)
+    for ix, data in enumerate(stack):
+        traceID = attrs[ix]["id"]
         D[traceID].append((data, ix))
 
     # overlap = len([key for key, count in D.items() if len(count) > 1])
@@ -47,12 +52,35 @@ def cli_peek(args: argparse.Namespace):
 def cli_merge(args: argparse.Namespace):
     from offspect.cache.file import CacheFile, merge
 
-    tf = merge(to=args.to, sources=args.sources)
+    tf = merge(to=args.to, sources=args.sources, append=args.append)
     if args.verbose:
         print("Content of target file is now:")
         print(CacheFile(tf))
 
 
+def cli_convert(args: argparse.Namespace):
+    from offspect.cache.file import convert_layout
+
+    tf = convert_layout(
+        args.fname, to=args.to, contiguous=not args.per_trace, typed=args.typed
+    )
+    print(f"Converted {args.fname} into {tf}")
+
+
+def cli_estimate(args: argparse.Namespace):
+    from offspect.cache.file import CacheFile
+    from offspect.cache.estimate import estimate_parameters
+
+    estimate_parameters(CacheFile(args.fname), window=tuple(args.window))
+
+
+def cli_apply(args: argparse.Namespace):
+    from offspect.cache.file import CacheFile
+    from offspect.cache.steps import apply_steps
+
+    apply_steps(CacheFile(args.fname), to=args.to, processes=args.processes)
+
+
 def cli_plot(args: argparse.Namespace):
     from offspect.cache.file import CacheFile
     from offspect.cache.plot import plot_map
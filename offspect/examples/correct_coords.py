@@ -48,10 +48,22 @@ def translate_coords(
     return attrs
 
 
+def translate_all_coords(
+    cf: CacheFile,
+    translation: List[List[float]] = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]],
+):
+    """move the coordinates of all traces in the cachefile by a translation"""
+    with cf.open("r+") as session:
+        updates = dict()
+        for idx in range(len(session)):
+            updates[idx] = translate_coords(session.get_trace_attrs(idx), translation)
+        session.update_many(updates)
+
+
 def calculate_cog(cf: CacheFile) -> List[List[float]]:
     "calculate the center of gravity for each hemisphere"
     key = "xyz_coords"
-    coords = [decode(attrs[key]) for data, attrs in cf]
+    coords = cf.get_all_trace_attrs()[key]
     left, right, vertex = [], [], []
     for pos in coords:
         if pos[0] < 0:
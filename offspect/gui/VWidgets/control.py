@@ -6,16 +6,16 @@ from offspect.cache.attrs import get_valid_trace_keys
 from .textedit import VTextEdit
 from offspect.gui.io import save
 from offspect.cache.file import write_tracedata
-from offspect.cache.steps import process_data
+from offspect.cache.steps import process_cached
+from offspect.cache.estimate import estimate_peaks
 import numpy as np
 from datetime import datetime
 
 def _change_latency(self, step:int=0):
     window = (15, 120)
     idx = self.trace_idx
-    data = self.cf.get_trace_data(idx)
     tattrs = self.cf.get_trace_attrs(idx)
-    data = process_data(data, tattrs, key="_log")
+    data = process_cached(self.cf, idx, tattrs, key="_log")
     pre = decode(tattrs["samples_pre_event"])
     shift = decode(tattrs["onset_shift"]) or 0
     onset = pre - shift
@@ -348,7 +348,7 @@ class ControlWidget(QtWidgets.QWidget):
 
     def click_linenoise(self):
         idx = self.trace_idx
-        self.log("linenoise", idx)
+        self.log("linenoise_50hz", idx)
         self.callback()
 
     def click_flipsign(self):
@@ -359,31 +359,21 @@ class ControlWidget(QtWidgets.QWidget):
     def click_estimate_parameters(self):
         window = (15, 120)
         idx = self.trace_idx
-        data = self.cf.get_trace_data(idx)
         tattrs = self.cf.get_trace_attrs(idx)
-        data = process_data(data, tattrs, key="_log")
+        data = process_cached(self.cf, idx, tattrs, key="_log")
 
         pre = decode(tattrs["samples_pre_event"])
         shift = decode(tattrs["onset_shift"]) or 0
         fs = decode(tattrs["samplingrate"])
         onset = pre - shift
         print(shift, fs)
-        minlat = int(window[0] * fs / 1000)
-        maxlat = int(window[1] * fs / 1000)
-        a = onset + minlat
-        b = onset + maxlat
-        mep = data[a:b]
-        nlat = mep.argmin()
-        plat = mep.argmax()
-        namp = float(mep[nlat])
-        pamp = float(mep[plat])
-        nlat = mep.argmin() * 1000 / fs
-        plat = mep.argmax() * 1000 / fs
+        peaks = estimate_peaks(data[None], [onset], fs, window)
+        nlat, namp, plat, pamp = (float(p[0]) for p in peaks)
         print("Estimating latencies to be", nlat, plat)
         print("Estimating amplitudes to be", namp, pamp)
-        tattrs["neg_peak_latency_ms"] = encode(float(nlat + window[0]))
+        tattrs["neg_peak_latency_ms"] = encode(nlat)
         tattrs["neg_peak_magnitude_uv"] = encode(namp)
-        tattrs["pos_peak_latency_ms"] = encode(float(plat + window[0]))
+        tattrs["pos_peak_latency_ms"] = encode(plat)
         tattrs["pos_peak_magnitude_uv"] = encode(pamp)
         self.cf.set_trace_attrs(idx, tattrs)
         self.draw_hasmep_button()
@@ -391,9 +381,8 @@ class ControlWidget(QtWidgets.QWidget):
 
     def click_estimate_amplitudes(self):
         idx = self.trace_idx
-        data = self.cf.get_trace_data(idx)
         tattrs = self.cf.get_trace_attrs(idx)
-        data = process_data(data, tattrs, key="_log")
+        data = process_cached(self.cf, idx, tattrs, key="_log")
 
         fs = decode(tattrs["samplingrate"])
         nlat = int((decode(tattrs["neg_peak_latency_ms"]) or 0) * fs / 1000)
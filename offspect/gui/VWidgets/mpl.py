@@ -16,7 +16,7 @@ from matplotlib.patches import Polygon
 from offspect.api import decode, CacheFile
 from math import nan
 import numpy as np
-from offspect.cache.steps import process_data
+from offspect.cache.steps import process_cached
 
 
 class MplWidget(QtWidgets.QWidget):
@@ -91,7 +91,6 @@ class TraceWidget(QtWidgets.QWidget):
         self.plot_trace(cf, idx)
 
     def plot_trace(self, cf, idx: int = 0):
-        data = cf.get_trace_data(idx)
         attrs = cf.get_trace_attrs(idx)
         pre = decode(attrs["samples_pre_event"])
         post = decode(attrs["samples_post_event"])
@@ -116,7 +115,7 @@ class TraceWidget(QtWidgets.QWidget):
             lats = (plat, nlat)
         try:
             # perform preprocessing steps
-            data = process_data(data, attrs, key="_log")
+            data = process_cached(cf, idx, attrs, key="_log")
             plot_trace_on(self.canvas.axes, data, t0, t1, pre, post, lats, amps, shift)
             print(f"PLOT: Plotting trace number {idx+1} shifted by {shift} samples")
         except Exception as e:
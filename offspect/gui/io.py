@@ -9,11 +9,7 @@ def save_global(cf, idx: int, key: str, read: Callable):
         return
     else:
         origin = tattr["origin"]
-        for idx in range(len(cf)):
-            tattr = cf.get_trace_attrs(idx)
-            if tattr["origin"] == origin:
-                tattr[key] = encode(text)
-                cf.set_trace_attrs(idx, tattr)
+        cf.set_origin_attrs(origin, {key: encode(text)})
         print(f"CF: Wrote globaly {origin}: {key} {text}")
 
 
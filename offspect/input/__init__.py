@@ -1,5 +1,5 @@
 import importlib
-from typing import Tuple, Callable
+from typing import Tuple, Callable, List
 
 
 def get_protocol_handler(
@@ -17,3 +17,21 @@ def get_protocol_handler(
         raise ImportError(
             f"offspect.input.{readin}.{readout}.{protocol} is invalid. Please define prepare_annotations and cut_traces"
         )
+
+
+def get_protocol_streams(readin: str, readout: str, protocol: str) -> List[str]:
+    """get the names of the streams a handler reads besides its channel and events
+
+    Handlers for stream-based files, e.g. :code:`.xdf`, can declare these in a module-level :code:`STREAMS`, so that only these streams have to be loaded. Returns an empty list if the handler declares none.
+    """
+    m = importlib.import_module(f"offspect.input.{readin}.{readout}.{protocol}")
+    return list(getattr(m, "STREAMS", []))
+
+
+def get_protocol_streaming(readin: str, readout: str, protocol: str) -> bool:
+    """whether a handler reads the samples of numerical streams by streaming them from the file
+
+    Such handlers declare a module-level :code:`STREAMING = True`, so that only the time_stamps of numerical streams have to be loaded, see :func:`~offspect.protocols.xdf.load_selected`. Returns False if the handler declares nothing.
+    """
+    m = importlib.import_module(f"offspect.input.{readin}.{readout}.{protocol}")
+    return bool(getattr(m, "STREAMING", False))
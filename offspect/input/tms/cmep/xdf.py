@@ -21,7 +21,6 @@ If multiple protocols were recorded in one :code:`xdf`-file, as often happened d
 """
 from offspect.types import Annotations, FileName
 from typing import List, Union, Any, Dict
-from liesl.api import XDFFile
 from liesl.files.xdf.load import XDFStream
 from offspect.types import FileName, Coordinate, MetaData, Annotations, TraceData
 from pathlib import Path
@@ -30,7 +29,14 @@ import time
 import json
 import numpy as np
 from offspect.cache.attrs import AnnotationFactory, decode
+from offspect.protocols.epochs import cut_epochs, get_onsets
 from offspect.protocols.xdf import (
+    load_streams,
+    load_selected,
+    has_samples,
+    scan_headers,
+    cut_streamed,
+    pick_key_with_channel,
     get_coords_from_xml,
     decode_marker,
     pick_stream_with_channel,
@@ -39,14 +45,30 @@ from offspect.protocols.xdf import (
     find_closest,
     correct_tkeo,
     yield_timestamps,
+    yield_timestamps_artifact,
     yield_comments,
     list_nan,
     list_nan_coords,
+    assign_localite,
     yield_loc_coords,
     yield_loc_mso,
     yield_loc_didt,
 )
 
+#: the samples of numerical streams are read by streaming them from the file, so
+#: only their time_stamps have to be loaded, see :func:`~.load_selected`
+STREAMING = True
+
+#: the streams read besides the channel of interest, incl. the default event stream
+STREAMS = [
+    "localite_marker",
+    "reiz_marker_sa",
+    "BrainVision RDA Markers",
+    "BrainVision RDA Markers2",
+    "BrainVision RDA",
+    "BrainVision RDA2",
+]
+
 # -----------------------------------------------------------------------------
 
 
@@ -59,6 +81,7 @@ def prepare_annotations(
     event_name="coil_0_didt",
     event_stream="localite_marker",
     comment_name=None,
+    streams: Dict[str, XDFStream] = None,
 ) -> Annotations:
     """load a documentation.txt and cnt-files and distill annotations from them
     
@@ -77,6 +100,12 @@ def prepare_annotations(
         how many ms to cut after the tms
     xdffile: FileName
         the :code:`.xdf`-file with the recorded streams, e.g. data and markers
+    event_stream: str
+        the stream with the events. Use "artifact" to detect the pulses from the TMS artifact in the channel given as event_name, e.g. if no marker streams were recorded
+    event_name: str
+        the name of the events in the event_stream
+    streams: Dict[str, XDFStream]
+        the already loaded streams of the xdffile, see :func:`~.load_streams`
     returns
     -------
     annotation: Annotations
@@ -84,20 +113,33 @@ def prepare_annotations(
     """
 
     # ------------------
-    streams = XDFFile(xdffile)
+    streams = load_streams(
+        xdffile, streams, select=STREAMS + [channel, event_stream], samples=False
+    )
     datastream = pick_stream_with_channel(channel, streams)
-    event_stream = streams[event_stream]
-    print(f"Reading events from {event_stream.name} using {event_name}")
-    time_stamps = [ts for ts in yield_timestamps(event_stream, event_name)]
+    if event_stream == "artifact":
+        # without marker streams, we detect the pulses from their artifact
+        key = pick_key_with_channel(event_name, scan_headers(xdffile))
+        if key in streams:
+            event_stream = streams[key]
+        else:
+            event_stream = load_selected(xdffile, [key], samples=False)[key]
+        time_stamps = list(yield_timestamps_artifact(xdffile, key, event_stream, event_name))
+    else:
+        event_stream = streams[event_stream]
+        print(f"Reading events from {event_stream.name} using {event_name}")
+        time_stamps = [ts for ts in yield_timestamps(event_stream, event_name)]
     event_count = len(time_stamps)
     print(f"Found {event_count} events")
 
     if "localite_flow" in streams or "localite_marker" in streams:
         loc_stream = streams["localite_marker"]
         print(f"Reading information from {loc_stream.name}")
-        coords = list(yield_loc_coords(loc_stream, time_stamps))
-        stimulation_intensity_didt = list(yield_loc_didt(loc_stream, time_stamps))
-        stimulation_intensity_mso = list(yield_loc_mso(loc_stream, time_stamps))
+        (
+            coords,
+            stimulation_intensity_didt,
+            stimulation_intensity_mso,
+        ) = assign_localite(loc_stream, time_stamps)
     else:
         coords = list_nan_coords(event_count)
         stimulation_intensity_didt = list_nan(event_count)
@@ -141,7 +183,7 @@ def prepare_annotations(
             )
             time_stamps = [t + 0.045 for t in time_stamps]
         elif len(rda_stamps) >= len(time_stamps):
-            time_stamps = [find_closest(ts, rda_stamps) for ts in time_stamps]
+            time_stamps = list(find_closest(time_stamps, rda_stamps))
             print("Corrected event timestamps for RDA 'S  2'")
         else:
             print("Count mismatch between RDA and Localite events")
@@ -151,11 +193,11 @@ def prepare_annotations(
             and streams["BrainVision RDA"].hostname == "SEPHYS-CTRL"
         ):
             bvr = streams["BrainVision RDA"]
-            time_stamps = correct_tkeo(bvr, time_stamps)
+            time_stamps = correct_tkeo(bvr, time_stamps, xdffile, "BrainVision RDA")
             print("Corrected event timestamps for TMS artifact")
         else:
             bvr = streams["BrainVision RDA2"]
-            time_stamps = correct_tkeo(bvr, time_stamps)
+            time_stamps = correct_tkeo(bvr, time_stamps, xdffile, "BrainVision RDA2")
             print("Corrected event timestamps for TMS artifact")
 
     # global fields
@@ -193,7 +235,11 @@ def prepare_annotations(
     return anno.anno
 
 
-def cut_traces(xdffile: FileName, annotation: Annotations) -> List[TraceData]:
+def cut_traces(
+    xdffile: FileName,
+    annotation: Annotations,
+    streams: Dict[str, XDFStream] = None,
+) -> List[TraceData]:
     """cut the tracedate from a matfile given Annotations
     args
     ----
@@ -201,25 +247,30 @@ def cut_traces(xdffile: FileName, annotation: Annotations) -> List[TraceData]:
         the xdffile for cutting the data. must correspond in name to the one specified in the annotation
     annotation: Annotations
         the annotations specifying e.g. onsets as well as pre and post durations
+    streams: Dict[str, XDFStream]
+        the already loaded streams of the xdffile, see :func:`~.load_streams`. If none are given, or only the time_stamps of the data stream were loaded, the traces are cut while reading the stream sequentially, see :func:`~.cut_streamed`
 
     returns
     -------
     traces: List[TraceData]
     """
 
-    streams = XDFFile(xdffile)
     channel = decode(annotation["attrs"]["channel_of_interest"])
     print("Selecting traces for channel", channel)
-    datastream = pick_stream_with_channel(channel, streams)
-    cix = datastream.channel_labels.index(channel)
-
     pre = decode(annotation["attrs"]["samples_pre_event"])
     post = decode(annotation["attrs"]["samples_post_event"])
-    traces = []
-    for attrs in annotation["traces"]:
-        onset = decode(attrs["event_sample"])
-        trace = datastream.time_series[onset - pre : onset + post, cix]
-        bl = trace[0:pre].mean()
-        trace -= bl
-        traces.append(trace)
+    onsets = get_onsets(annotation)
+    if streams is not None and has_samples(pick_stream_with_channel(channel, streams)):
+        datastream = pick_stream_with_channel(channel, streams)
+        cix = datastream.channel_labels.index(channel)
+        traces = cut_epochs(datastream.time_series[:, cix], onsets, pre, post)
+    else:
+        # read the stream sequentially instead of loading it
+        headers = scan_headers(xdffile)
+        key = pick_key_with_channel(channel, headers)
+        labels = [h["channel_labels"] for h in headers if h["key"] == key][0]
+        epochs = cut_streamed(xdffile, key, onsets, pre, post, [labels.index(channel)])
+        traces = np.reshape(epochs, (len(onsets), pre + post))
+    # the epochs are copies, so this leaves the stream untouched
+    traces -= np.nanmean(traces[:, 0:pre], axis=1, keepdims=True)
     return traces
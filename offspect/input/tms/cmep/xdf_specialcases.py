@@ -31,11 +31,15 @@ import time
 import json
 import numpy as np
 from offspect.cache.attrs import AnnotationFactory, decode
+from offspect.protocols.epochs import cut_epochs, get_onsets
 from offspect.protocols.xdf import (
     get_coords_from_xml,
     decode_marker,
     pick_stream_with_channel,
+    concat_streams,
     find_closest_samples,
+    match_timestamps,
+    refine_onsets,
     yield_timestamps,
     yield_comments,
     list_nan,
@@ -99,18 +103,11 @@ def prepare_annotations_multfile(
     # files. Because the clock is continuous and monotonic, we do not need to
     # correct for any possible reset between xdf files, and gaps are jumped
     # later
+    data_series, data_stamps, datastream = concat_streams(
+        channel, files, columns=slice(0, 64)
+    )
     time_stamps = []
-    data_series = None
-    data_stamps = None
     for streams in files:
-        datastream = pick_stream_with_channel(channel, streams)
-        if data_series is None:
-            data_series = datastream.time_series
-            data_stamps = datastream.time_stamps
-        else:
-            data_series = np.concatenate((data_series, datastream.time_series), axis=0)
-            data_stamps = np.concatenate((data_stamps, datastream.time_stamps), axis=0)
-
         for event in streams["BrainVision RDA Markers"].time_stamps:
             if event > irrelevant_until:
                 time_stamps.append(event)
@@ -142,10 +139,7 @@ def prepare_annotations_multfile(
     anno.set("channel_labels", [channel])
     anno.set("global_comment", f"grid_layout={grid_layout}")
     # trace fields
-    event_samples = []
-    for ts in time_stamps:
-        idx = int(np.argmin(np.abs(data_stamps - ts)))
-        event_samples.append(idx)
+    event_samples = match_timestamps(data_stamps, time_stamps).tolist()
 
     #  New Implementation
     # gmfp = np.std(data_series[:, 0:64], 1)
@@ -158,14 +152,10 @@ def prepare_annotations_multfile(
     #     tp.append(int(np.argmax(hood) - 50 + onset))
     # event_samples = tp
 
-    gmfp = np.std(data_series[:, 0:64], 1)
-    aptp = []
-    tp = []
-    for onset in event_samples:
-        artifact = gmfp[onset - 25 : onset + 25]
-        aptp.append(np.ptp(artifact))
-        tp.append(int(np.argmax(artifact) - 25 + onset))
-    event_samples = tp
+    tp, aptp = refine_onsets(
+        data_series, event_samples, 25, 25, channels=slice(0, 64)
+    )
+    event_samples = tp.tolist()
 
     event_times = [float(t) for t in data_stamps[event_samples] - data_stamps[0]]
     time_since_last_pulse = [inf] + [
@@ -248,11 +238,15 @@ import time
 import json
 import numpy as np
 from offspect.cache.attrs import AnnotationFactory, decode
+from offspect.protocols.epochs import cut_epochs, get_onsets
 from offspect.protocols.xdf import (
     get_coords_from_xml,
     decode_marker,
     pick_stream_with_channel,
+    concat_streams,
     find_closest_samples,
+    match_timestamps,
+    refine_onsets,
     yield_timestamps,
     yield_comments,
     list_nan,
@@ -323,18 +317,11 @@ def prepare_annotations_multifile(
     # files. Because the clock is continuous and monotonic, we do not need to
     # correct for any possible reset between xdf files, and gaps are jumped
     # later
+    data_series, data_stamps, datastream = concat_streams(
+        channel, files, columns=slice(0, 64)
+    )
     time_stamps = []
-    data_series = None
-    data_stamps = None
     for streams in files:
-        datastream = pick_stream_with_channel(channel, streams)
-        if data_series is None:
-            data_series = datastream.time_series
-            data_stamps = datastream.time_stamps
-        else:
-            data_series = np.concatenate((data_series, datastream.time_series), axis=0)
-            data_stamps = np.concatenate((data_stamps, datastream.time_stamps), axis=0)
-
         for event in streams["BrainVision RDA Markers"].time_stamps:
             if event > irrelevant_until:
                 time_stamps.append(event)
@@ -366,10 +353,7 @@ def prepare_annotations_multifile(
     anno.set("channel_labels", [channel])
     anno.set("global_comment", f"grid_layout={grid_layout}")
     # trace fields
-    event_samples = []
-    for ts in time_stamps:
-        idx = int(np.argmin(np.abs(data_stamps - ts)))
-        event_samples.append(idx)
+    event_samples = match_timestamps(data_stamps, time_stamps).tolist()
 
     #  New Implementation
     # gmfp = np.std(data_series[:, 0:64], 1)
@@ -382,14 +366,10 @@ def prepare_annotations_multifile(
     #     tp.append(int(np.argmax(hood) - 50 + onset))
     # event_samples = tp
 
-    gmfp = np.std(data_series[:, 0:64], 1)
-    aptp = []
-    tp = []
-    for onset in event_samples:
-        artifact = gmfp[onset - 25 : onset + 25]
-        aptp.append(np.ptp(artifact))
-        tp.append(int(np.argmax(artifact) - 25 + onset))
-    event_samples = tp
+    tp, aptp = refine_onsets(
+        data_series, event_samples, 25, 25, channels=slice(0, 64)
+    )
+    event_samples = tp.tolist()
 
     event_times = [float(t) for t in data_stamps[event_samples] - data_stamps[0]]
     time_since_last_pulse = [inf] + [
@@ -477,26 +457,12 @@ def cut_traces_multifile(files, annotation: Annotations) -> List[TraceData]:
     channel = decode(annotation["attrs"]["channel_of_interest"])
     print("Selecting traces for channel", channel)
 
-    data_series = None
-    data_stamps = None
-    for streams in files:
-        datastream = pick_stream_with_channel(channel, streams)
-        cix = datastream.channel_labels.index(channel)
-        if data_series is None:
-            data_series = datastream.time_series
-            data_stamps = datastream.time_stamps
-        else:
-            data_series = np.concatenate((data_series, datastream.time_series), axis=0)
-            data_stamps = np.concatenate((data_stamps, datastream.time_stamps), axis=0)
+    cix = pick_stream_with_channel(channel, files[0]).channel_labels.index(channel)
+    data_series, _, _ = concat_streams(channel, files, columns=cix)
 
     pre = decode(annotation["attrs"]["samples_pre_event"])
     post = decode(annotation["attrs"]["samples_post_event"])
-    traces = []
-    for attrs in annotation["traces"]:
-        onset = decode(attrs["event_sample"])
-        trace = data_series[onset - pre : onset + post, cix]
-        traces.append(trace)
-    return traces
+    return cut_epochs(data_series, get_onsets(annotation), pre, post)
 
 
 # %%
@@ -581,14 +547,10 @@ def prepare_annotations(
 
     # shift onset on Peak of artifact
     ephys = streams["BrainVision RDA"]
-    gmfp = np.std(ephys.time_series[:, 0:64], 1)
-    aptp = []
-    tp = []
-    for onset in event_samples:
-        artifact = gmfp[onset - 25 : onset + 25]
-        aptp.append(np.ptp(artifact))
-        tp.append(int(np.argmax(artifact) - 25 + onset))
-    event_samples = tp
+    tp, aptp = refine_onsets(
+        ephys.time_series, event_samples, 25, 25, channels=slice(0, 64)
+    )
+    event_samples = tp.tolist()
 
     event_times = [
         float(t)
@@ -629,26 +591,12 @@ def cut_traces(streams, annotation: Annotations) -> List[TraceData]:
     channel = decode(annotation["attrs"]["channel_of_interest"])
     print("Selecting traces for channel", channel)
 
-    data_series = None
-    data_stamps = None
-    for streams in files:
-        datastream = pick_stream_with_channel(channel, streams)
-        cix = datastream.channel_labels.index(channel)
-        if data_series is None:
-            data_series = datastream.time_series
-            data_stamps = datastream.time_stamps
-        else:
-            data_series = np.concatenate((data_series, datastream.time_series), axis=0)
-            data_stamps = np.concatenate((data_stamps, datastream.time_stamps), axis=0)
+    cix = pick_stream_with_channel(channel, files[0]).channel_labels.index(channel)
+    data_series, _, _ = concat_streams(channel, files, columns=cix)
 
     pre = decode(annotation["attrs"]["samples_pre_event"])
     post = decode(annotation["attrs"]["samples_post_event"])
-    traces = []
-    for attrs in annotation["traces"]:
-        onset = decode(attrs["event_sample"])
-        trace = data_series[onset - pre : onset + post, cix]
-        traces.append(trace)
-    return traces
+    return cut_epochs(data_series, get_onsets(annotation), pre, post)
 
 
 # %%
@@ -733,14 +681,10 @@ def prepare_annotations(
 
     # shift onset on Peak of artifact
     ephys = streams["BrainVision RDA"]
-    gmfp = np.std(ephys.time_series[:, 0:64], 1)
-    aptp = []
-    tp = []
-    for onset in event_samples:
-        artifact = gmfp[onset - 25 : onset + 25]
-        aptp.append(np.ptp(artifact))
-        tp.append(int(np.argmax(artifact) - 25 + onset))
-    event_samples = tp
+    tp, aptp = refine_onsets(
+        ephys.time_series, event_samples, 25, 25, channels=slice(0, 64)
+    )
+    event_samples = tp.tolist()
 
     event_times = [
         float(t)
@@ -785,12 +729,7 @@ def cut_traces(streams, annotation: Annotations) -> List[TraceData]:
 
     pre = decode(annotation["attrs"]["samples_pre_event"])
     post = decode(annotation["attrs"]["samples_post_event"])
-    traces = []
-    for attrs in annotation["traces"]:
-        onset = decode(attrs["event_sample"])
-        trace = datastream.time_series[onset - pre : onset + post, cix]
-        traces.append(trace)
-    return traces
+    return cut_epochs(datastream.time_series[:, cix], get_onsets(annotation), pre, post)
 
 
 if __name__ == "__main__":
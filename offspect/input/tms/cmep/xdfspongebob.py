@@ -14,7 +14,6 @@ The data is espected to have TMS pulses, triggered by spongebob.
 """
 from offspect.types import Annotations, FileName
 from typing import List, Union, Any, Dict
-from liesl.api import XDFFile
 from liesl.files.xdf.load import XDFStream
 from offspect.types import FileName, Coordinate, MetaData, Annotations, TraceData
 from pathlib import Path
@@ -23,7 +22,9 @@ import time
 import json
 import numpy as np
 from offspect.cache.attrs import AnnotationFactory, decode
+from offspect.protocols.epochs import cut_epochs, get_onsets
 from offspect.protocols.xdf import (
+    load_streams,
     get_coords_from_xml,
     decode_marker,
     pick_stream_with_channel,
@@ -37,6 +38,12 @@ from offspect.protocols.xdf import (
     yield_loc_didt,
 )
 
+#: the streams read besides the channel of interest, incl. the default event stream
+STREAMS = [
+    "Spongebob-Data",
+    "reiz_marker_sa",
+]
+
 # -----------------------------------------------------------------------------
 
 
@@ -49,6 +56,7 @@ def prepare_annotations(
     event_mark=1,
     event_stream="Spongebob-Data",
     comment_name=None,
+    streams: Dict[str, XDFStream] = None,
 ) -> Annotations:
     """ 
     args
@@ -62,6 +70,8 @@ def prepare_annotations(
         how many ms to cut before the tms
     post_in_ms: float
         how many ms to cut after the tms
+    streams: Dict[str, XDFStream]
+        the already loaded streams of the xdffile, see :func:`~.load_streams`
     returns
     -------
     annotation: Annotations
@@ -69,7 +79,7 @@ def prepare_annotations(
     """
 
     # ------------------
-    streams = XDFFile(xdffile)
+    streams = load_streams(xdffile, streams, select=STREAMS + [channel, event_stream])
     datastream = pick_stream_with_channel(channel, streams)
     event_stream = streams[event_stream]
     time_stamps = [ts for ts in yield_timestamps(event_stream, event_mark)]
@@ -123,7 +133,11 @@ def prepare_annotations(
     return anno.anno
 
 
-def cut_traces(xdffile: FileName, annotation: Annotations) -> List[TraceData]:
+def cut_traces(
+    xdffile: FileName,
+    annotation: Annotations,
+    streams: Dict[str, XDFStream] = None,
+) -> List[TraceData]:
     """cut the tracedate from a matfile given Annotations
     args
     ----
@@ -131,24 +145,21 @@ def cut_traces(xdffile: FileName, annotation: Annotations) -> List[TraceData]:
         the xdffile for cutting the data. must correspond in name to the one specified in the annotation
     annotation: Annotations
         the annotations specifying e.g. onsets as well as pre and post durations
+    streams: Dict[str, XDFStream]
+        the already loaded streams of the xdffile, see :func:`~.load_streams`
 
     returns
     -------
     traces: List[TraceData]
     """
 
-    streams = XDFFile(xdffile)
     channel = decode(annotation["attrs"]["channel_of_interest"])
+    streams = load_streams(xdffile, streams, select=[channel])
     print("Selecting traces for channel", channel)
     datastream = pick_stream_with_channel(channel, streams)
     cix = datastream.channel_labels.index(channel)
 
     pre = decode(annotation["attrs"]["samples_pre_event"])
     post = decode(annotation["attrs"]["samples_post_event"])
-    traces = []
-    for attrs in annotation["traces"]:
-        onset = decode(attrs["event_sample"])
-        trace = datastream.time_series[onset - pre : onset + post, cix]
-        traces.append(trace)
-    return traces
+    return cut_epochs(datastream.time_series[:, cix], get_onsets(annotation), pre, post)
 
@@ -14,3 +14,9 @@ valid_keys = [
     "gmfp_pos_peaks_latency_ms",
     "gmfp_zcr_latencies_ms",
 ]  #: valid keys for tms-erp
+
+valid_types = {
+    "stimulation_intensity_mso": "float",
+    "stimulation_intensity_didt": "float",
+    "xyz_coords": "float[3]",
+}  #: native types of keys for typed storage in tms-erp
@@ -13,13 +13,22 @@ import time
 import json
 import numpy as np
 from offspect.cache.attrs import AnnotationFactory, decode
+from offspect.protocols.epochs import cut_epochs, get_onsets
 from offspect.protocols.xdf import (
+    load_streams,
+    load_selected,
+    scan_headers,
+    cut_streamed,
+    has_samples,
+    pick_key_with_channel,
     get_coords_from_xml,
     decode_marker,
     pick_stream_with_channel,
     find_closest_samples,
     yield_comments,
     yield_timestamps,
+    yield_timestamps_artifact,
+    assign_localite,
     yield_loc_coords,
     yield_loc_didt,
     yield_loc_mso,
@@ -27,6 +36,16 @@ from offspect.protocols.xdf import (
     list_nan,
 )
 
+#: the samples of numerical streams are read by streaming them from the file, so
+#: only their time_stamps have to be loaded, see :func:`~.load_selected`
+STREAMING = True
+
+#: the streams read besides the channel of interest, incl. the default event stream
+STREAMS = [
+    "localite_marker",
+    "reiz_marker_sa",
+]
+
 # -----------------------------------------------------------------------------
 def get_datastream(streams: XDFFile, channels: List[str]) -> XDFStream:
     datastreams = set(pick_stream_with_channel(chan, streams) for chan in channels)
@@ -42,6 +61,7 @@ def prepare_annotations(
     xmlfile: FileName = None,
     event_stream: str = "localite_marker",
     event_name: Union[str, int] = "coil_0_didt",
+    streams: Dict[str, XDFStream] = None,
 ) -> Annotations:
     """load a documentation.txt and cnt-files and distill annotations from them
     
@@ -55,6 +75,12 @@ def prepare_annotations(
         how many ms to cut before the tms
     post_in_ms: float
         how many ms to cut after the tms
+    event_stream: str
+        the stream with the events. Use "artifact" to detect the pulses from the TMS artifact in the channel given as event_name, e.g. if no marker streams were recorded
+    event_name: Union[str, int]
+        the name of the events in the event_stream
+    streams: Dict[str, XDFStream]
+        the already loaded streams of the xdffile, see :func:`~.load_streams`
 
     returns
     -------
@@ -62,21 +88,34 @@ def prepare_annotations(
         the annotations for this origin files
     """
     stream_of_interest = channel  # rename to have same function signature
-    streams = XDFFile(xdffile)
+    streams = load_streams(
+        xdffile, streams, select=STREAMS + [channel, event_stream], samples=False
+    )
     if stream_of_interest in streams:
         datastream = streams[stream_of_interest]
     else:
         raise KeyError(f"Stream {stream_of_interest} was not found in the data")
 
-    e_stream = streams[event_stream]
-    time_stamps = [ts for ts in yield_timestamps(e_stream, event_name)]
+    if event_stream == "artifact":
+        # without marker streams, we detect the pulses from their artifact
+        key = pick_key_with_channel(event_name, scan_headers(xdffile))
+        if key in streams:
+            e_stream = streams[key]
+        else:
+            e_stream = load_selected(xdffile, [key], samples=False)[key]
+        time_stamps = list(yield_timestamps_artifact(xdffile, key, e_stream, event_name))
+    else:
+        e_stream = streams[event_stream]
+        time_stamps = [ts for ts in yield_timestamps(e_stream, event_name)]
     event_count = len(time_stamps)
 
     if "localite_flow" in streams or "localite_marker" in streams:
         loc_stream = streams["localite_marker"]
-        coords = list(yield_loc_coords(loc_stream, time_stamps))
-        stimulation_intensity_didt = list(yield_loc_didt(loc_stream, time_stamps))
-        stimulation_intensity_mso = list(yield_loc_mso(loc_stream, time_stamps))
+        (
+            coords,
+            stimulation_intensity_didt,
+            stimulation_intensity_mso,
+        ) = assign_localite(loc_stream, time_stamps)
     else:
         coords = list_nan_coords(event_count)
         stimulation_intensity_didt = list_nan(event_count)
@@ -132,7 +171,11 @@ def prepare_annotations(
     return anno.anno
 
 
-def cut_traces(xdffile: FileName, annotation: Annotations) -> List[TraceData]:
+def cut_traces(
+    xdffile: FileName,
+    annotation: Annotations,
+    streams: Dict[str, XDFStream] = None,
+) -> List[TraceData]:
     """cut the tracedate from a matfile given Annotations
     args
     ----
@@ -140,22 +183,21 @@ def cut_traces(xdffile: FileName, annotation: Annotations) -> List[TraceData]:
         the xdffile for cutting the data. must correspond in name to the one specified in the annotation
     annotation: Annotations
         the annotations specifying e.g. onsets as well as pre and post durations
+    streams: Dict[str, XDFStream]
+        the already loaded streams of the xdffile, see :func:`~.load_streams`. If none are given, or only the time_stamps of the data stream were loaded, the traces are cut while reading the stream sequentially, see :func:`~.cut_streamed`
 
     returns
     -------
     traces: List[TraceData]
     """
 
-    streams = XDFFile(xdffile)
     soi = decode(annotation["attrs"]["channel_of_interest"])
     print("Selecting traces for stream", soi)
-    datastream = streams[soi]
-
     pre = decode(annotation["attrs"]["samples_pre_event"])
     post = decode(annotation["attrs"]["samples_post_event"])
-    traces = []
-    for attrs in annotation["traces"]:
-        onset = decode(attrs["event_sample"])
-        trace = datastream.time_series[onset - pre : onset + post, :]
-        traces.append(trace)
-    return traces
+    if streams is None or not has_samples(streams[soi]):
+        # read the high-density stream sequentially instead of loading it
+        return cut_streamed(xdffile, soi, get_onsets(annotation), pre, post)
+
+    datastream = streams[soi]
+    return cut_epochs(datastream.time_series, get_onsets(annotation), pre, post)
@@ -26,3 +26,14 @@ valid_keys = [
     "target_phase",
     "exact_phase",
 ]  #: valid keys for tms-imep
+
+valid_types = {
+    "stimulation_intensity_mso": "float",
+    "stimulation_intensity_didt": "float",
+    "neg_peak_magnitude_uv": "float",
+    "neg_peak_latency_ms": "float",
+    "pos_peak_magnitude_uv": "float",
+    "pos_peak_latency_ms": "float",
+    "zcr_latency_ms": "float",
+    "xyz_coords": "float[3]",
+}  #: native types of keys for typed storage in tms-imep
@@ -18,3 +18,14 @@ valid_keys = [
     "measured_phase",
     "target_phase",
 ]  #: valid keys for tms-cmep (formerly know as 'contralateral-mep')
+
+valid_types = {
+    "stimulation_intensity_mso": "float",
+    "stimulation_intensity_didt": "float",
+    "neg_peak_magnitude_uv": "float",
+    "neg_peak_latency_ms": "float",
+    "pos_peak_magnitude_uv": "float",
+    "pos_peak_latency_ms": "float",
+    "zcr_latency_ms": "float",
+    "xyz_coords": "float[3]",
+}  #: native types of keys for typed storage in tms-pdmep
@@ -39,11 +39,15 @@ import time
 import json
 import numpy as np
 from offspect.cache.attrs import AnnotationFactory, decode
+from offspect.protocols.epochs import cut_epochs, get_onsets
 from offspect.protocols.xdf import (
     get_coords_from_xml,
     decode_marker,
     pick_stream_with_channel,
+    concat_streams,
     find_closest_samples,
+    match_timestamps,
+    refine_onsets,
     yield_timestamps,
     yield_comments,
     list_nan,
@@ -110,29 +114,14 @@ def prepare_annotations_multifile(
         print(irrelevant_until)
 
     # we concatenate the time_series and time_stamps from the multiple xdf \
-    # files. Because the clock is continuous and monotonic, we do not need to
-    # correct for any possible reset between xdf files, and gaps are jumped
-    # later
+    # files, keeping only the 64 EEG channels needed for the gmfp. Gaps are
+    # jumped later
+    data_series, data_stamps, datastream = concat_streams(
+        channel, files, columns=slice(0, 64)
+    )
     time_stamps = []
     lucky_phase = []
-    data_series:ndarray = None
-    data_stamps:ndarray = None
-    # if in all files there is a localite-marker stream then initalize
-    # collection over those files
-
     for streams in files:
-        datastream = pick_stream_with_channel(channel, streams)
-        if data_series is None:
-            data_series = datastream.time_series
-            data_stamps = datastream.time_stamps
-        else:
-            data_series = np.concatenate(
-                (data_series, datastream.time_series), axis=0
-            )
-            data_stamps = np.concatenate(
-                (data_stamps, datastream.time_stamps), axis=0
-            )
-
         # channel 9 of spongebob contains the current phase in rad
         # channel 11 of spongebob contains trigger out
         # because we need to send a command to spongebob to trigger, and
@@ -220,10 +209,7 @@ def prepare_annotations_multifile(
     anno.set("channel_labels", [channel])
     anno.set("global_comment", "")
     # trace fields
-    event_samples = []
-    for ts in time_stamps:
-        idx = int(np.argmin(np.abs(data_stamps - ts)))
-        event_samples.append(idx)
+    event_samples = match_timestamps(data_stamps, time_stamps).tolist()
 
     #  New Implementation
     # gmfp = np.std(data_series[:, 0:64], 1)
@@ -237,14 +223,10 @@ def prepare_annotations_multifile(
     # event_samples = tp
 
     # shift the tms onset to the artifact
-    gmfp = np.std(data_series[:, 0:64], 1)
-    aptp = []
-    tp = []
-    for onset in event_samples:
-        artifact = gmfp[onset - 25 : onset + 25]
-        aptp.append(np.ptp(artifact))
-        tp.append(int(np.argmax(artifact) - 25 + onset))
-    event_samples = tp
+    tp, aptp = refine_onsets(
+        data_series, event_samples, 25, 25, channels=slice(0, 64)
+    )
+    event_samples = tp.tolist()
 
     event_times = [
         float(t) for t in data_stamps[event_samples] - data_stamps[0]
@@ -296,30 +278,12 @@ def cut_traces_multifile(files, annotation: Annotations) -> List[TraceData]:
     channel = decode(annotation["attrs"]["channel_of_interest"])
     print("Selecting traces for channel", channel)
 
-    data_series:ndarray = None
-    data_stamps:ndarray = None
-    for streams in files:
-        datastream = pick_stream_with_channel(channel, streams)
-        cix = datastream.channel_labels.index(channel)
-        if data_series is None:
-            data_series = datastream.time_series
-            data_stamps = datastream.time_stamps
-        else:
-            data_series = np.concatenate(
-                (data_series, datastream.time_series), axis=0
-            )
-            data_stamps = np.concatenate(
-                (data_stamps, datastream.time_stamps), axis=0
-            )
+    cix = pick_stream_with_channel(channel, files[0]).channel_labels.index(channel)
+    data_series, _, _ = concat_streams(channel, files, columns=cix)
 
     pre = decode(annotation["attrs"]["samples_pre_event"])
     post = decode(annotation["attrs"]["samples_post_event"])
-    traces = []
-    for attrs in annotation["traces"]:
-        onset = decode(attrs["event_sample"])
-        trace = data_series[onset - pre : onset + post, cix]
-        traces.append(trace)
-    return traces
+    return cut_epochs(data_series, get_onsets(annotation), pre, post)
 
 
 if __name__ == "__main__":
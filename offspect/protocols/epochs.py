@@ -0,0 +1,62 @@
+"""
+Epochs
+------
+
+Cut the traces around all events of a recording at once, as shared by the protocol handlers.
+
+.. code-block:: python
+
+   from offspect.protocols.epochs import cut_epochs, get_onsets
+   traces = cut_epochs(data, get_onsets(annotation), pre=100, post=100)
+
+"""
+from offspect.types import Annotations
+from offspect.cache.attrs import decode
+from math import nan
+import numpy as np
+
+
+def get_onsets(annotation: Annotations) -> np.ndarray:
+    "the event_sample of all traces of an annotation as an array of int"
+    return np.asarray(
+        [decode(attrs["event_sample"]) for attrs in annotation["traces"]], dtype=int
+    )
+
+
+def cut_epochs(
+    data: np.ndarray, onsets: np.ndarray, pre: int, post: int, fill: float = nan
+) -> np.ndarray:
+    """cut the epochs around all onsets with a single gather
+
+    args
+    ----
+    data: np.ndarray
+        the recording with the shape (n_samples[, n_channels])
+    onsets: np.ndarray
+        the sample of each event
+    pre: int
+        how many samples to cut before each onset
+    post: int
+        how many samples to cut after each onset
+    fill: float
+        the value for samples of an epoch before the start or after the end of the recording
+
+    returns
+    -------
+    epochs: np.ndarray
+        the epochs with the shape (n_events, pre + post[, n_channels]). This is always a copy, so changing it e.g. by subtracting a baseline leaves the recording untouched.
+
+    Only the samples within the epochs are read, so data can also be a memory-mapped array.
+    """
+    data = np.asanyarray(data)
+    onsets = np.asarray(onsets, dtype=int).reshape(-1)
+    dtype = np.result_type(data.dtype, np.float32)
+    if len(data) == 0:
+        return np.full((len(onsets), pre + post) + data.shape[1:], fill, dtype=dtype)
+    ix = onsets[:, None] + np.arange(-pre, post)[None, :]
+    outside = (ix < 0) | (ix >= len(data))
+    # fancy indexing always returns a copy
+    epochs = np.asarray(data[ix.clip(0, len(data) - 1)], dtype=dtype)
+    if outside.any():
+        epochs[outside] = fill
+    return epochs
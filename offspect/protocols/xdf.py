@@ -1,9 +1,19 @@
 from offspect.protocols.mat import get_coords_from_xml
-from liesl.files.xdf.load import XDFStream
-from typing import List, Any, Dict, Union
+from offspect.protocols.xdf_cache import load_cached
+from offspect.protocols.epochs import cut_epochs
+from liesl.files.xdf.load import XDFStream, XDFFile
+from typing import List, Any, Dict, Union, Tuple, Generator, Iterable
+from weakref import WeakKeyDictionary
+from os import environ
+from pathlib import Path
+from xml.etree import ElementTree
+import struct
+import gzip
+import pyxdf
 import json
 import numpy as np
-from math import nan
+from math import nan, inf
+from offspect.types import FileName
 
 
 def decode_marker(mark: str) -> Any:
@@ -14,6 +24,374 @@ def decode_marker(mark: str) -> Any:
         return mark[0]
 
 
+def _read_varlen(f) -> int:
+    nbytes = f.read(1)
+    if len(nbytes) == 0:
+        raise EOFError
+    fmt = {1: "<B", 4: "<I", 8: "<Q"}[nbytes[0]]
+    return struct.unpack(fmt, f.read(nbytes[0]))[0]
+
+
+def _iter_chunks(
+    xdffile: FileName, tags: Tuple[int, ...], stream_id: int = None
+) -> Generator[Tuple[int, int, bytes], None, None]:
+    "yield tag, stream_id and content of these chunks, seeking over all others"
+    fname = Path(xdffile).expanduser()
+    opener = gzip.open if fname.suffix == ".xdfz" else open
+    with opener(str(fname), "rb") as f:
+        if f.read(4) != b"XDF:":
+            raise IOError(f"{xdffile} is not a valid xdf-file")
+        while True:
+            try:
+                length = _read_varlen(f)
+            except EOFError:
+                return
+            tag = struct.unpack("<H", f.read(2))[0]
+            if tag not in tags:
+                f.seek(length - 2, 1)
+                continue
+            sid = struct.unpack("<I", f.read(4))[0]
+            if stream_id is not None and sid != stream_id and tag != 2:
+                f.seek(length - 6, 1)
+                continue
+            yield tag, sid, f.read(length - 6)
+
+
+def _parse_header(content: bytes) -> Dict[str, Any]:
+    info = ElementTree.fromstring(content.decode("utf-8"))
+    labels = [l.text for l in info.findall("desc/channels/channel/label")]
+    return {
+        "name": info.findtext("name", ""),
+        "type": info.findtext("type", ""),
+        "hostname": info.findtext("hostname", "NotImplemented"),
+        "channel_format": info.findtext("channel_format", ""),
+        "channel_count": int(info.findtext("channel_count", "0")),
+        "nominal_srate": float(info.findtext("nominal_srate", "0")),
+        "channel_labels": labels or None,
+    }
+
+
+def scan_headers(xdffile: FileName) -> List[Dict[str, Any]]:
+    """scan an xdf-file for the headers of its streams without decoding any samples
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+
+    returns
+    -------
+    headers: List[Dict[str, Any]]
+        for every stream in order of appearance its stream_id, name, type, hostname, channel_format, channel_count, nominal_srate and channel_labels, and the key under which :func:`XDFFile` would return it. Streams with the same name get a number appended to their key, e.g. "BrainVision RDA2".
+
+    Only the stream header chunks are read, all other chunks are skipped by seeking over them.
+    """
+    headers: List[Dict[str, Any]] = []
+    doublettes: Dict[str, int] = dict()
+    for _, stream_id, content in _iter_chunks(xdffile, (2,)):
+        header = _parse_header(content)
+        name = header["name"]
+        doublettes[name] = doublettes.get(name, 0) + 1
+        key = name if doublettes[name] == 1 else name + str(doublettes[name])
+        header.update(stream_id=stream_id, key=key)
+        headers.append(header)
+    return headers
+
+
+def select_streams(headers: List[Dict[str, Any]], select: List[str]) -> List[int]:
+    """select the streams which have one of the given names or contain one of the given channels
+
+    args
+    ----
+    headers: List[Dict[str, Any]]
+        the headers of the streams, see :func:`~.scan_headers`
+    select: List[str]
+        the keys of the streams, e.g. "localite_marker", or channel labels, e.g. "EDC_L"
+
+    returns
+    -------
+    stream_ids: List[int]
+        the ids of the selected streams
+    """
+    wanted = set(select)
+    ids = []
+    for header in headers:
+        labels = set(header["channel_labels"] or [])
+        if header["key"] in wanted or labels & wanted:
+            ids.append(header["stream_id"])
+    return ids
+
+
+def _drop_samples(values, stamps, header, stream_id):
+    "keep only the time_stamps of numerical streams while pyxdf loads them"
+    if header["info"]["channel_format"][0] != "string":
+        values = values[:, :0]
+    return values, stamps, header
+
+
+def has_samples(stream: XDFStream) -> bool:
+    "whether the samples of a numerical stream were loaded, see :func:`~.load_selected`"
+    return np.shape(stream.time_series)[1:] != (0,)
+
+
+def load_selected(
+    xdffile: FileName, select: List[str], samples: bool = True
+) -> Dict[str, XDFStream]:
+    """load only the selected streams of an xdf-file
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+    select: List[str]
+        the keys of the streams or channel labels they contain, see :func:`~.select_streams`
+    samples: bool
+        whether to keep the samples of numerical streams. If False, only their time_stamps are kept, with the shape of their time_series being (n_samples, 0), while marker streams are loaded completely. The samples can later be read by streaming them from the file, e.g. with :func:`~.cut_streamed`
+
+    returns
+    -------
+    streams: Dict[str, XDFStream]
+        the selected streams, indexed by the same keys :func:`XDFFile` would use
+    """
+    headers = scan_headers(xdffile)
+    keys = {h["stream_id"]: h["key"] for h in headers}
+    ids = select_streams(headers, select)
+    collection: Dict[str, XDFStream] = dict()
+    if len(ids) == 0:
+        return collection
+    # chunks of all other streams are skipped without being decoded. the
+    # time_stamps are synchronized and dejittered exactly as by XDFFile
+    loaded, _ = pyxdf.load_xdf(
+        filename=str(xdffile),
+        select_streams=ids,
+        on_chunk=None if samples else _drop_samples,
+    )
+    for stream in loaded:
+        x = XDFStream(stream)
+        print("XDFFile: Parsing", x.name)
+        x.origin = str(xdffile)
+        collection[keys[stream["info"]["stream_id"]]] = x
+    return collection
+
+
+def load_streams(
+    xdffile: FileName,
+    streams: Dict[str, XDFStream] = None,
+    cachedir: FileName = None,
+    select: List[str] = None,
+    samples: bool = True,
+) -> Dict[str, XDFStream]:
+    """load the streams of an xdf-file, unless they have already been loaded
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+    streams: Dict[str, XDFStream]
+        the streams of this file, if they were already loaded e.g. by the cli
+    cachedir: FileName
+        a directory to cache the parsed streams in, see :mod:`~.xdf_cache`. Defaults to the environment variable OFFSPECT_XDF_CACHE, and no caching if that is not set
+    select: List[str]
+        load only the streams with these keys or containing these channels, see :func:`~.select_streams`. Defaults to all streams
+    samples: bool
+        whether to load the samples of the selected numerical streams, or only their time_stamps, see :func:`~.load_selected`
+
+    returns
+    -------
+    streams: Dict[str, XDFStream]
+        the streams of the file, indexed by their name
+
+    This allows prepare_annotations and cut_traces of a protocol to share the streams, so that a recording only has to be parsed once during ingestion. Handlers declare the streams they need in their module-level STREAMS, see :func:`~offspect.input.get_protocol_streams`. If a cache is used, all streams are cached, because cached streams are memory-mapped and only read when accessed.
+    """
+    if streams is None:
+        cachedir = cachedir or environ.get("OFFSPECT_XDF_CACHE", None)
+        if cachedir:
+            streams = load_cached(xdffile, cachedir)
+        elif select is not None:
+            streams = load_selected(xdffile, select, samples)
+        else:
+            streams = XDFFile(xdffile)
+    return streams
+
+
+_XDF_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "double64": np.dtype("<f8"),
+    "int8": np.dtype("<i1"),
+    "int16": np.dtype("<i2"),
+    "int32": np.dtype("<i4"),
+    "int64": np.dtype("<i8"),
+}
+
+
+def _decode_samples(content: bytes, dtype: np.dtype, count: int) -> np.ndarray:
+    "decode the content of a samples chunk into an array of shape (samples, count)"
+    nbytes = content[0]
+    fmt = {1: "<B", 4: "<I", 8: "<Q"}[nbytes]
+    n = struct.unpack(fmt, content[1 : 1 + nbytes])[0]
+    body = np.frombuffer(content, dtype=np.uint8, offset=1 + nbytes)
+    width = count * dtype.itemsize
+    # usually, all samples of a chunk either carry a timestamp or none
+    for tsbytes in (0, 8):
+        size = 1 + tsbytes + width
+        if len(body) == n * size:
+            rows = body.reshape(n, size)
+            if np.all(rows[:, 0] == tsbytes):
+                values = np.ascontiguousarray(rows[:, 1 + tsbytes :])
+                return values.view(dtype).reshape(n, count)
+    # otherwise, walk through the samples one by one
+    values = np.empty((n, count), dtype=dtype)
+    pos = 0
+    for ix in range(n):
+        pos += 1 + body[pos]
+        values[ix] = body[pos : pos + width].view(dtype)
+        pos += width
+    return values
+
+
+def iter_samples(
+    xdffile: FileName, stream_id: int, columns: List[int] = None
+) -> Generator[np.ndarray, None, None]:
+    """yield the samples of a numerical stream chunk by chunk, as they are stored in the file
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+    stream_id: int
+        the id of the stream, see :func:`~.scan_headers`
+    columns: List[int]
+        which channels to keep, defaults to all
+
+    returns
+    -------
+    samples: Generator[np.ndarray]
+        the samples of every chunk, with the shape (samples, channels)
+    """
+    dtype, count = None, None
+    for tag, sid, content in _iter_chunks(xdffile, (2, 3), stream_id):
+        if tag == 2:
+            if sid == stream_id:
+                header = _parse_header(content)
+                fmt = header["channel_format"]
+                if fmt not in _XDF_DTYPES:
+                    raise ValueError(f"Can not stream {header['name']} of {fmt}")
+                dtype = _XDF_DTYPES[fmt]
+                count = header["channel_count"]
+            continue
+        if dtype is None:
+            raise IOError(f"Samples of stream {stream_id} precede its header")
+        values = _decode_samples(content, dtype, count)
+        yield values if columns is None else values[:, columns]
+
+
+def stream_epochs(
+    xdffile: FileName,
+    stream_id: int,
+    onsets: List[int],
+    pre: int,
+    post: int,
+    columns: List[int] = None,
+) -> Generator[Tuple[int, np.ndarray], None, None]:
+    """cut epochs around onsets while reading a stream sequentially from the file
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+    stream_id: int
+        the id of the stream, see :func:`~.scan_headers`
+    onsets: List[int]
+        the sample of each event
+    pre: int
+        how many samples to cut before each onset
+    post: int
+        how many samples to cut after each onset
+    columns: List[int]
+        which channels to keep, defaults to all
+
+    returns
+    -------
+    epochs: Generator[Tuple[int, np.ndarray]]
+        the index of the event and its epoch with the shape (pre + post, channels), as soon as its window is complete. Samples before the start or after the end of the recording are nan.
+
+    Only the last pre + post samples are kept in a buffer, so the memory needed is proportional to the window and the selected channels, not to the length of the recording.
+    """
+    onsets = np.asarray(onsets, dtype=int)
+    order = np.argsort(onsets, kind="stable")
+    window = pre + post
+    pending = 0
+    buffer: np.ndarray = None
+    total = 0  # the number of samples read so far
+    for chunk in iter_samples(xdffile, stream_id, columns):
+        if buffer is None:
+            buffer = np.full((window, chunk.shape[1]), nan)
+        total += len(chunk)
+        # buffer holds the samples [total - len(chunk) - window, total - len(chunk))
+        block = np.concatenate((buffer, chunk.astype(float)), axis=0)
+        start = total - len(block)
+        while pending < len(order):
+            ix = order[pending]
+            begin, end = onsets[ix] - pre, onsets[ix] + post
+            if end > total:
+                break
+            epoch = np.full((window, block.shape[1]), nan)
+            a, b = max(begin, start), end
+            if b > a:
+                epoch[a - begin : b - begin] = block[a - start : b - start]
+            yield int(ix), epoch
+            pending += 1
+        buffer = block[len(block) - window :] if window else block[:0]
+    # events whose window reaches beyond the end of the recording
+    for ix in order[pending:]:
+        epoch = np.full((window, 0 if buffer is None else buffer.shape[1]), nan)
+        if buffer is not None:
+            begin, start = onsets[ix] - pre, total - window
+            a, b = max(begin, start), min(onsets[ix] + post, total)
+            if b > a:
+                epoch[a - begin : b - begin] = buffer[a - start : b - start]
+        yield int(ix), epoch
+
+
+def cut_streamed(
+    xdffile: FileName,
+    key: str,
+    onsets: List[int],
+    pre: int,
+    post: int,
+    columns: List[int] = None,
+) -> List[np.ndarray]:
+    """cut the epochs of a stream with :func:`~.stream_epochs`, in the order of the onsets
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+    key: str
+        the key of the stream, as :func:`XDFFile` would return it
+    onsets: List[int]
+        the sample of each event
+    pre: int
+        how many samples to cut before each onset
+    post: int
+        how many samples to cut after each onset
+    columns: List[int]
+        which channels to keep, defaults to all
+
+    returns
+    -------
+    epochs: List[np.ndarray]
+        the epoch of each event with the shape (pre + post, channels)
+    """
+    ids = [h["stream_id"] for h in scan_headers(xdffile) if h["key"] == key]
+    if len(ids) == 0:
+        raise KeyError(f"Stream {key} was not found in {xdffile}")
+    epochs: List[np.ndarray] = [None] * len(onsets)  # type: ignore
+    for ix, epoch in stream_epochs(xdffile, ids[0], onsets, pre, post, columns):
+        epochs[ix] = epoch
+    return epochs
+
+
 def pick_stream_with_channel(channel: str, streams: Dict[str, XDFStream]) -> XDFStream:
     chans: List[str] = []
     datastream = None
@@ -33,33 +411,231 @@ def pick_stream_with_channel(channel: str, streams: Dict[str, XDFStream]) -> XDF
     return datastream
 
 
+def pick_key_with_channel(channel: str, headers: List[Dict[str, Any]]) -> str:
+    """the key of the stream with this channel, like :func:`~.pick_stream_with_channel` but using the headers from :func:`~.scan_headers`"""
+    keys = [
+        h["key"]
+        for h in headers
+        if h["hostname"] == "SEPHYS-CTRL" and channel in (h["channel_labels"] or [])
+    ]
+    if len(keys) > 1:
+        raise Exception("Too many EEG streams have this channel!")
+    if len(keys) == 0:
+        raise IndexError(f"Could not find the channel {channel} in any stream")
+    return keys[0]
+
+
+def concat_streams(
+    channel: str, files: List[Dict[str, XDFStream]], columns: Any = slice(None)
+) -> Tuple[np.ndarray, np.ndarray, XDFStream]:
+    """concatenate the stream carrying a channel across multiple recordings
+
+    args
+    ----
+    channel: str
+        the name of the channel, see :func:`pick_stream_with_channel`
+    files: List[Dict[str, XDFStream]]
+        the streams of each recording, e.g. from :func:`XDFFile`
+    columns: Any
+        which columns of the time_series to keep, e.g. the index of a single channel or :code:`slice(0, 64)`. Defaults to all columns
+
+    returns
+    -------
+    time_series: np.ndarray
+        the selected columns of all recordings in one array
+    time_stamps: np.ndarray
+        the time_stamps of all recordings in one array
+    datastream: XDFStream
+        the stream picked from the last recording, e.g. for its nominal_srate
+
+    The recordings are ordered by their first time_stamp. Because the LSL clock is continuous and monotonic, we do not need to correct for any possible reset between recordings. Both arrays are preallocated once and filled recording by recording, so the cost grows linearly with the number of recordings.
+    """
+    datastreams = [pick_stream_with_channel(channel, streams) for streams in files]
+    ordered = sorted(
+        (s for s in datastreams if len(s.time_stamps) > 0),
+        key=lambda s: s.time_stamps[0],
+    )
+    count = sum(len(s.time_stamps) for s in ordered)
+    template = np.asanyarray(datastreams[-1].time_series)[:0, columns]
+    dtype = np.result_type(*(s.time_series.dtype for s in datastreams))
+    time_series = np.empty((count,) + template.shape[1:], dtype=dtype)
+    time_stamps = np.empty(count, dtype=float)
+    start = 0
+    for stream in ordered:
+        stop = start + len(stream.time_stamps)
+        time_series[start:stop] = stream.time_series[:, columns]
+        time_stamps[start:stop] = stream.time_stamps
+        start = stop
+    return time_series, time_stamps, datastreams[-1]
+
+
+def match_timestamps(
+    reference: Union[List[float], np.ndarray],
+    events: Union[List[float], np.ndarray],
+    relative: str = "closest",
+    max_delta: float = inf,
+) -> np.ndarray:
+    """find the index of the matching reference timestamp for all events at once
+
+    args
+    ----
+    reference: Union[List[float], np.ndarray]
+        the timestamps to be matched against, e.g. the time_stamps of a datastream. These are expected to be sorted, as they are in any xdf-stream, and are only sorted here if they are not
+    events: Union[List[float], np.ndarray]
+        the timestamps of the events, e.g. the markers of the stimuli
+    relative: str
+        whether to match the "closest" reference timestamp, or only the closest one which is "earlier" or "later" than (or identical to) the event
+    max_delta: float
+        the maximal time difference in seconds between event and reference for a valid match
+
+    returns
+    -------
+    idx: np.ndarray
+        the index into reference for each event, and -1 for events without a match within max_delta or in the requested direction
+    """
+    if relative not in ("closest", "earlier", "later"):
+        raise ValueError(f"Unknown relative {relative}")
+    reference, order = _sorted(reference)
+    events = np.asarray(events, dtype=float).ravel()
+    if len(reference) == 0:
+        return np.full(len(events), -1, dtype=int)
+    n = len(reference)
+    left, right = _neighbours(reference, events)
+    dl = np.where(left >= 0, events - reference[left.clip(0, n - 1)], inf)
+    dr = np.where(right < n, reference[right.clip(0, n - 1)] - events, inf)
+    if relative == "earlier":
+        idx, delta = left, dl
+    elif relative == "later":
+        idx, delta = right, dr
+    else:
+        # ties are resolved towards the earlier timestamp, like np.argmin
+        pick_left = dl <= dr
+        idx = np.where(pick_left, left, right)
+        delta = np.where(pick_left, dl, dr)
+    idx = np.where((delta < inf) & (delta <= max_delta), idx, -1).astype(int)
+    if order is not None:
+        idx = np.where(idx >= 0, order[idx.clip(0, n - 1)], -1)
+    return idx
+
+
+def _sorted(reference) -> Tuple[np.ndarray, Union[np.ndarray, None]]:
+    "return the reference sorted, and the order used for sorting if it was not"
+    reference = np.asarray(reference, dtype=float).ravel()
+    if np.any(np.diff(reference) < 0):
+        order = np.argsort(reference, kind="stable")
+        return reference[order], order
+    return reference, None
+
+
+def _neighbours(reference: np.ndarray, events: np.ndarray):
+    "the last reference <= event and the first reference >= event"
+    right = np.searchsorted(reference, events, side="left")
+    left = np.searchsorted(reference, events, side="right") - 1
+    return left, right
+
+
+def match_one_to_one(
+    reference: Union[List[float], np.ndarray],
+    events: Union[List[float], np.ndarray],
+    relative: str = "closest",
+    max_delta: float = inf,
+) -> np.ndarray:
+    """match events to reference timestamps, using each reference timestamp at most once
+
+    args
+    ----
+    reference: Union[List[float], np.ndarray]
+        the timestamps to be matched against, e.g. the markers carrying coordinates
+    events: Union[List[float], np.ndarray]
+        the timestamps of the events
+    relative: str
+        whether to match the "closest" reference timestamp, or only the closest one which is "earlier" or "later" than (or identical to) the event
+    max_delta: float
+        the maximal time difference in seconds between event and reference for a valid match
+
+    returns
+    -------
+    idx: np.ndarray
+        the index into reference for each event, and -1 for events without a match
+
+    Events are assigned in their given order, and each takes the closest reference timestamp not yet taken by an earlier event. If no two events compete for the same reference timestamp, this is identical to :func:`match_timestamps` and is computed at once. Otherwise, the already taken timestamps are skipped with a union-find over the sorted references, instead of rebuilding a list for every event.
+    """
+    idx = match_timestamps(reference, events, relative, max_delta)
+    valid = idx[idx >= 0]
+    if len(np.unique(valid)) == len(valid):
+        return idx
+
+    reference, order = _sorted(reference)
+    events = np.asarray(events, dtype=float).ravel()
+    n = len(reference)
+    left, right = _neighbours(reference, events)
+    # nxt[i] points towards the first free index >= i, with n for none left
+    # prv[i + 1] points towards the last free index <= i, with 0 for none left
+    nxt = list(range(n + 1))
+    prv = list(range(n + 1))
+
+    def find(parent, i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    matched = np.full(len(events), -1, dtype=int)
+    for ix, (ts, l, r) in enumerate(zip(events, left, right)):
+        fl = find(prv, l + 1) - 1
+        fr = find(nxt, r)
+        dl = ts - reference[fl] if fl >= 0 else inf
+        dr = reference[fr] - ts if fr < n else inf
+        if relative == "earlier":
+            pick, delta = fl, dl
+        elif relative == "later":
+            pick, delta = fr, dr
+        else:
+            pick, delta = (fl, dl) if dl <= dr else (fr, dr)
+        if delta == inf or delta > max_delta:
+            continue
+        matched[ix] = pick
+        nxt[pick] = pick + 1
+        prv[pick + 1] = pick
+    if order is not None:
+        matched = np.where(matched >= 0, order[matched.clip(0, n - 1)], -1)
+    return matched
+
+
+def _warn_delta(reference: np.ndarray, events: np.ndarray, idx: np.ndarray, limit):
+    delta = np.abs(np.asarray(reference)[idx] - events)
+    for d in delta[delta > limit]:
+        print(f"Warning: Closest sample has a high time delta {d:3.5f}s")
+
+
 def find_closest_samples(stream: XDFStream, tstamps: List[float]) -> List[int]:
-    event_samples = []
-    for ts in tstamps:
-        tdelta = np.abs(stream.time_stamps - ts)
-        idx = int(np.argmin(tdelta))
-        if tdelta[idx] > 0.5:
-            print(f"Warning: Closest sample has a high time delta {tdelta[idx]:3.5f}s")
-        event_samples.append(idx)
-    return event_samples
+    events = np.asarray(tstamps, dtype=float)
+    idx = match_timestamps(stream.time_stamps, events)
+    if len(events) and (idx < 0).any():
+        raise IndexError("The stream has no samples to match the events against")
+    _warn_delta(stream.time_stamps, events, idx, 0.5)
+    return idx.tolist()
 
 
-def find_closest(ts: float, timestamps: List[float], relative: str = "closest"):
+def find_closest(
+    ts: Union[float, List[float]], timestamps: List[float], relative: str = "closest"
+):
     idx = find_closest_idx(ts, timestamps, relative)
-    return timestamps[idx]
-
-
-def find_closest_idx(ts: float, timestamps: List[float], relative: str = "closest"):
-    if relative == "earlier":  # closest in time, but comment was earlier
-        rt = [t - ts for t in timestamps if t <= ts]
-    elif relative == "later":  # closest in time, but comment was later
-        rt = [t - ts for t in timestamps if t >= ts]
-    else:  # closest in time
-        rt = [t - ts for t in timestamps]
-    td = np.abs(rt)
-    idx = np.argmin(td)
-    if td[idx] > 0.1:
-        print(f"Warning: Closest sample has a high time delta {td[idx]:3.5f}s")
+    return np.asarray(timestamps)[idx]
+
+
+def find_closest_idx(
+    ts: Union[float, List[float]], timestamps: List[float], relative: str = "closest"
+):
+    events = np.asarray(ts, dtype=float)
+    idx = match_timestamps(timestamps, events, relative)
+    if (idx < 0).any():
+        raise ValueError(f"No {relative} timestamp for at least one event")
+    _warn_delta(timestamps, events.ravel(), idx, 0.1)
+    if events.ndim == 0:
+        return int(idx[0])
     return idx
 
 
@@ -74,9 +650,9 @@ def tkeo(a):
 	"""
 
     # Create two temporary arrays of equal length, shifted 1 sample to the right
-    # and left and squared:
-    i = a[1:-1] * a[1:-1]
-    j = a[2:] * a[:-2]
+    # and left and squared. Works along the last axis, e.g. for a stack of epochs:
+    i = a[..., 1:-1] * a[..., 1:-1]
+    j = a[..., 2:] * a[..., :-2]
 
     # Calculate the difference between the two temporary arrays:
     aTkeo = i - j
@@ -84,7 +660,13 @@ def tkeo(a):
     return aTkeo
 
 
-def correct_tkeo(bvr, time_stamps: List[float]) -> List[float]:
+def correct_tkeo(
+    bvr, time_stamps: List[float], xdffile: FileName = None, key: str = None
+) -> List[float]:
+    """shift the time_stamps to the peak of the TMS artifact in the EEG
+
+    If only the time_stamps of the EEG stream were loaded, see :func:`~.load_selected`, the windows around the events are read by streaming the stream with this key from the xdffile.
+    """
     eeg_labels = [
         "Fp1",
         "Fp2",
@@ -151,15 +733,251 @@ def correct_tkeo(bvr, time_stamps: List[float]) -> List[float]:
         "POz",
         "Oz",
     ]
-    pick = [label in eeg_labels for label in bvr.channel_labels]
-    artifact = tkeo(np.std(np.compress(pick, bvr.time_series, axis=1), axis=1))
+    pick = [ix for ix, label in enumerate(bvr.channel_labels) if label in eeg_labels]
+    onsets = match_timestamps(bvr.time_stamps, time_stamps)
+    if has_samples(bvr):
+        onsets, _ = refine_onsets(
+            bvr.time_series, onsets, 50, 50, channels=pick, measure="tkeo"
+        )
+    else:
+        onsets, _ = refine_streamed(xdffile, key, onsets, 50, 50, pick, "tkeo")
+    # the peak can lie outside of the recording for events at its edges
+    return list(bvr.time_stamps[onsets.clip(0, len(bvr.time_stamps) - 1)])
+
 
-    new_ts = []
-    for ts in time_stamps:
-        onset = np.argmin(np.abs(bvr.time_stamps - ts))
-        hood = artifact[onset - 50 : onset + 50]
-        new_ts.append(bvr.time_stamps[onset + np.argmax(hood) - 50])
-    return new_ts
+def refine_onsets(
+    data: np.ndarray,
+    onsets: Union[List[int], np.ndarray],
+    pre: int,
+    post: int,
+    channels: Any = slice(None),
+    measure: str = "gmfp",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """shift every onset to the peak of the TMS artifact in a window around it
+
+    args
+    ----
+    data: np.ndarray
+        the recording with the shape (n_samples, n_channels)
+    onsets: Union[List[int], np.ndarray]
+        the candidate sample of each event
+    pre: int
+        how many samples before each onset to search for the peak
+    post: int
+        how many samples after each onset to search for the peak
+    channels: Any
+        which channels to use for the global mean field power, e.g. :code:`slice(0, 64)` or a list of indices. Defaults to all channels
+    measure: str
+        whether the peak of the global mean field power ("gmfp"), i.e. the standard deviation across channels, or of its :func:`tkeo` ("tkeo") marks the artifact
+
+    returns
+    -------
+    onsets: np.ndarray
+        the sample of the artifact peak for each event
+    amplitudes: np.ndarray
+        the peak-to-peak amplitude of the measure within each window
+
+    The measure is only computed within the windows, vectorised across all events, so that time and memory grow with the number of events times the window length instead of with the length of the recording. Samples outside of the recording are ignored.
+    """
+    onsets = np.asarray(onsets, dtype=int).reshape(-1)
+    epochs = cut_epochs(data, onsets, pre, _artifact_post(post, measure))
+    return _artifact_peaks(_artifact(epochs[:, :, channels], measure), onsets, pre)
+
+
+def refine_streamed(
+    xdffile: FileName,
+    key: str,
+    onsets: Union[List[int], np.ndarray],
+    pre: int,
+    post: int,
+    channels: List[int],
+    measure: str = "gmfp",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """shift every onset to the peak of the TMS artifact, reading the windows by streaming the file
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+    key: str
+        the key of the stream, as :func:`XDFFile` would return it
+    channels: List[int]
+        the indices of the channels to use for the global mean field power
+
+    See :func:`~.refine_onsets` for the other arguments and the return values. Only the windows around the onsets are kept in memory, see :func:`~.cut_streamed`.
+    """
+    onsets = np.asarray(onsets, dtype=int).reshape(-1)
+    window = pre + _artifact_post(post, measure)
+    epochs = np.empty((0, window, len(channels)))
+    if len(onsets) > 0:
+        epochs = np.stack(
+            cut_streamed(xdffile, key, onsets, pre, window - pre, columns=channels)
+        )
+    return _artifact_peaks(_artifact(epochs, measure), onsets, pre)
+
+
+def _artifact_post(post: int, measure: str) -> int:
+    "how many samples to cut after the onset to compute the measure for post samples"
+    if measure == "gmfp":
+        return post
+    if measure == "tkeo":
+        # the tkeo of a sample needs its neighbours, so we cut two samples more.
+        # like tkeo over the whole recording, the result is shifted by one sample
+        return post + 2
+    raise ValueError(f"Unknown measure {measure}, use 'gmfp' or 'tkeo'")
+
+
+def _artifact(epochs: np.ndarray, measure: str) -> np.ndarray:
+    "the global mean field power within each epoch, or its tkeo"
+    gmfp = np.std(epochs, axis=2)
+    return tkeo(gmfp) if measure == "tkeo" else gmfp
+
+
+def _artifact_peaks(
+    artifact: np.ndarray, onsets: np.ndarray, pre: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    outside = np.isnan(artifact)
+    highest = np.where(outside, -inf, artifact)
+    peaks = np.argmax(highest, axis=1)
+    amplitudes = highest.max(axis=1) - np.where(outside, inf, artifact).min(axis=1)
+    # onsets without any sample in the recording are kept as they are
+    peaks[outside.all(axis=1)] = pre
+    amplitudes[outside.all(axis=1)] = nan
+    return onsets + peaks - pre, amplitudes
+
+
+#: the default threshold for each measure, in multiples of its typical magnitude
+ARTIFACT_THRESHOLDS = {"tkeo": 1000.0, "diff": 30.0}
+
+
+def detect_pulses(
+    chunks: Iterable[np.ndarray],
+    refractory: int,
+    measure: str = "tkeo",
+    threshold: float = None,
+    blocksize: int = 10000,
+) -> np.ndarray:
+    """detect TMS pulses from their artifact while going once through a recording
+
+    args
+    ----
+    chunks: Iterable[np.ndarray]
+        the recording in consecutive chunks, each with the shape (samples[, channels]). For several channels, the measure is computed for each and the largest is used
+    refractory: int
+        how many samples have to pass after the artifact of a pulse before another pulse can be detected
+    measure: str
+        whether to threshold the :func:`tkeo` ("tkeo") or the absolute derivative ("diff") of the signal
+    threshold: float
+        the threshold in multiples of the median magnitude of the measure, which is estimated as the average over all blocks read so far. Defaults to the value in ARTIFACT_THRESHOLDS
+    blocksize: int
+        how many samples to collect from the chunks before they are processed at once
+
+    returns
+    -------
+    onsets: np.ndarray
+        the first sample above threshold for every pulse
+
+    Only the current block and its last two samples are kept in memory, so multi-hour recordings can be processed chunk by chunk, e.g. from :func:`~.iter_samples`. Pulses closer to each other than the refractory period, e.g. in paired-pulse protocols, are detected as a single pulse.
+    """
+    if measure not in ARTIFACT_THRESHOLDS:
+        raise ValueError(f"Unknown measure {measure}, use 'tkeo' or 'diff'")
+    if threshold is None:
+        threshold = ARTIFACT_THRESHOLDS[measure]
+    keep = 2 if measure == "tkeo" else 1
+    onsets: List[np.ndarray] = []
+    blocks: List[np.ndarray] = []
+    tail: np.ndarray = None
+    start = 1  # the sample of the first value of the measure in the next block
+    scales: List[float] = []
+    last = -inf  # the last sample above threshold
+
+    def process(blocks):
+        nonlocal tail, start, last
+        signal = np.concatenate(blocks if tail is None else [tail] + blocks)
+        if measure == "tkeo":
+            magnitude = np.abs(tkeo(signal.T)).max(axis=0)
+        else:
+            magnitude = np.abs(np.diff(signal, axis=0)).max(axis=1)
+        tail = signal[-keep:]
+        if len(magnitude) == 0:
+            return
+        scales.append(float(np.median(magnitude)))
+        above = np.flatnonzero(magnitude > threshold * np.mean(scales)) + start
+        start += len(magnitude)
+        if len(above) == 0:
+            return
+        previous = np.concatenate(([last], above[:-1]))
+        onsets.append(above[above - previous >= refractory])
+        last = above[-1]
+
+    count = 0
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=float)
+        if len(chunk) == 0:
+            continue
+        blocks.append(chunk.reshape(len(chunk), -1))
+        count += len(chunk)
+        if count >= blocksize:
+            process(blocks)
+            blocks, count = [], 0
+    if blocks:
+        process(blocks)
+    if len(onsets) == 0:
+        return np.empty(0, dtype=int)
+    return np.concatenate(onsets).astype(int)
+
+
+def yield_timestamps_artifact(
+    xdffile: FileName,
+    key: str,
+    stream: XDFStream,
+    channel: str,
+    refractory_in_ms: float = 500,
+    measure: str = "tkeo",
+    threshold: float = None,
+):
+    """yield the timestamps of the TMS pulses detected from the artifact in a channel
+
+    This is useful if the marker streams were not recorded. The samples are read by streaming them from the file with :func:`~.detect_streamed`, so the stream only needs its time_stamps, e.g. as loaded with :code:`samples=False`. See :func:`~.detect_pulses` for the other arguments.
+    """
+    refractory = int(refractory_in_ms * float(stream.nominal_srate) / 1000)
+    onsets = detect_streamed(xdffile, key, channel, refractory, measure, threshold)
+    print(f"Detected {len(onsets)} pulses from the artifact in {channel}")
+    yield from np.asarray(stream.time_stamps)[onsets]
+
+
+def detect_streamed(
+    xdffile: FileName,
+    key: str,
+    channel: str,
+    refractory: int,
+    measure: str = "tkeo",
+    threshold: float = None,
+) -> np.ndarray:
+    """detect the TMS pulses in a channel while reading its stream from the file
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+    key: str
+        the key of the stream, as :func:`XDFFile` would return it
+    channel: str
+        the channel with the artifact
+
+    returns
+    -------
+    onsets: np.ndarray
+        the sample of every pulse, e.g. for :func:`~.cut_streamed`
+
+    See :func:`~.detect_pulses` for the other arguments. The file is read once, and only one block of samples is kept in memory.
+    """
+    headers = [h for h in scan_headers(xdffile) if h["key"] == key]
+    if len(headers) == 0:
+        raise KeyError(f"Stream {key} was not found in {xdffile}")
+    cix = headers[0]["channel_labels"].index(channel)
+    chunks = iter_samples(xdffile, headers[0]["stream_id"], [cix])
+    return detect_pulses(chunks, refractory, measure, threshold)
 
 
 # -----------------------------------------------------------------------------
@@ -194,39 +1012,90 @@ def yield_timestamps_spongebob(stream, event_mark=1):
         return
 
 
-def yield_timestamps_localite(stream, event_mark="coil_0_didt"):
-    marker = iter(stream.time_series)
-    tstamps = iter(stream.time_stamps)
-    trigger_time = None
+#: the fields of a decoded localite marker stream, see :func:`parse_localite`
+LOCALITE_DTYPE = np.dtype(
+    [
+        ("time_stamp", float),
+        ("amplitude", float),
+        ("x", float),
+        ("y", float),
+        ("z", float),
+        ("didt", float),
+        ("kind", "U5"),
+    ]
+)
+
+_localite_tables: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def _as_float(value) -> float:
     try:
-        while True:
-            msg = decode_marker(next(marker))
-            ts = next(tstamps)
-            if (
-                msg == "Starte Hotspotsuche"
-                or msg == "Starte Ruhemotorschwelle"
-                or msg == "Starte freien Modus"
-            ):
-                continue
-            if type(msg) is dict:
-                if event_mark in msg.keys():
-                    # this is the timestamp when we received a TriggerOut confirmation from the Localite Server
-                    trigger_time = ts
-                if "amplitude" in msg.keys() and msg["amplitude"] != 0:
-                    # greedy evaluation makes sure i either get the first,
-                    # and  the second only if the first is falseish or None
-                    # so it is either the timestamp from event_mark, or the
-                    # one were we received no confirmation
-                    trigger_time = trigger_time or ts
-                    pos = [msg[dim] for dim in ["x", "y", "z"]]
-                    # if not any(p == None for p in pos):
-                    yield trigger_time
-                    # else:
-                    #    print("Event is missing coordinates. Skipping")
-                    trigger_time = None
+        return float(value)
+    except (TypeError, ValueError):
+        return nan
 
-    except StopIteration:
-        return
+
+def parse_localite(stream: XDFStream, event_mark: str = "coil_0_didt") -> np.ndarray:
+    """decode all markers of a localite stream once into a structured table
+
+    args
+    ----
+    stream: XDFStream
+        the localite_marker or localite_flow stream
+    event_mark: str
+        the key of the marker confirming the dI/dt of a pulse
+
+    returns
+    -------
+    table: np.ndarray
+        one row per marker with the fields of :data:`LOCALITE_DTYPE`. The kind is "pulse" for markers with a non-zero amplitude, "didt" for markers carrying the event_mark, "text" for markers which are no json-dictionary, and "other" otherwise. Missing values are nan.
+
+    The table is cached for the lifetime of the stream, so that the timestamps, coordinates and intensities are all read from a single pass over the markers. It is therefore read-only.
+    """
+    tables = _localite_tables.setdefault(stream, dict())
+    if event_mark in tables:
+        return tables[event_mark]
+    table = np.zeros(len(stream.time_stamps), dtype=LOCALITE_DTYPE)
+    table["time_stamp"] = stream.time_stamps
+    for field in ("amplitude", "x", "y", "z", "didt"):
+        table[field] = nan
+    table["kind"] = "other"
+    for row, mark in zip(table, stream.time_series):
+        msg = decode_marker(mark)
+        if type(msg) is not dict:
+            row["kind"] = "text"
+            continue
+        if event_mark in msg.keys():
+            row["didt"] = _as_float(msg[event_mark])
+            row["kind"] = "didt"
+        if "amplitude" in msg.keys() and msg["amplitude"] != 0:
+            row["amplitude"] = _as_float(msg["amplitude"])
+            for dim in ("x", "y", "z"):
+                row[dim] = _as_float(msg.get(dim, None))
+            row["kind"] = "pulse"
+    table.setflags(write=False)
+    tables[event_mark] = table
+    return table
+
+
+def localite_trigger_times(table: np.ndarray) -> np.ndarray:
+    """the timestamp of every pulse in a table from :func:`parse_localite`
+
+    This is the timestamp when we received a TriggerOut confirmation, i.e. the marker with the dI/dt, from the Localite Server since the last pulse, or the timestamp of the pulse marker itself if there was no such confirmation.
+    """
+    rows = np.arange(len(table))
+    is_pulse = table["kind"] == "pulse"
+    has_didt = ~np.isnan(table["didt"])
+    last_didt = np.maximum.accumulate(np.where(has_didt, rows, -1))
+    last_pulse = np.maximum.accumulate(np.where(is_pulse, rows, -1))
+    previous_pulse = np.concatenate(([-1], last_pulse[:-1]))
+    confirmed = last_didt > previous_pulse
+    trigger = np.where(confirmed, last_didt, rows)
+    return table["time_stamp"][trigger[is_pulse]]
+
+
+def yield_timestamps_localite(stream, event_mark="coil_0_didt"):
+    yield from localite_trigger_times(parse_localite(stream, event_mark))
 
 
 def yield_timestamps(stream: XDFStream, event_mark: Union[str, int]):
@@ -257,84 +1126,95 @@ def yield_comments(
     ct: List[float] = []
     for t, m in zip(stream.time_stamps, stream.time_series):
         if identifier in m[0]:
-            comments.append(m)
+            comments.append(m[0])
             ct.append(t)
-    for ts in time_stamps:
-        if len(ct) == 0:
-            yield ""
-            continue
-        if relative == "earlier":  # closest in time, but comment was earlier
-            _ct = [t - ts for t in ct if t <= ts]
-        elif relative == "later":  # closest in time, but comment was later
-            _ct = [t - ts for t in ct if t >= ts]
-        else:  # closest in time
-            _ct = [t - ts for t in ct]
-        idx = np.argmin(np.abs(_ct))
-        # we pop, therefore no comment can be returned twice
-        ct.pop(idx)
-        yield comments.pop(idx)[0]
+    # no comment can be returned twice
+    for idx in match_one_to_one(ct, time_stamps, relative):
+        yield comments[idx] if idx >= 0 else ""
 
 
-def yield_loc_coords(
-    stream: XDFStream, time_stamps: List[float], relative: str = "later"
-):
-    coords = []
-    ct: List[float] = []
-    for t, m in zip(stream.time_stamps, stream.time_series):
-        msg = decode_marker(m)
-        if type(msg) is dict:
-            if "amplitude" in msg.keys() and msg["amplitude"] != 0:
-                pos = [msg[dim] for dim in ["x", "y", "z"]]
-                coords.append(pos)
-                ct.append(t)
-    print(f"Found {len(coords)} coordinates for {len(time_stamps)} events", end="")
-    if len(ct) < len(time_stamps):
+def _report_found(what: str, found: int, count: int):
+    print(f"Found {found} {what} for {count} events", end="")
+    if found < count:
         print(". Filling up missing information with nan")
     else:
         print()
-    for ts in time_stamps:
-        if relative == "earlier":  # closest in time, but comment was earlier
-            _ct = [t - ts for t in ct if t <= ts]
-        elif relative == "later":  # closest in time, but comment was later
-            _ct = [t - ts for t in ct if t >= ts]
-        else:  # closest in time
-            _ct = [t - ts for t in ct]
-        try:
-            idx = np.argmin(np.abs(_ct))
-        except Exception as e:
-            print(coords, ct)
-            raise (e)
-        # we pop, therefore no coordinate can be returned twice
-        ct.pop(idx)
-        yield coords.pop(idx)
+
+
+def _match_pulses(
+    table: np.ndarray, time_stamps: List[float], relative: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    pulses = table[table["kind"] == "pulse"]
+    # no pulse can be assigned twice
+    idx = match_one_to_one(pulses["time_stamp"], time_stamps, relative)
+    return pulses, idx
+
+
+def _match_didt(
+    table: np.ndarray, time_stamps: List[float], relative: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    didts = table[~np.isnan(table["didt"])]
+    idx = match_one_to_one(didts["time_stamp"], time_stamps, relative)
+    return didts, idx
+
+
+def _pick(values: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    "the values at idx, and nan where idx is -1"
+    picked = np.full(len(idx), nan)
+    picked[idx >= 0] = values[idx[idx >= 0]]
+    return picked
+
+
+def assign_localite(
+    stream: XDFStream, time_stamps: List[float], event_mark: str = "coil_0_didt"
+) -> Tuple[List[List[float]], List[float], List[float]]:
+    """assign coordinates, dI/dt and MSO from a localite stream to all events at once
+
+    args
+    ----
+    stream: XDFStream
+        the localite_marker stream
+    time_stamps: List[float]
+        the timestamps of the events
+    event_mark: str
+        the key of the marker confirming the dI/dt of a pulse
+
+    returns
+    -------
+    coords: List[List[float]]
+        the xyz-coordinates of the pulse following each event
+    didt: List[float]
+        the dI/dt closest to each event
+    mso: List[float]
+        the amplitude of the pulse following each event
+
+    Events without any matching marker are filled up with nan.
+    """
+    table = parse_localite(stream, event_mark)
+    pulses, idx = _match_pulses(table, time_stamps, "later")
+    coords = np.stack([_pick(pulses[dim], idx) for dim in ("x", "y", "z")], axis=1)
+    mso = _pick(pulses["amplitude"], idx)
+    didts, idx = _match_didt(table, time_stamps, "closest")
+    didt = _pick(didts["didt"], idx)
+    count = len(time_stamps)
+    _report_found("coordinates", len(pulses), count)
+    _report_found("didt comments", len(didts), count)
+    return coords.tolist(), didt.tolist(), mso.tolist()
+
+
+def yield_loc_coords(
+    stream: XDFStream, time_stamps: List[float], relative: str = "later"
+):
+    pulses, idx = _match_pulses(parse_localite(stream), time_stamps, relative)
+    _report_found("coordinates", len(pulses), len(time_stamps))
+    dims = [_pick(pulses[dim], idx) for dim in ("x", "y", "z")]
+    yield from np.stack(dims, axis=1).tolist()
 
 
 def yield_loc_mso(stream: XDFStream, time_stamps: List[float], relative: str = "later"):
-    mso = []
-    ct: List[float] = []
-    for t, m in zip(stream.time_stamps, stream.time_series):
-        msg = decode_marker(m)
-        if type(msg) is dict:
-            if "amplitude" in msg.keys() and msg["amplitude"] != 0:
-                mso.append(msg["amplitude"])
-                ct.append(t)
-
-    print(f"Found {len(ct)} mso comments for {len(time_stamps)} events", end="")
-    if len(ct) < len(time_stamps):
-        print(". Filling up missing information with nan")
-    else:
-        print()
-    for ts in time_stamps:
-        if relative == "earlier":  # closest in time, but comment was earlier
-            _ct = [t - ts for t in ct if t <= ts]
-        elif relative == "later":  # closest in time, but comment was later
-            _ct = [t - ts for t in ct if t >= ts]
-        else:  # closest in time
-            _ct = [t - ts for t in ct]
-        idx = np.argmin(np.abs(_ct))
-        # we pop, therefore no coordinate can be returned twice
-        ct.pop(idx)
-        yield mso.pop(idx)
+    pulses, idx = _match_pulses(parse_localite(stream), time_stamps, relative)
+    _report_found("mso comments", len(pulses), len(time_stamps))
+    yield from _pick(pulses["amplitude"], idx).tolist()
 
 
 def yield_loc_didt(
@@ -343,33 +1223,9 @@ def yield_loc_didt(
     event_mark: str = "coil_0_didt",
     relative: str = "closest",
 ):
-    didt = []
-    ct: List[float] = []
-    for t, m in zip(stream.time_stamps, stream.time_series):
-        msg = decode_marker(m)
-        if type(msg) is dict:
-            if event_mark in msg.keys():
-                didt.append(msg[event_mark])
-                ct.append(t)
-    print(f"Found {len(ct)} didt comments for {len(time_stamps)} events", end="")
-    if len(ct) < len(time_stamps):
-        print(". Filling up missing information with nan")
-    else:
-        print()
-    for ts in time_stamps:
-        if len(ct) == 0:
-            yield nan
-            continue
-        if relative == "earlier":  # closest in time, but comment was earlier
-            _ct = [t - ts for t in ct if t <= ts]
-        elif relative == "later":  # closest in time, but comment was later
-            _ct = [t - ts for t in ct if t >= ts]
-        else:  # closest in time
-            _ct = [t - ts for t in ct]
-        idx = np.argmin(np.abs(_ct))
-        # we pop, therefore no coordinate can be returned twice
-        ct.pop(idx)
-        yield didt.pop(idx)
+    didts, idx = _match_didt(parse_localite(stream, event_mark), time_stamps, relative)
+    _report_found("didt comments", len(didts), len(time_stamps))
+    yield from _pick(didts["didt"], idx).tolist()
 
 
 def list_nan_coords(count: int):
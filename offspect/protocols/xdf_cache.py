@@ -0,0 +1,172 @@
+"""
+XDF cache
+---------
+
+Parsing an :code:`.xdf`-file decodes every chunk of every stream, which takes long for recordings of an hour or more. Because we ingest the same recordings repeatedly, e.g. with different channels, pre/post durations or readouts, the parsed streams can be kept in a cache directory. The numerical time_series and time_stamps are stored as :code:`.npy`-files and opened memory-mapped, while the stream info and marker streams are stored as json.
+
+The cache is opt-in, either by passing a directory to :func:`~.load_streams`, with :code:`offspect tms --xdf-cache <dir>` or by setting the environment variable :code:`OFFSPECT_XDF_CACHE`.
+
+.. code-block:: python
+
+   from offspect.protocols.xdf_cache import load_cached
+   streams = load_cached("recording.xdf", "~/.cache/offspect")
+
+Entries are keyed by the absolute path, size and modification time of the file, so a changed file is parsed again. If the cache grows beyond its size limit, the least recently used entries are evicted.
+"""
+from liesl.api import XDFFile
+from liesl.files.xdf.load import XDFStream
+from offspect.types import FileName
+from typing import Dict, List, Tuple, Any
+from collections import defaultdict
+from pathlib import Path
+from hashlib import sha1
+import numpy as np
+import shutil
+import json
+import os
+
+#: the default size limit of the cache directory in bytes
+XDF_CACHE_BYTES = 20 * 1024 ** 3
+
+
+def cache_key(xdffile: FileName) -> str:
+    "the key of the cache entry for this file, based on its path, size and mtime"
+    fname = Path(xdffile).expanduser().absolute()
+    stat = fname.stat()
+    return sha1(f"{fname}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+def _write_entry(entry: Path, xdffile: FileName, streams: Dict[str, XDFStream]):
+    manifest: Dict = {"source": str(xdffile), "streams": []}
+    for ix, (name, stream) in enumerate(streams.items()):
+        info = {
+            "name": name,
+            "info": stream._stream["info"],
+            "time_stamps": f"{ix}_time_stamps.npy",
+        }
+        np.save(entry / info["time_stamps"], np.asarray(stream.time_stamps))
+        if isinstance(stream.time_series, np.ndarray):
+            info["time_series"] = f"{ix}_time_series.npy"
+            np.save(entry / info["time_series"], stream.time_series)
+        else:
+            info["markers"] = [list(m) for m in stream.time_series]
+        manifest["streams"].append(info)
+    with (entry / "manifest.json").open("w") as f:
+        json.dump(manifest, f, default=str)
+
+
+def _as_parsed(item: Any) -> Any:
+    "restore the defaultdicts pyxdf parses the xml into, as liesl relies on them"
+    if isinstance(item, dict):
+        parsed: defaultdict = defaultdict(list)
+        for key, value in item.items():
+            parsed[key] = _as_parsed(value)
+        return parsed
+    if isinstance(item, list):
+        return [_as_parsed(i) for i in item]
+    return item
+
+
+def _read_entry(entry: Path, xdffile: FileName) -> Dict[str, XDFStream]:
+    with (entry / "manifest.json").open("r") as f:
+        manifest = json.load(f)
+    streams: Dict[str, XDFStream] = dict()
+    for info in manifest["streams"]:
+        # copy-on-write, so that protocols can cut traces in-place without
+        # touching the cache
+        time_stamps = np.load(entry / info["time_stamps"], mmap_mode="c")
+        if "time_series" in info:
+            time_series = np.load(entry / info["time_series"], mmap_mode="c")
+        else:
+            time_series = info["markers"]
+        stream = XDFStream(
+            {
+                "info": _as_parsed(info["info"]),
+                "time_series": time_series,
+                "time_stamps": time_stamps,
+            }
+        )
+        stream.origin = str(xdffile)
+        streams[info["name"]] = stream
+    return streams
+
+
+def _entries(cachedir: Path) -> List[Tuple[float, int, Path]]:
+    "all complete entries with their last use and size"
+    entries = []
+    for entry in cachedir.iterdir():
+        manifest = entry / "manifest.json"
+        if entry.is_dir() and manifest.exists():
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((manifest.stat().st_mtime, size, entry))
+    return sorted(entries)
+
+
+def evict(cachedir: FileName, max_bytes: int = XDF_CACHE_BYTES, keep: str = None):
+    """remove the least recently used entries until the cache fits into max_bytes
+
+    args
+    ----
+    cachedir: FileName
+        the cache directory
+    max_bytes: int
+        the size limit of the cache directory
+    keep: str
+        the key of an entry never to be evicted, e.g. the one just written
+    """
+    entries = _entries(Path(cachedir).expanduser())
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        if entry.name == keep:
+            continue
+        print(f"XDFCACHE: Evicting {entry.name}")
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+
+def load_cached(
+    xdffile: FileName, cachedir: FileName, max_bytes: int = XDF_CACHE_BYTES
+) -> Dict[str, XDFStream]:
+    """load the streams of an xdf-file from the cache, parsing and caching it if needed
+
+    args
+    ----
+    xdffile: FileName
+        the :code:`.xdf`-file with the recorded streams
+    cachedir: FileName
+        the cache directory, which is created if it does not exist
+    max_bytes: int
+        the size limit of the cache directory
+
+    returns
+    -------
+    streams: Dict[str, XDFStream]
+        the streams of the file, indexed by their name, as :func:`XDFFile` returns them
+    """
+    cachedir = Path(cachedir).expanduser()
+    cachedir.mkdir(parents=True, exist_ok=True)
+    key = cache_key(xdffile)
+    entry = cachedir / key
+    if (entry / "manifest.json").exists():
+        print(f"XDFCACHE: Loading {xdffile} from {entry}")
+        os.utime(entry / "manifest.json")
+        return _read_entry(entry, xdffile)
+
+    streams = XDFFile(xdffile)
+    # write into a temporary directory first, so that an interrupted run
+    # never leaves an incomplete entry behind
+    tmp = cachedir / f"{key}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    try:
+        _write_entry(tmp, xdffile, streams)
+        tmp.rename(entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not (entry / "manifest.json").exists():
+            raise
+    print(f"XDFCACHE: Stored {xdffile} in {entry}")
+    evict(cachedir, max_bytes, keep=key)
+    return _read_entry(entry, xdffile)
@@ -0,0 +1,143 @@
+import pytest
+from offspect.cache.attrs import decode, encode, _decode_yaml, _encode_yaml
+from offspect.cache.attrs import get_valid_trace_types
+from pathlib import Path
+from math import nan, inf, isnan
+import datetime
+import random
+
+strings = [
+    "",
+    "~",
+    "null",
+    "Null",
+    "None",
+    "nan",
+    "NaN",
+    ".nan",
+    "inf",
+    "-inf",
+    ".inf",
+    "-.inf",
+    "+.inf",
+    "True",
+    "true",
+    "FALSE",
+    "yes",
+    "No",
+    "on",
+    "OFF",
+    "y",
+    "0",
+    "-0",
+    "007",
+    "+5",
+    "12",
+    "-12",
+    "1_000",
+    "0x1f",
+    "1:30",
+    "1.5",
+    "-0.0",
+    "1.",
+    ".5",
+    "1e5",
+    "1.5e5",
+    "1.5e-05",
+    "1.0e+16",
+    "1.5E+05",
+    "2020-01-01",
+    "2020-01-01 12:00:00.1",
+    "hello",
+    "hello world",
+    "EDC_L",
+    "subject: 1",
+    "# comment",
+    "'quoted'",
+    '"quoted"',
+    "[]",
+    "[ ]",
+    "[1, 2, 3]",
+    "[1,2,3]",
+    "[1.5, -2.0, nan]",
+    "[nan, inf, -inf, .inf]",
+    "[True, None, 1]",
+    "['EDC_L', 'FDI_R']",
+    "['5', 'nan', '']",
+    "['it''s', 'a']",
+    "[a, b, ]",
+    "[[1, 2], 3]",
+    "[1, 2",
+    "[a b, c]",
+    "{a: 1}",
+    "- 1",
+]
+
+
+def same(a, b):
+    if type(a) != type(b):
+        return False
+    if type(a) == list:
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if type(a) == float and isnan(a):
+        return isnan(b)
+    return a == b
+
+
+@pytest.mark.parametrize("value", strings)
+def test_decode_equals_yaml(value):
+    try:
+        expected = _decode_yaml(value)
+    except Exception as e:
+        with pytest.raises(type(e)):
+            decode(value)
+        return
+    assert same(decode(value), expected)
+    # memoized values are returned identically
+    assert same(decode(value), expected)
+
+
+def test_decode_memoized_list_is_copied():
+    a = decode("[1, 2, 3]")
+    a.append(4)
+    assert decode("[1, 2, 3]") == [1, 2, 3]
+
+
+def test_decode_memoized_nested_is_copied():
+    value = "{a: [1, 2], b: {c: 1}}"
+    decoded = decode(value)
+    decoded["a"].append(3)
+    decoded["b"]["c"] = 2
+    decoded.clear()
+    assert decode(value) == {"a": [1, 2], "b": {"c": 1}}
+
+
+
+def test_valid_trace_types_are_copied():
+    types = get_valid_trace_types("tms", "cmep")
+    expected = dict(types)
+    types.clear()
+    assert get_valid_trace_types("tms", "cmep") == expected
+def test_encode_equals_yaml():
+    rng = random.Random(0)
+    values = [0, -1, 12345678901234567890, True, False, None, nan, inf, -inf]
+    values += [0.0, -0.0, 1.0, 0.1, 1e16, 1e-05, 1.5e300, -2.5e-300, 1 / 3]
+    values += [rng.uniform(-1e6, 1e6) for _ in range(200)]
+    values += [rng.randint(-(10 ** 9), 10 ** 9) for _ in range(200)]
+    values += [10 ** rng.uniform(-20, 20) for _ in range(200)]
+    for value in values:
+        enc = encode(value)
+        assert enc == _encode_yaml(value)
+        assert same(decode(enc), _decode_yaml(enc))
+        assert same(decode(enc), value)
+
+
+def test_encode_passthrough():
+    assert encode("hello") == "hello"
+    assert encode([1, 2.5]) == "[1, 2.5]"
+    assert same(decode(encode([1, 2.5, nan])), [1, 2.5, nan])
+    assert encode(Path("/tmp")) == "/tmp"
+    now = datetime.datetime.now()
+    assert encode(now) == str(now)
+    with pytest.raises(ValueError):
+        encode((1, 2))
@@ -0,0 +1,44 @@
+import pytest
+from offspect.cache.file import CacheFile, decode, encode
+from offspect.cache.estimate import estimate_parameters, estimate_peaks
+from offspect.cache.steps import process_data
+import numpy as np
+import tempfile
+from pathlib import Path
+
+
+def test_estimate_peaks():
+    data = np.zeros((3, 100))
+    data[:, 30] = -1
+    data[:, 50] = 2
+    data[2] = np.roll(data[2], 5)
+    nlat, namp, plat, pamp = estimate_peaks(data, [10, 10, 15], 1000, (10, 60))
+    assert list(nlat) == [20, 20, 20] and list(plat) == [40, 40, 40]
+    assert list(namp) == [-1, -1, -1] and list(pamp) == [2, 2, 2]
+    # windows reaching beyond the trace are cut, as with slicing
+    nlat, namp, plat, pamp = estimate_peaks(data, [60], 1000, (10, 60))
+    assert plat[0] == 10 and pamp[0] == 0
+    with pytest.raises(ValueError):
+        estimate_peaks(np.zeros((3, 100, 2)), [10, 10, 10], 1000, (10, 60))
+
+
+def test_estimate_parameters(cachefile1):
+    with tempfile.TemporaryDirectory() as folder:
+        tf = Path(folder) / "estimate.hdf5"
+        tf.write_bytes(Path(cachefile1[0]).read_bytes())
+        cf = CacheFile(tf)
+        attrs = cf.get_trace_attrs(1)
+        attrs["_log"] = encode(["flipsign on now"])
+        attrs["onset_shift"] = encode(3)
+        cf.set_trace_attrs(1, attrs)
+        assert estimate_parameters(cf, window=(15, 120), verbose=False) == len(cf)
+        for idx in range(len(cf)):
+            attrs = cf.get_trace_attrs(idx)
+            data = process_data(cf.get_trace_data(idx), attrs, verbose=False)
+            fs = decode(attrs["samplingrate"])
+            onset = decode(attrs["samples_pre_event"]) - decode(attrs["onset_shift"])
+            mep = data[onset + int(15 * fs / 1000) : onset + int(120 * fs / 1000)]
+            lat = decode(attrs["neg_peak_latency_ms"])
+            assert lat == mep.argmin() * 1000 / fs + 15
+            assert decode(attrs["neg_peak_magnitude_uv"]) == mep.min()
+            assert decode(attrs["pos_peak_magnitude_uv"]) == mep.max()
@@ -175,3 +175,308 @@ def test_cachefile_getter_setter(cachefile0):
     with pytest.raises(ValueError):
         del attrs["original_file"]
         cf.set_trace_attrs(1, attrs)
+
+
+def test_trace_index(cachefile0, cachefile1):
+    with tempfile.TemporaryDirectory() as folder:
+        tf = Path(folder) / "test.hdf5"
+        merge(to=tf, sources=[cachefile0[0], cachefile1[0]])
+        cf = CacheFile(tf)
+        index = get_trace_index(cf.fname)
+        assert len(index) == len(cf) == 4
+        origins = cf.origins
+        assert [origin for origin, key in index] == [origins[0]] * 2 + [origins[1]] * 2
+        for idx, (origin, key) in enumerate(index):
+            assert locate_trace(cf.fname, idx) == (origin, key)
+            assert cf.get_trace_attrs(idx)["origin"] == origin
+        # writing attributes does not invalidate the index
+        attrs = cf.get_trace_attrs(3)
+        cf.set_trace_attrs(3, attrs)
+        assert get_trace_index(cf.fname) is index
+        # changing the structure of the file does
+        merge(to=tf, sources=[cachefile0[0]])
+        assert len(cf) == 2
+        with pytest.raises(IndexError):
+            locate_trace(cf.fname, 2)
+
+
+def test_get_all_trace_attrs(cachefile0):
+    cf = CacheFile(cachefile0[0])
+    columns = cf.get_all_trace_attrs()
+    for key in ["id", "origin", "cache_file_index", "xyz_coords", "samplingrate"]:
+        assert len(columns[key]) == len(cf)
+    assert columns["cache_file_index"].tolist() == list(range(len(cf)))
+    assert columns["xyz_coords"].shape == (len(cf), 3)
+    for idx in range(len(cf)):
+        attrs = cf.get_trace_attrs(idx)
+        assert columns["origin"][idx] == attrs["origin"]
+        assert columns["id"][idx] == int(attrs["id"])
+        assert columns["samplingrate"][idx] == float(attrs["samplingrate"])
+
+
+def test_as_column():
+    assert as_column([True, False]).dtype == bool
+    assert as_column([1, 2]).dtype == int
+    col = as_column([1, "", None, 2.5])
+    assert col.dtype == float
+    assert np.isnan(col[1]) and np.isnan(col[2])
+    assert as_column([[1, 2, 3], [4.0, 5.0, 6.0]]).shape == (2, 3)
+    assert as_column(["EDC_L", ""]) == ["EDC_L", ""]
+    assert as_column(["", None]) == ["", None]
+
+
+def test_cachefile_update_many(cachefile1):
+    cf = CacheFile(cachefile1[0])
+    updates = dict()
+    for idx in range(len(cf)):
+        attrs = cf.get_trace_attrs(idx)
+        attrs["comment"] = f"updated {idx}"
+        updates[idx] = attrs
+    cf.update_many(updates)
+    for idx in range(len(cf)):
+        assert cf.get_trace_attrs(idx)["comment"] == f"updated {idx}"
+
+    # safety checks are performed before anything is written
+    attrs = cf.get_trace_attrs(0)
+    attrs["comment"] = "not written"
+    with pytest.raises(ValueError):
+        cf.update_many({0: attrs, 1: attrs})
+    assert cf.get_trace_attrs(0)["comment"] == "updated 0"
+
+
+def test_cachefile_session(cachefile1):
+    cf = CacheFile(cachefile1[0])
+    with cf.open("r") as session:
+        assert len(session) == len(cf)
+        for idx, (data, attrs) in enumerate(session):
+            assert (data == cf.get_trace_data(idx)).all()
+            assert attrs == cf.get_trace_attrs(idx)
+        with pytest.raises(PermissionError):
+            session.set_trace_attrs(0, attrs)
+        with pytest.raises(IndexError):
+            session.get_trace_attrs(len(cf))
+
+    with cf.open("r+") as session:
+        attrs = session.get_trace_attrs(1)
+        attrs["comment"] = "written in session"
+        session.set_trace_attrs(1, attrs)
+        with pytest.raises(ValueError):
+            session.set_trace_attrs(0, attrs)
+    assert cf.get_trace_attrs(1)["comment"] == "written in session"
+
+    with pytest.raises(ValueError):
+        cf.open("w")
+
+
+def test_convert_layout(cachefile0, cachefile1):
+    with tempfile.TemporaryDirectory() as folder:
+        merged = merge(Path(folder) / "merged.hdf5", [cachefile0[0], cachefile1[0]])
+        v2 = convert_layout(merged, Path(folder) / "v2.hdf5")
+        with read_file(v2) as f:
+            assert all(is_contiguous(f[origin]) for origin in f.keys())
+        cf, cv = CacheFile(merged), CacheFile(v2)
+        assert len(cv) == len(cf)
+        assert recover_annotations(cv) == recover_annotations(cf)
+        for idx in range(len(cf)):
+            assert (cv.get_trace_data(idx) == cf.get_trace_data(idx)).all()
+        stack = cv.get_trace_data(slice(0, len(cv)))
+        assert stack.shape[0] == len(cv)
+        assert (stack == cf.get_trace_data(slice(0, len(cf)))).all()
+
+        # both attributes and data can be written in the contiguous layout
+        attrs = cv.get_trace_attrs(1)
+        attrs["comment"] = "contiguous"
+        cv.set_trace_attrs(1, attrs)
+        assert cv.get_trace_attrs(1)["comment"] == "contiguous"
+        data = cv.get_trace_data(1) + 1
+        write_tracedata(cv, data, 1)
+        assert (cv.get_trace_data(1) == data).all()
+        assert (cv.get_trace_data(0) == cf.get_trace_data(0)).all()
+
+        v1 = convert_layout(v2, Path(folder) / "v1.hdf5", contiguous=False)
+        assert recover_annotations(CacheFile(v1)) == recover_annotations(cv)
+
+
+@pytest.mark.parametrize("contiguous", [False, True])
+def test_typed_attributes(cachefile0, contiguous):
+    with tempfile.TemporaryDirectory() as folder:
+        tf = convert_layout(
+            cachefile0[0], Path(folder) / "typed.hdf5", contiguous, typed=True
+        )
+        cf, ct = CacheFile(cachefile0[0]), CacheFile(tf)
+        with read_file(tf) as f:
+            origin = list(f.keys())[0]
+            stored = read_origin_attrs(f[origin])[0]
+        assert type(stored["neg_peak_magnitude_uv"]) == float
+        assert type(stored["onset_shift"]) == int
+        assert stored["xyz_coords"] == as_typed(stored["xyz_coords"], "float[3]")
+        assert type(stored["channel_labels"]) == str
+
+        # typed attributes are read transparently
+        a, b = cf.get_all_trace_attrs(), ct.get_all_trace_attrs()
+        for key in ["neg_peak_magnitude_uv", "onset_shift", "xyz_coords", "comment"]:
+            assert np.all(np.asarray(a[key]) == np.asarray(b[key]))
+        attrs = ct.get_trace_attrs(0)
+        assert all(type(v) == str for v in attrs.values())
+        assert decode(attrs["neg_peak_magnitude_uv"]) == a["neg_peak_magnitude_uv"][0]
+
+        # and keep their type when they are updated
+        attrs["neg_peak_magnitude_uv"] = encode(-5)
+        attrs["onset_shift"] = encode(3)
+        ct.set_trace_attrs(0, attrs)
+        with read_file(tf) as f:
+            stored = read_origin_attrs(f[origin])[0]
+        assert stored["neg_peak_magnitude_uv"] == -5.0
+        assert stored["onset_shift"] == 3
+        assert decode(ct.get_trace_attrs(0)["onset_shift"]) == 3
+
+
+def test_as_typed():
+    assert as_typed("5", "int") == 5
+    assert as_typed("5", "float") == 5.0
+    assert as_typed("5.5", "int") is None
+    assert as_typed("1e-05", "float") == 1e-05
+    assert as_typed("[1, 2, 3]", "float[3]") == [1.0, 2.0, 3.0]
+    assert as_typed("[1, 2]", "float[3]") is None
+    assert as_typed("", "float") is None
+
+
+@pytest.mark.parametrize("contiguous", [False, True])
+def test_origin_attrs_stored_once(cachefile0, contiguous):
+    with tempfile.TemporaryDirectory() as folder:
+        tf = convert_layout(cachefile0[0], Path(folder) / "once.hdf5", contiguous)
+        cf, ct = CacheFile(cachefile0[0]), CacheFile(tf)
+        with read_file(tf) as f:
+            origin = list(f.keys())[0]
+            stored = read_origin_attrs(f[origin], merged=False)
+        assert all("channel_labels" not in t and "origin" not in t for t in stored)
+        assert all("neg_peak_magnitude_uv" in t for t in stored)
+        for idx in range(len(cf)):
+            attrs = ct.get_trace_attrs(idx)
+            attrs.pop("cache_file")
+            old = cf.get_trace_attrs(idx)
+            old.pop("cache_file")
+            assert attrs == old
+
+        # writing the merged attributes back does not create copies
+        ct.set_trace_attrs(0, ct.get_trace_attrs(0))
+        with read_file(tf) as f:
+            assert "channel_labels" not in read_origin_attrs(f[origin], False)[0]
+        # without copies in the traces, only the origin is written
+        ct.set_origin_attrs(origin, {"global_comment": "once"})
+        with read_file(tf) as f:
+            assert f[origin].attrs["global_comment"] == "once"
+            stored = read_origin_attrs(f[origin], merged=False)
+        assert all("global_comment" not in t for t in stored)
+        assert all(ct.get_trace_attrs(i)["global_comment"] == "once" for i in range(2))
+        with pytest.raises(ValueError):
+            ct.set_origin_attrs(origin, {"comment": "not an origin attribute"})
+
+        # copies stored by earlier versions are still kept up to date
+        legacy = Path(folder) / "legacy.hdf5"
+        legacy.write_bytes(Path(cachefile0[0]).read_bytes())
+        cl = CacheFile(legacy)
+        cl.set_origin_attrs(origin, {"global_comment": "copied"})
+        with read_file(legacy) as f:
+            stored = read_origin_attrs(f[origin], merged=False)
+        assert all(t["global_comment"] == "copied" for t in stored)
+
+
+@pytest.mark.parametrize("contiguous", [False, True])
+def test_origin_attrs_overwrite_divergent_traces(cachefile0, contiguous):
+    with tempfile.TemporaryDirectory() as folder:
+        legacy = Path(folder) / "legacy.hdf5"
+        legacy.write_bytes(Path(cachefile0[0]).read_bytes())
+        cl = CacheFile(legacy)
+        attrs = cl.get_trace_attrs(1)
+        attrs["global_comment"] = "special"
+        cl.set_trace_attrs(1, attrs)
+        # only the divergent value is kept in its trace
+        dedupe_origin_attrs(legacy)
+        tf = convert_layout(legacy, Path(folder) / "once.hdf5", contiguous)
+        for fname in [legacy, tf]:
+            cf = CacheFile(fname)
+            with read_file(fname) as f:
+                origin = list(f.keys())[0]
+                stored = read_origin_attrs(f[origin], merged=False)
+            assert [t.get("global_comment") for t in stored[:2]] == [None, "special"]
+            cf.set_origin_attrs(origin, {"global_comment": "new"})
+            comments = cf.get_all_trace_attrs()["global_comment"]
+            assert comments == ["new"] * len(cf)
+
+
+def test_dedupe_origin_attrs(cachefile2):
+    with tempfile.TemporaryDirectory() as folder:
+        tf = Path(folder) / "dedupe.hdf5"
+        tf.write_bytes(Path(cachefile2[0]).read_bytes())
+        cf = CacheFile(tf)
+        before = cf.get_all_trace_attrs()
+        # earlier versions changed global attributes only in the copies
+        with cf.open("r+") as session:
+            updates = dict()
+            for idx in range(len(session)):
+                attrs = session.get_trace_attrs(idx)
+                attrs["global_comment"] = "in the copies"
+                updates[idx] = attrs
+            session.update_many(updates)
+        cf.set_trace_attrs(0, cf.get_trace_attrs(0))
+        dedupe_origin_attrs(tf)
+        with read_file(tf) as f:
+            origin = list(f.keys())[0]
+            assert f[origin].attrs["global_comment"] == "in the copies"
+            stored = read_origin_attrs(f[origin], merged=False)
+        assert all("global_comment" not in t and "subject" not in t for t in stored)
+        after = cf.get_all_trace_attrs()
+        assert after["global_comment"] == ["in the copies"] * len(cf)
+        for key in ["subject", "samplingrate", "neg_peak_magnitude_uv", "id"]:
+            assert np.all(np.asarray(after[key]) == np.asarray(before[key]))
+
+
+def test_merge_copies_origins(cachefile0, cachefile1):
+    with tempfile.TemporaryDirectory() as folder:
+        v2 = convert_layout(cachefile1[0], Path(folder) / "v2.hdf5")
+        merged = merge(Path(folder) / "merged.hdf5", [cachefile0[0], v2])
+        cf0, cf1, cf = CacheFile(cachefile0[0]), CacheFile(v2), CacheFile(merged)
+        with read_file(merged) as f:
+            assert [is_contiguous(f[origin]) for origin in f.keys()] == [False, True]
+        assert len(cf) == len(cf0) + len(cf1)
+        a0, a1 = recover_annotations(cf0), recover_annotations(cf1)
+        assert recover_annotations(cf) == a0 + a1
+        for idx in range(len(cf1)):
+            assert (cf.get_trace_data(len(cf0) + idx) == cf1.get_trace_data(idx)).all()
+
+
+def test_cachefile_append(cachefile0, cachefile1, cachefile2):
+    with tempfile.TemporaryDirectory() as folder:
+        tf = Path(folder) / "append.hdf5"
+        tf.write_bytes(Path(cachefile0[0]).read_bytes())
+        cf, cf1 = CacheFile(tf), CacheFile(cachefile1[0])
+        annotations, traces = recover_parts(cf1)
+        cf.append(annotations[0], traces[0])
+        assert cf.origins == [cachefile0[1]["origin"], cachefile1[1]["origin"]]
+        assert len(cf) == len(CacheFile(cachefile0[0])) + len(cf1)
+        data = cf.get_trace_data(len(cf) - 1)
+        assert (data == cf1.get_trace_data(len(cf1) - 1)).all()
+        with pytest.raises(Exception):
+            cf.append(annotations[0], traces[0])
+
+        merge(tf, [cachefile2[0]], append=True)
+        assert cachefile2[1]["origin"] in cf.origins
+        with pytest.raises(Exception):
+            merge(tf, [cachefile2[0]], append=True)
+        assert len(cf.origins) == 3
+
+
+@pytest.mark.parametrize("contiguous", [False, True])
+def test_populate_from_array(cachefile0, contiguous):
+    cf = CacheFile(cachefile0[0])
+    annotations, traces = recover_parts(cf)
+    stack = np.stack([np.asarray(t) for t in traces[0]])
+    with tempfile.TemporaryDirectory() as folder:
+        tf = populate(
+            Path(folder) / "array.hdf5", annotations, [stack], contiguous=contiguous
+        )
+        ct = CacheFile(tf)
+        assert len(ct) == len(cf)
+        for ix in range(len(cf)):
+            assert np.allclose(ct.get_trace_data(ix), cf.get_trace_data(ix))
@@ -0,0 +1,144 @@
+import pytest
+from offspect.cache.file import CacheFile, write_tracedata, encode, decode
+from offspect.cache import steps
+from offspect.cache.steps import (
+    process_cached,
+    process_data,
+    process_many,
+    clear_processed,
+    remove_linenoise,
+    apply_steps,
+)
+import tempfile
+import h5py
+import os
+import numpy as np
+from pathlib import Path
+
+
+def test_process_cached(cachefile1, monkeypatch):
+    with tempfile.TemporaryDirectory() as folder:
+        tf = Path(folder) / "steps.hdf5"
+        tf.write_bytes(Path(cachefile1[0]).read_bytes())
+        cf = CacheFile(tf)
+        clear_processed()
+        attrs = cf.get_trace_attrs(0)
+        attrs["_log"] = encode(["baseline on now", "flipsign on now"])
+        expected = process_data(cf.get_trace_data(0), attrs)
+        assert (process_cached(cf, 0, attrs) == expected).all()
+
+        # replaying is skipped, and the cached data can not be modified
+        calls = []
+        fail = lambda data, attrs: calls.append(1)
+        monkeypatch.setitem(steps.PreProcessor, "flipsign", fail)
+        data = process_cached(cf, 0, attrs)
+        data[:] = 0
+        assert (process_cached(cf, 0, attrs) == expected).all()
+        assert calls == []
+
+        # but not once the data or the steps change
+        write_tracedata(cf, cf.get_trace_data(0) + 1, 0)
+        with pytest.raises(AttributeError):
+            process_cached(cf, 0, attrs)
+        assert calls == [1]
+        attrs["_log"] = encode(["baseline on now"])
+        assert np.allclose(process_cached(cf, 0, attrs), -expected)
+
+        # or the file is changed by another process
+        cached = process_cached(cf, 0, attrs)
+        with h5py.File(tf, "r+") as f:
+            origin = list(f.keys())[0]
+            dset = f[origin]["traces"][sorted(f[origin]["traces"].keys())[0]]
+            dset[...] = dset[...] * 2
+        os.utime(tf, ns=(0, 0))
+        assert not np.allclose(process_cached(cf, 0, attrs), cached)
+        assert steps._processed_bytes == sum(d.nbytes for d in steps._processed.values())
+
+        monkeypatch.setattr(steps, "PROCESSED_CACHE_BYTES", 0)
+        process_cached(cf, 1)
+        assert len(steps._processed) == 0
+        assert steps._processed_bytes == 0
+
+
+def test_process_many(cachefile1):
+    cf = CacheFile(cachefile1[0])
+    logs = [
+        [],
+        ["baseline on now"],
+        ["detrend on now", "flipsign on now"],
+        ["linenoise on now", "baseline on now"],
+        ["linenoise_50hz on now", "flipsign on now"],
+        ["linenoise_60hz on now"],
+    ]
+    stack, attrs = [], []
+    for i in range(12):
+        a = cf.get_trace_attrs(i % len(cf))
+        a["_log"] = encode(logs[i % len(logs)])
+        a["onset_shift"] = encode(i - 4)
+        stack.append(cf.get_trace_data(i % len(cf))[:, 0])
+        attrs.append(a)
+    stack = np.asanyarray(stack)
+    expected = [process_data(d.copy(), a, verbose=False) for d, a in zip(stack, attrs)]
+    processed = process_many(stack, attrs, verbose=False)
+    assert np.allclose(processed, np.asanyarray(expected))
+
+
+def test_remove_linenoise():
+    fs = 1000
+    t = np.arange(1500) / fs
+    clean = np.sin(2 * np.pi * 7 * t)
+    noise = 0.5 * np.sin(2 * np.pi * 50 * t + 0.3) + 0.2 * np.sin(2 * np.pi * 150 * t)
+    for method in ["notch", "interpolate"]:
+        data = remove_linenoise(clean + noise, fs, 50, method=method)
+        assert np.abs(data - clean).max() < 0.01
+    without_harmonics = remove_linenoise(clean + noise, fs, 50, harmonics=False)
+    assert np.abs(without_harmonics - clean).max() > 0.1
+    stack = np.stack([clean + noise, clean + noise * 2])[:, :, None]
+    assert np.allclose(remove_linenoise(stack, fs, axis=1)[0, :, 0], data)
+
+
+def test_linenoise_replays_identically(cachefile1):
+    def reference(data, attrs):
+        signal = data.copy()
+        fs = decode(attrs["samplingrate"])
+        original_len = len(signal)
+        while len(signal) < fs:
+            signal = np.pad(signal, (1, 0), "constant", constant_values=(0))
+        fourier = np.fft.fft(signal)
+        freq = np.fft.fftfreq(len(signal), d=1 / fs)
+        fourier[int(np.where(freq == 50)[0][0])] = 0
+        return np.real(np.fft.ifft(fourier))[-original_len:]
+
+    cf = CacheFile(cachefile1[0])
+    data, attrs = cf.get_trace_data(0)[:, 0], cf.get_trace_attrs(0)
+    assert (steps.linenoise(data.copy(), attrs) == reference(data, attrs)).all()
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_apply_steps(cachefile1, processes):
+    with tempfile.TemporaryDirectory() as folder:
+        tf = Path(folder) / "apply.hdf5"
+        tf.write_bytes(Path(cachefile1[0]).read_bytes())
+        cf = CacheFile(tf)
+        attrs = cf.get_trace_attrs(1)
+        attrs["_log"] = encode(["baseline on now", "flipsign on now"])
+        cf.set_trace_attrs(1, attrs)
+        expected = [
+            process_data(cf.get_trace_data(ix), cf.get_trace_attrs(ix), verbose=False)
+            for ix in range(len(cf))
+        ]
+        raw = cf.get_trace_data(1)
+
+        for invalid in [tf, Path(folder) / ".." / tf.parent.name / tf.name]:
+            with pytest.raises(ValueError):
+                apply_steps(cf, invalid)
+        with pytest.raises(ValueError):
+            apply_steps(cf, Path(folder) / "to.wrong")
+        applied = apply_steps(cf, Path(folder) / "to.hdf5", processes=processes)
+        assert (cf.get_trace_data(1) == raw).all()
+        for ix in range(len(applied)):
+            assert np.allclose(applied.get_trace_data(ix), expected[ix])
+            assert decode(applied.get_trace_attrs(ix).get("_log", "[]")) == []
+
+        apply_steps(cf)
+        assert np.allclose(cf.get_trace_data(1), expected[1])
@@ -122,6 +122,37 @@ def test_cli_peek(cachefile0):
     assert e == b""  # no errors
 
 
+def test_cli_convert(cachefile0):
+    with TemporaryDirectory() as folder:
+        tf = Path(folder) / "test.hdf5"
+        p = Popen(
+            ["offspect", "convert", str(cachefile0[0]), "-t", str(tf)],
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        time.sleep(1)
+        o, e = p.communicate()
+        assert tf.exists()
+        assert tf.name in o.decode()
+        assert e == b""  # no errors
+    assert tf.exists() is False
+
+
+def test_cli_estimate(cachefile1):
+    with TemporaryDirectory() as folder:
+        tf = Path(folder) / "test.hdf5"
+        tf.write_bytes(Path(cachefile1[0]).read_bytes())
+        p = Popen(
+            ["offspect", "estimate", "-f", str(tf), "--window", "15", "120"],
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        time.sleep(1)
+        o, e = p.communicate()
+        assert "Estimated peaks" in o.decode()
+        assert e == b""  # no errors
+
+
 def test_cli_none():
     p = Popen(["offspect"], stdout=PIPE, stderr=PIPE,)
     time.sleep(1)
@@ -1,4 +1,5 @@
 import urllib.request
+import struct
 from pathlib import Path
 
 xdf_urls = {
@@ -33,6 +34,75 @@ def mock(xdfname: str, clean=False):
     return str(fname)
 
 
+def _chunk(tag: int, content: bytes) -> bytes:
+    length = len(content) + 2
+    return struct.pack("<BQH", 8, length, tag) + content
+
+
+def _varlen(value: int) -> bytes:
+    return struct.pack("<BQ", 8, value)
+
+
+def write_xdf(fname: str, streams: list):
+    """write a minimal xdf-file with the given streams
+
+    every stream is a dict with name, type, hostname, srate, labels, time_stamps and time_series. The time_series is either a 2d float array or, for marker streams, a list of strings. Optionally, samples are written in chunks of chunksize, and with sparse_stamps only the first sample of a chunk has a timestamp
+    """
+    with open(fname, "wb") as f:
+        f.write(b"XDF:")
+        header = "<?xml version='1.0'?><info><version>1.0</version></info>"
+        f.write(_chunk(1, header.encode()))
+        for sid, s in enumerate(streams, start=1):
+            is_marker = s.get("labels") is None and isinstance(s["time_series"], list)
+            fmt = "string" if is_marker else "float32"
+            count = 1 if is_marker else len(s["labels"])
+            channels = "".join(
+                f"<channel><label>{l}</label><type>EMG</type></channel>"
+                for l in s.get("labels") or []
+            )
+            desc = "<desc/>"
+            if channels:
+                desc = f"<desc><channels>{channels}</channels></desc>"
+            info = (
+                f"<?xml version='1.0'?><info><name>{s['name']}</name>"
+                f"<type>{s.get('type', 'EEG')}</type>"
+                f"<channel_count>{count}</channel_count>"
+                f"<nominal_srate>{s.get('srate', 0)}</nominal_srate>"
+                f"<channel_format>{fmt}</channel_format>"
+                f"<source_id>{sid}</source_id><created_at>0</created_at>"
+                f"<hostname>{s.get('hostname', 'host')}</hostname>"
+                f"{desc}</info>"
+            )
+            f.write(_chunk(2, struct.pack("<I", sid) + info.encode()))
+        for sid, s in enumerate(streams, start=1):
+            size = s.get("chunksize", len(s["time_stamps"]))
+            for start in range(0, len(s["time_stamps"]), size):
+                stamps = s["time_stamps"][start : start + size]
+                series = s["time_series"][start : start + size]
+                content = struct.pack("<I", sid) + _varlen(len(stamps))
+                for ix, (ts, sample) in enumerate(zip(stamps, series)):
+                    # optionally, only the first sample of a chunk is stamped
+                    if ix == 0 or not s.get("sparse_stamps", False):
+                        content += struct.pack("<Bd", 8, ts)
+                    else:
+                        content += struct.pack("<B", 0)
+                    if isinstance(sample, str):
+                        content += _varlen(len(sample.encode())) + sample.encode()
+                    else:
+                        content += struct.pack(f"<{len(sample)}f", *sample)
+                f.write(_chunk(3, content))
+        for sid, s in enumerate(streams, start=1):
+            footer = (
+                "<?xml version='1.0'?><info>"
+                f"<first_timestamp>{s['time_stamps'][0]}</first_timestamp>"
+                f"<last_timestamp>{s['time_stamps'][-1]}</last_timestamp>"
+                f"<sample_count>{len(s['time_stamps'])}</sample_count>"
+                "<clock_offsets></clock_offsets></info>"
+            )
+            f.write(_chunk(6, struct.pack("<I", sid) + footer.encode()))
+    return str(fname)
+
+
 if __name__ == "__main__":
     for fname in xdf_urls.keys():
         mock(fname, clean=True)
@@ -0,0 +1,26 @@
+import numpy as np
+from offspect.protocols.epochs import cut_epochs, get_onsets
+
+
+def test_cut_epochs():
+    data = np.random.randn(1000, 3).astype(np.float32)
+    onsets = np.array([500, 100, 20, 990])
+    epochs = cut_epochs(data, onsets, 50, 100)
+    assert epochs.shape == (4, 150, 3)
+    assert epochs.dtype == np.float32
+    assert np.array_equal(epochs[0], data[450:600])
+    assert np.array_equal(epochs[1], data[50:200])
+    # samples beyond the recording are filled up
+    assert np.isnan(epochs[2, :30]).all() and np.array_equal(epochs[2, 30:], data[:120])
+    assert np.array_equal(epochs[3, :60], data[940:]) and np.isnan(epochs[3, 60:]).all()
+    # epochs are copies
+    epochs -= 1
+    assert np.array_equal(cut_epochs(data, onsets, 50, 100)[0], data[450:600])
+    single = cut_epochs(data[:, 1], onsets, 50, 100, fill=0)
+    assert single.shape == (4, 150) and (single[2, :30] == 0).all()
+    assert cut_epochs(np.arange(10), [], 2, 2).shape == (0, 4)
+
+
+def test_get_onsets():
+    annotation = {"traces": [{"event_sample": "12"}, {"event_sample": "3"}]}
+    assert get_onsets(annotation).tolist() == [12, 3]
@@ -0,0 +1,380 @@
+import pytest
+import json
+import numpy as np
+from offspect.protocols.xdf import (
+    match_timestamps,
+    match_one_to_one,
+    find_closest,
+    find_closest_idx,
+    parse_localite,
+    assign_localite,
+    yield_timestamps_localite,
+    yield_loc_mso,
+    yield_loc_didt,
+    scan_headers,
+    select_streams,
+    load_streams,
+    stream_epochs,
+    cut_streamed,
+    concat_streams,
+    refine_onsets,
+    tkeo,
+    detect_pulses,
+    detect_streamed,
+    yield_timestamps_artifact,
+    correct_tkeo,
+    has_samples,
+    pick_key_with_channel,
+)
+from liesl.api import XDFFile
+from ..mock.mock_xdf import write_xdf
+
+
+def reference_idx(reference, ts, relative):
+    "the original list-based lookup, returning the index into reference"
+    ix = np.arange(len(reference))
+    if relative == "earlier":
+        ix = ix[reference <= ts]
+    elif relative == "later":
+        ix = ix[reference >= ts]
+    if len(ix) == 0:
+        return -1
+    return int(ix[np.argmin(np.abs(reference[ix] - ts))])
+
+
+@pytest.mark.parametrize("relative", ["closest", "earlier", "later"])
+def test_match_timestamps(relative):
+    rng = np.random.default_rng(0)
+    reference = np.cumsum(rng.uniform(0.001, 0.5, size=200))
+    events = rng.uniform(-1, reference[-1] + 1, size=50)
+    events = np.concatenate((events, reference[[0, 10, 199]]))
+    idx = match_timestamps(reference, events, relative)
+    expected = [reference_idx(reference, ts, relative) for ts in events]
+    assert idx.tolist() == expected
+
+
+def test_match_timestamps_tolerance_and_order():
+    reference = np.array([0.0, 1.0, 2.0, 3.0])
+    idx = match_timestamps(reference, [0.4, 1.5, 2.9, 10.0], max_delta=0.45)
+    assert idx.tolist() == [0, -1, 3, -1]
+    # ties are resolved towards the earlier timestamp
+    assert match_timestamps(reference, [1.5]).tolist() == [1]
+    # unsorted references are still matched to their original index
+    shuffled = np.array([2.0, 0.0, 3.0, 1.0])
+    assert match_timestamps(shuffled, [0.1, 2.2, 2.9]).tolist() == [1, 0, 2]
+    assert match_timestamps([], [1.0]).tolist() == [-1]
+    with pytest.raises(ValueError):
+        match_timestamps(reference, [1.0], relative="invalid")
+
+
+def test_find_closest():
+    timestamps = [0.0, 1.0, 2.0, 3.0]
+    assert find_closest_idx(1.9, timestamps) == 2
+    assert find_closest_idx(1.9, timestamps, "earlier") == 1
+    assert find_closest_idx(1.1, timestamps, "later") == 2
+    assert find_closest(1.1, timestamps, "later") == 2.0
+    assert list(find_closest([0.1, 2.9], timestamps)) == [0.0, 3.0]
+    with pytest.raises(ValueError):
+        find_closest_idx(-1.0, timestamps, "earlier")
+
+
+def reference_pop(reference, events, relative):
+    "the original list-based matching, where every match is popped"
+    ct = list(reference)
+    ix = list(range(len(reference)))
+    matched = []
+    for ts in events:
+        if relative == "earlier":
+            cand = [(abs(t - ts), i) for t, i in zip(ct, ix) if t <= ts]
+        elif relative == "later":
+            cand = [(abs(t - ts), i) for t, i in zip(ct, ix) if t >= ts]
+        else:
+            cand = [(abs(t - ts), i) for t, i in zip(ct, ix)]
+        if len(cand) == 0:
+            matched.append(-1)
+            continue
+        _, i = min(cand)
+        ct.pop(ix.index(i))
+        ix.remove(i)
+        matched.append(i)
+    return matched
+
+
+@pytest.mark.parametrize("relative", ["closest", "earlier", "later"])
+def test_match_one_to_one(relative):
+    rng = np.random.default_rng(0)
+    reference = np.cumsum(rng.uniform(0.001, 0.5, size=100))
+    # dense events compete for the same reference timestamps
+    events = np.sort(rng.uniform(0, reference[-1], size=80))
+    idx = match_one_to_one(reference, events, relative)
+    assert idx.tolist() == reference_pop(reference, events, relative)
+    valid = idx[idx >= 0]
+    assert len(np.unique(valid)) == len(valid)
+
+
+class MockStream:
+    def __init__(self, markers):
+        self.time_stamps = np.array([m[0] for m in markers], dtype=float)
+        self.time_series = [[m[1]] for m in markers]
+
+
+def coil(amplitude, x=1.0, y=2.0, z=3.0):
+    return json.dumps({"amplitude": amplitude, "x": x, "y": y, "z": z})
+
+
+@pytest.fixture
+def localite():
+    return MockStream(
+        [
+            (0.5, "Starte Hotspotsuche"),
+            (1.0, json.dumps({"coil_0_didt": 10})),
+            (1.1, coil(50)),
+            (2.1, coil(60, x=None)),
+            (3.0, json.dumps({"coil_0_didt": 30})),
+            (3.1, coil(0)),
+            (3.2, coil(70)),
+        ]
+    )
+
+
+def test_parse_localite(localite):
+    table = parse_localite(localite)
+    assert table["kind"].tolist() == [
+        "text",
+        "didt",
+        "pulse",
+        "pulse",
+        "didt",
+        "other",
+        "pulse",
+    ]
+    assert np.isnan(table["x"][3])
+    assert parse_localite(localite) is table
+    assert list(yield_timestamps_localite(localite)) == [1.0, 2.1, 3.0]
+
+
+def test_assign_localite(localite):
+    coords, didt, mso = assign_localite(localite, [1.0, 2.1, 3.0, 5.0])
+    assert mso[:3] == [50.0, 60.0, 70.0] and np.isnan(mso[3])
+    assert coords[0] == [1.0, 2.0, 3.0] and np.isnan(coords[1][0])
+    assert didt[:2] == [10.0, 30.0] and np.isnan(didt[2])
+    assert list(yield_loc_mso(localite, [1.0, 2.1, 3.0, 5.0]))[:3] == mso[:3]
+    assert list(yield_loc_didt(localite, [1.0, 2.1]))[:2] == didt[:2]
+
+
+@pytest.fixture
+def xdffile(tmp_path):
+    t = np.arange(500) / 1000 + 100
+    series = np.random.default_rng(0).standard_normal((500, 2))
+    eeg = dict(srate=1000, time_stamps=t, time_series=series)
+    return write_xdf(
+        tmp_path / "test.xdf",
+        [
+            dict(name="BrainVision RDA", labels=["Fz", "Cz"], **eeg),
+            dict(name="eego", labels=["EDC_L", "FDI_L"], **eeg),
+            dict(name="BrainVision RDA", labels=["Oz", "Pz"], **eeg),
+            dict(
+                name="localite_marker",
+                type="Markers",
+                time_stamps=[100.1],
+                time_series=['{"amplitude": 50, "x": 1, "y": 2, "z": 3}'],
+            ),
+        ],
+    )
+
+
+def test_scan_headers(xdffile):
+    headers = scan_headers(xdffile)
+    assert [h["key"] for h in headers] == list(XDFFile(xdffile).keys())
+    assert headers[1]["channel_labels"] == ["EDC_L", "FDI_L"]
+    assert headers[3]["channel_labels"] is None
+    assert select_streams(headers, ["EDC_L", "localite_marker"]) == [2, 4]
+    assert select_streams(headers, ["BrainVision RDA2"]) == [3]
+
+
+def test_load_selected_streams(xdffile):
+    parsed = XDFFile(xdffile)
+    streams = load_streams(xdffile, select=["Oz", "localite_marker", "missing"])
+    assert list(streams.keys()) == ["BrainVision RDA2", "localite_marker"]
+    assert streams["BrainVision RDA2"].channel_labels == ["Oz", "Pz"]
+    assert np.all(
+        streams["BrainVision RDA2"].time_series
+        == parsed["BrainVision RDA2"].time_series
+    )
+    assert load_streams(xdffile, streams=streams) is streams
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_stream_epochs(tmp_path, sparse):
+    t = np.arange(1000) / 1000 + 100
+    data = np.random.default_rng(0).standard_normal((1000, 3)).astype(np.float32)
+    xdffile = write_xdf(
+        tmp_path / "test.xdf",
+        [
+            dict(
+                name="eego",
+                srate=1000,
+                labels=["A", "B", "C"],
+                time_stamps=t,
+                time_series=data,
+                chunksize=37,
+                sparse_stamps=sparse,
+            )
+        ],
+    )
+    onsets = [500, 20, 21, 990, 100, 300]
+    pre, post = 50, 100
+    epochs = dict(stream_epochs(xdffile, 1, onsets, pre, post, columns=[0, 2]))
+    assert sorted(epochs.keys()) == list(range(len(onsets)))
+    for ix, onset in enumerate(onsets):
+        epoch = epochs[ix]
+        assert epoch.shape == (pre + post, 2)
+        a, b = max(onset - pre, 0), min(onset + post, len(data))
+        expected = np.full((pre + post, 2), np.nan)
+        expected[a - onset + pre : b - onset + pre] = data[a:b][:, [0, 2]]
+        assert np.array_equal(epoch, expected, equal_nan=True)
+    traces = cut_streamed(xdffile, "eego", onsets, pre, post)
+    assert np.array_equal(traces[0], data[450:600])
+    with pytest.raises(KeyError):
+        cut_streamed(xdffile, "missing", onsets, pre, post)
+
+
+class MockDataStream:
+    def __init__(self, start, count, labels=["EDC_L", "EDC_R"]):
+        self.hostname = "SEPHYS-CTRL"
+        self.channel_labels = labels
+        self.nominal_srate = 1000
+        self.time_stamps = start + np.arange(count) / 1000
+        rng = np.random.default_rng(start)
+        self.time_series = rng.standard_normal((count, len(labels)))
+
+
+def test_concat_streams():
+    first, second = MockDataStream(10, 50), MockDataStream(20, 30)
+    files = [{"EEG": second}, {"EEG": first}]
+    series, stamps, datastream = concat_streams("EDC_R", files)
+    assert datastream is first
+    assert np.all(np.diff(stamps) > 0)
+    expected = np.concatenate((first.time_series, second.time_series))
+    assert np.array_equal(series, expected)
+    assert np.array_equal(stamps[50:], second.time_stamps)
+
+    series, _, _ = concat_streams("EDC_R", files, columns=1)
+    assert series.shape == (80,)
+    assert np.array_equal(series, expected[:, 1])
+    with pytest.raises(IndexError):
+        concat_streams("APB_L", files)
+
+
+@pytest.mark.parametrize("measure", ["gmfp", "tkeo"])
+def test_refine_onsets(measure):
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((5000, 66))
+    onsets = rng.integers(60, 4900, 100)
+    for onset in onsets[:10]:
+        data[onset + 7] += rng.standard_normal(66) * 30
+    # the previous implementation over the whole recording
+    artifact = np.std(data[:, 0:64], 1)
+    if measure == "tkeo":
+        artifact = tkeo(artifact)
+    hoods = [artifact[onset - 50 : onset + 50] for onset in onsets]
+    expected = [onset + np.argmax(hood) - 50 for onset, hood in zip(onsets, hoods)]
+    refined, amplitudes = refine_onsets(
+        data, onsets, 50, 50, channels=slice(0, 64), measure=measure
+    )
+    assert refined.tolist() == expected
+    assert np.allclose(amplitudes, [np.ptp(hood) for hood in hoods])
+
+    refined, amplitudes = refine_onsets(data, [1, 10000], 25, 25, measure=measure)
+    assert 0 <= refined[0] <= 25 and refined[1] == 10000
+    assert np.isnan(amplitudes[1])
+    with pytest.raises(ValueError):
+        refine_onsets(data, onsets, 25, 25, measure="rms")
+
+
+def pulsed_recording(count=60000, channels=2):
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((count, channels)).astype(np.float32)
+    pulses = np.arange(1000, count - 1000, 4000) + rng.integers(0, 500)
+    for pulse in pulses:
+        data[pulse : pulse + 5] += 500
+        data[pulse + 30 : pulse + 60] += 20  # a motor evoked potential
+    return data, pulses
+
+
+@pytest.mark.parametrize("measure", ["tkeo", "diff"])
+def test_detect_pulses(measure):
+    data, pulses = pulsed_recording()
+    for chunksize in [1, 37, 100000]:
+        chunks = (data[i : i + chunksize] for i in range(0, len(data), chunksize))
+        onsets = detect_pulses(chunks, 500, measure, blocksize=1000)
+        assert len(onsets) == len(pulses)
+        assert np.abs(onsets - pulses).max() <= 1
+    assert len(detect_pulses([data[:, 0]], 500, measure, threshold=1e12)) == 0
+    assert len(detect_pulses([], 500, measure)) == 0
+    with pytest.raises(ValueError):
+        detect_pulses([data], 500, "rms")
+
+
+def test_detect_artifact_in_stream(tmp_path):
+    data, pulses = pulsed_recording()
+    t = np.arange(len(data)) / 1000 + 100
+    xdffile = write_xdf(
+        tmp_path / "test.xdf",
+        [
+            dict(
+                name="BrainVision RDA",
+                hostname="SEPHYS-CTRL",
+                srate=1000,
+                labels=["EDC_L", "FDI_L"],
+                time_stamps=t,
+                time_series=data,
+                chunksize=37,
+            )
+        ],
+    )
+    onsets = detect_streamed(xdffile, "BrainVision RDA", "FDI_L", 500)
+    assert np.abs(onsets - pulses).max() <= 1
+    stream = load_streams(xdffile, select=["FDI_L"], samples=False)["BrainVision RDA"]
+    time_stamps = list(
+        yield_timestamps_artifact(xdffile, "BrainVision RDA", stream, "FDI_L")
+    )
+    assert np.allclose(time_stamps, t[onsets])
+    # a threshold of zero is taken as given, and keeps the first pulse going
+    assert len(detect_streamed(xdffile, "BrainVision RDA", "FDI_L", 500, "tkeo", 0)) == 1
+
+
+def test_stamps_only_and_streamed_correct_tkeo(tmp_path):
+    data, pulses = pulsed_recording(channels=3)
+    t = np.arange(len(data)) / 1000 + 100
+    xdffile = write_xdf(
+        tmp_path / "test.xdf",
+        [
+            dict(
+                name="BrainVision RDA",
+                hostname="SEPHYS-CTRL",
+                srate=1000,
+                labels=["Fp1", "Cz", "EDC_L"],
+                time_stamps=t,
+                time_series=data,
+                chunksize=37,
+            ),
+            dict(
+                name="BrainVision RDA Markers",
+                type="Markers",
+                time_stamps=t[pulses - 20],
+                time_series=["S  2"] * len(pulses),
+            ),
+        ],
+    )
+    assert pick_key_with_channel("Cz", scan_headers(xdffile)) == "BrainVision RDA"
+    loaded = load_streams(xdffile, select=["Cz", "BrainVision RDA Markers"])
+    stamps = load_streams(xdffile, select=["Cz"], samples=False)["BrainVision RDA"]
+    assert not has_samples(stamps) and has_samples(loaded["BrainVision RDA"])
+    assert np.array_equal(stamps.time_stamps, loaded["BrainVision RDA"].time_stamps)
+    assert stamps.channel_labels == ["Fp1", "Cz", "EDC_L"]
+
+    events = list(loaded["BrainVision RDA Markers"].time_stamps)
+    expected = correct_tkeo(loaded["BrainVision RDA"], events)
+    streamed = correct_tkeo(stamps, events, xdffile, "BrainVision RDA")
+    assert streamed == expected
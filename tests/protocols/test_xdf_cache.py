@@ -0,0 +1,70 @@
+import os
+import numpy as np
+from offspect.protocols.xdf_cache import load_cached, cache_key, evict
+from liesl.api import XDFFile
+from ..mock.mock_xdf import write_xdf
+
+
+def make_xdf(fname, samples=1000):
+    t = np.arange(samples) / 1000 + 100
+    return write_xdf(
+        fname,
+        [
+            dict(
+                name="eego",
+                srate=1000,
+                labels=["EDC_L", "FDI_L"],
+                time_stamps=t,
+                time_series=np.random.randn(samples, 2),
+            ),
+            dict(
+                name="localite_marker",
+                type="Markers",
+                time_stamps=[100.1, 100.5],
+                time_series=['{"amplitude": 50, "x": 1, "y": 2, "z": 3}', "Start"],
+            ),
+        ],
+    )
+
+
+def test_load_cached(tmp_path):
+    xdffile = make_xdf(tmp_path / "test.xdf")
+    cachedir = tmp_path / "cache"
+    parsed = XDFFile(xdffile)
+    first = load_cached(xdffile, cachedir)
+    assert (cachedir / cache_key(xdffile) / "manifest.json").exists()
+    cached = load_cached(xdffile, cachedir)
+    for streams in (first, cached):
+        assert list(streams.keys()) == list(parsed.keys())
+        eego = streams["eego"]
+        assert isinstance(eego.time_series, np.memmap)
+        assert np.all(eego.time_series == parsed["eego"].time_series)
+        assert np.all(eego.time_stamps == parsed["eego"].time_stamps)
+        assert eego.channel_labels == ["EDC_L", "FDI_L"]
+        assert eego.nominal_srate == 1000.0
+        assert streams["localite_marker"].time_series == [
+            ['{"amplitude": 50, "x": 1, "y": 2, "z": 3}'],
+            ["Start"],
+        ]
+    # in-place changes are not written back into the cache
+    cached["eego"].time_series[:] = 0
+    reloaded = load_cached(xdffile, cachedir)
+    assert np.all(reloaded["eego"].time_series == parsed["eego"].time_series)
+
+
+def test_cache_key_and_evict(tmp_path):
+    xdffile = make_xdf(tmp_path / "test.xdf")
+    key = cache_key(xdffile)
+    stat = os.stat(xdffile)
+    os.utime(xdffile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache_key(xdffile) != key
+
+    cachedir = tmp_path / "cache"
+    other = make_xdf(tmp_path / "other.xdf")
+    load_cached(xdffile, cachedir)
+    load_cached(other, cachedir)
+    assert len(os.listdir(cachedir)) == 2
+    # the least recently used entry is evicted first
+    load_cached(xdffile, cachedir)
+    evict(cachedir, max_bytes=1, keep=cache_key(xdffile))
+    assert os.listdir(cachedir) == [cache_key(xdffile)]